@@ -1,18 +1,37 @@
 
 from fastapi import APIRouter, UploadFile, File, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 from backend.core.model import model_manager
-from backend.core.image import process_image, tensor_to_bytes, analyze_brightness
-from backend.core.db import supabase
+from backend.core.image import (
+    ImageSource, sniff_mime_type, tensor_to_bytes,
+    normalize_output_format, SUPPORTED_OUTPUT_FORMATS,
+)
+from backend.core.pipeline import enhance_source
+from backend.core.resolution import QUALITY_TIERS, choose_resolution, load_pressure
+from backend.core.analysis import analyze_image
+from backend.core.video import FrameSource, SEQUENCE_OUTPUTS, VIDEO_OUTPUTS, require_av, stream_sequence
+from backend.core.cache import result_cache, cache_key
+from backend.core.db import storage
+from backend.core.executor import inference_executor, QueueFullError, StageTimer
+from backend.core.metrics import BYTES_IN, BYTES_OUT
+from backend.core.jobs import job_queue, public_view, DONE, FAILED
+from backend.core.health import health_monitor
+from backend.config import (
+    IMG_SIZE, INFERENCE_RETRY_AFTER_S, MODEL_DIR, ADMIN_TOKEN, VIDEO_MAX_FILE_SIZE_MB, VIDEO_MAX_FRAMES,
+    ADAPTIVE_RESOLUTION, RESOLUTION_DEFAULT_TIER,
+)
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 import io
-import magic
-from PIL import Image
+import json
+import zlib
+import zipfile
+import asyncio
 import base64
+import torch
 import logging
 from datetime import datetime
-import psutil
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
@@ -27,120 +46,784 @@ MAX_FILE_SIZE_MB = int(os.getenv("MAX_FILE_SIZE_MB", 10))
 MAX_FILE_SIZE = MAX_FILE_SIZE_MB * 1024 * 1024
 MAX_DIMENSION = int(os.getenv("MAX_IMAGE_DIMENSION", 4096))
 ALLOWED_TYPES = ["image/jpeg", "image/png"]
+ENHANCE_MODES = ["fast", "full"]
+BULK_MAX_FILES = int(os.getenv("BULK_MAX_FILES", 32))
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", 4))
+JOB_EVENTS_INTERVAL_S = 0.5
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Enough leading bytes to identify every accepted file signature
+UPLOAD_HEADER_SIZE = 16
 
-def validate_file_size(file_size: int) -> None:
+def validate_file_size(file_size: int, max_size: int = MAX_FILE_SIZE) -> None:
     """Validate file size"""
-    if file_size > MAX_FILE_SIZE:
+    if file_size > max_size:
         raise HTTPException(
             status_code=413,
-            detail=f"File too large. Maximum size is {MAX_FILE_SIZE / 1024 / 1024}MB"
+            detail=f"File too large. Maximum size is {max_size / 1024 / 1024}MB"
         )
 
-def validate_image_type(contents: bytes) -> str:
-    """Validate image MIME type using file magic numbers"""
+async def read_upload(file: UploadFile, max_size: int = MAX_FILE_SIZE, allowed_types: list = None,
+                      timer: StageTimer = None) -> tuple:
+    """
+    Read an upload into a single buffer, rejecting it as early as possible.
+
+    Multipart parts are already spooled by Starlette (to a temp file past
+    1 MB), so their size is known before reading: oversized parts are
+    rejected without touching the body, and with `allowed_types` the file
+    signature is checked on the first chunk. The body is then read in one
+    call into an exactly sized buffer rather than joined from chunks.
+    Returns (contents, mime_type); the type is only sniffed, and recorded
+    as the "sniff" stage on `timer`, when `allowed_types` is given.
+    """
+    timer = timer or StageTimer()
+    mime_type = None
     try:
-        mime_type = magic.from_buffer(contents, mime=True)
-        if mime_type not in ALLOWED_TYPES:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Invalid file type. Allowed: {', '.join(ALLOWED_TYPES)}"
-            )
-        return mime_type
+        if file.size is not None:
+            validate_file_size(file.size, max_size)
+            if allowed_types is not None:
+                header = await file.read(UPLOAD_HEADER_SIZE)
+                with timer.stage("sniff"):
+                    mime_type = validate_image_type(header, allowed_types)
+                await file.seek(0)
+            return await file.read(), mime_type
+
+        # Size unknown: grow one buffer, checking the limit as chunks arrive
+        buffer = bytearray()
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            if not buffer and allowed_types is not None:
+                with timer.stage("sniff"):
+                    mime_type = validate_image_type(chunk, allowed_types)
+            buffer += chunk
+            validate_file_size(len(buffer), max_size)
+        if allowed_types is not None and mime_type is None:
+            # Empty body: rejected as an unknown type
+            validate_image_type(b"", allowed_types)
+        return bytes(buffer), mime_type
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail="Error reading file")
+
+async def read_image_upload(file: UploadFile, timer: StageTimer = None) -> tuple:
+    """(contents, mime_type) of an image upload, validated before the body is read"""
+    return await read_upload(file, allowed_types=ALLOWED_TYPES, timer=timer)
+
+def validate_image_type(contents: bytes, allowed_types: list = ALLOWED_TYPES) -> str:
+    """Validate image MIME type from the file signature (header bytes only)"""
+    mime_type = sniff_mime_type(contents[:UPLOAD_HEADER_SIZE])
+    if mime_type not in allowed_types:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid file type. Allowed: {', '.join(allowed_types)}"
+        )
+    return mime_type
+
+def validate_image_dimensions(contents: bytes) -> ImageSource:
+    """Parse the image header once and validate dimensions"""
+    try:
+        source = ImageSource(contents)
     except Exception as e:
         raise HTTPException(status_code=400, detail="Invalid image file")
+    
+    if source.width > MAX_DIMENSION or source.height > MAX_DIMENSION:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Image dimensions too large. Maximum: {MAX_DIMENSION}x{MAX_DIMENSION}px"
+        )
+    
+    return source
 
-def validate_image_dimensions(contents: bytes) -> tuple:
-    """Validate image dimensions"""
+async def resolve_model(version: Optional[str], pin: bool = True):
+    """
+    Look up a loaded model version, mapping failures to HTTP errors.
+    With pin=True the version can't be retired by a swap until the caller
+    calls release() on it, which it must do when the request ends. Runs
+    off the event loop: with a model host the lookup is a socket round trip.
+    """
+    lookup = asyncio.ensure_future(asyncio.to_thread(model_manager.get, version, pin=pin))
     try:
-        img = Image.open(io.BytesIO(contents))
-        width, height = img.size
-        
-        if width > MAX_DIMENSION or height > MAX_DIMENSION:
+        return await asyncio.shield(lookup)
+    except asyncio.CancelledError:
+        if pin:
+            # The lookup still finishes in its thread; drop the pin it takes
+            lookup.add_done_callback(lambda done: done.exception() is None and done.result().release())
+        raise
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown model version: {version}")
+    except Exception as e:
+        logger.error(f"Model unavailable: {e}")
+        raise HTTPException(status_code=503, detail="Model not available")
+
+def accepted_media_types(accept: Optional[str]) -> list:
+    """Media types from an Accept header, most preferred first (q=0 dropped)"""
+    if not accept:
+        return []
+    
+    preferences = []
+    for position, entry in enumerate(accept.split(",")):
+        media_type, *params = [part.strip() for part in entry.split(";")]
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            preferences.append((-quality, position, media_type.lower()))
+    return [media_type for _, _, media_type in sorted(preferences)]
+
+def wants_binary(accept: Optional[str]) -> bool:
+    """
+    Content negotiation for enhance_v2: True when the Accept header prefers
+    an image type over JSON. Missing or wildcard Accept keeps the JSON form.
+    """
+    for media_type in accepted_media_types(accept):
+        if media_type.startswith("image/"):
+            return True
+        if media_type in ("application/json", "application/*", "*/*"):
+            return False
+    return False
+
+def choose_output_format(accept: Optional[str], requested: Optional[str], mime_type: str) -> str:
+    """
+    Output format: an explicit ?format= wins, then the first specific image
+    type in Accept we can write; otherwise the upload's own format.
+    """
+    if requested:
+        name = normalize_output_format(requested)
+        if name is None:
             raise HTTPException(
                 status_code=400,
-                detail=f"Image dimensions too large. Maximum: {MAX_DIMENSION}x{MAX_DIMENSION}px"
+                detail=f"Invalid format. Allowed: {', '.join(SUPPORTED_OUTPUT_FORMATS)}"
             )
-        
-        return width, height
-    except Exception as e:
-        raise HTTPException(status_code=400, detail="Invalid image file")
+        return name
+    for media_type in accepted_media_types(accept):
+        if media_type.startswith("image/"):
+            name = normalize_output_format(media_type[len("image/"):])
+            if name is not None:
+                return name
+    return "jpeg" if mime_type == "image/jpeg" else "png"
+
+def validate_quality(quality: Optional[int]):
+    if quality is not None and not 1 <= quality <= 100:
+        raise HTTPException(status_code=400, detail="quality must be between 1 and 100")
+
+def build_enhance_response(request: Request, img_bytes: bytes, meta: dict, timer: StageTimer, cached: bool = False) -> Response:
+    """
+    Wrap encoded image bytes in the enhance_v2 response.
+    Clients sending Accept: image/* get the raw bytes with metadata in
+    headers; everyone else gets the base64 JSON form.
+    """
+    headers = {"Server-Timing": timer.server_timing(), "Vary": "Accept"}
+    
+    if wants_binary(request.headers.get("accept")):
+        headers.update({
+            "X-Image-Format": meta["format"],
+            "X-Enhance-Mode": meta["mode"],
+            "X-Model-Version": meta["model_version"],
+            "X-Original-Width": str(meta["original_size"]["width"]),
+            "X-Original-Height": str(meta["original_size"]["height"]),
+            "X-Output-Width": str(meta["output_size"]["width"]),
+            "X-Output-Height": str(meta["output_size"]["height"]),
+            # Entries cached before inference_size was recorded ran at the output size
+            "X-Inference-Width": str(meta.get("inference_size", meta["output_size"])["width"]),
+            "X-Inference-Height": str(meta.get("inference_size", meta["output_size"])["height"]),
+            "X-Inference-Time-Ms": str(timer.timings.get("inference", 0.0)),
+            "X-Cache": "HIT" if cached else "MISS",
+        })
+        return Response(content=img_bytes, media_type=f"image/{meta['format']}", headers=headers)
+    
+    # Encode to base64
+    base64_encoded_image = base64.b64encode(img_bytes).decode('utf-8')
+    
+    return JSONResponse({
+        "image": base64_encoded_image,
+        **meta,
+        "cached": cached,
+        "timings_ms": timer.timings
+    }, headers=headers)
 
 @router.post("/enhance_v2")
 @limiter.limit("10/minute")
-async def enhance_image(request: Request, file: UploadFile = File(...)):
+async def enhance_image(
+    request: Request,
+    file: UploadFile = File(...),
+    mode: str = "fast",
+    model_version: Optional[str] = None,
+    format: Optional[str] = None,
+    quality: Optional[int] = None,
+    tier: Optional[str] = None
+):
     """
     Enhance a low-light image with proper validation.
+    mode=fast runs the model at IMG_SIZE, or with tier (low, standard,
+    high) or ADAPTIVE_RESOLUTION at a size chosen from the input size,
+    the tier and server load; mode=full enhances at the original
+    resolution using overlapping tiles.
+    model_version selects a loaded weights version (default: active).
+    format (png, jpeg, webp, avif) or an Accept image type picks the
+    output encoding; quality applies to the lossy formats.
     """
     logger.info("enhance_image endpoint called")
     
-    # Read file in chunks to prevent memory issues
-    file_size = 0
-    chunks = []
-    
-    try:
-        while chunk := await file.read(8192):  # 8KB chunks
-            file_size += len(chunk)
-            validate_file_size(file_size)  # Check on each chunk
-            chunks.append(chunk)
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=400, detail="Error reading file")
+    if mode not in ENHANCE_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid mode. Allowed: {', '.join(ENHANCE_MODES)}"
+        )
     
-    contents = b''.join(chunks)
+    timer = StageTimer(endpoint="enhance_v2")
     
-    # Validate file type using magic numbers
-    mime_type = validate_image_type(contents)
+    # Size and file signature are checked before the body is read
+    with timer.stage("read"):
+        contents, mime_type = await read_image_upload(file, timer)
+    file_size = len(contents)
+    BYTES_IN.observe(file_size, endpoint="enhance_v2")
     
-    # Validate image dimensions
-    width, height = validate_image_dimensions(contents)
+    # Determine output format
+    fmt = choose_output_format(request.headers.get("accept"), format, mime_type)
+    validate_quality(quality)
+    if tier is not None and tier not in QUALITY_TIERS:
+        raise HTTPException(status_code=400, detail=f"Invalid tier. Allowed: {', '.join(QUALITY_TIERS)}")
+    adaptive = mode == "fast" and (tier is not None or ADAPTIVE_RESOLUTION)
+    tier = (tier or RESOLUTION_DEFAULT_TIER) if adaptive else None
     
-    logger.info(f"Valid image: {mime_type}, {width}x{height}, {file_size/1024:.1f}KB")
+    # Pin the model version now; a concurrent swap won't retire it under this request
+    model = await resolve_model(model_version)
     
     try:
-        # Preprocess
-        input_tensor = process_image(contents)
+        # Identical uploads skip decode, inference and encode entirely
+        key = None
+        if result_cache.enabled:
+            def lookup():
+                # Hashing the upload and reading the disk tier both block
+                # bf16 and fp32 runs of the same weights differ slightly
+                precision = getattr(model, "precision", "fp32")
+                digest = cache_key(contents, model.version, model.backend, precision, fmt, quality, mode, tier)
+                return digest, result_cache.get(digest)
         
-        # Inference
-        output_tensor = model_manager.predict(input_tensor)
+            with timer.stage("cache"):
+                key, cached = await inference_executor.run(lookup)
+            if cached is not None:
+                img_bytes, meta = cached
+                logger.info(f"Cache hit for {key[:12]}")
+                BYTES_OUT.observe(len(img_bytes), endpoint="enhance_v2")
+                with timer.stage("response"):
+                    response = build_enhance_response(request, img_bytes, meta, timer, cached=True)
+                return response
         
-        # Determine format
-        fmt = "JPEG" if mime_type == "image/jpeg" else "PNG"
+        # Parse the header once; dimensions are read without decoding
+        with timer.stage("validate"):
+            source = validate_image_dimensions(contents)
+        width, height = source.width, source.height
         
-        # Convert tensor to bytes
-        img_bytes = tensor_to_bytes(output_tensor, format=fmt)
+        logger.info(f"Valid image: {mime_type}, {width}x{height}, {file_size/1024:.1f}KB")
         
-        # Encode to base64
-        base64_encoded_image = base64.b64encode(img_bytes).decode('utf-8')
+        size = (IMG_SIZE, IMG_SIZE)
+        shed = False
+        if adaptive:
+            # Load before this request is admitted
+            load = inference_executor.in_flight / inference_executor.capacity
+            size = choose_resolution(width, height, tier, load)
+            shed = load_pressure(load) > 0
         
-        return JSONResponse({
-            "image": base64_encoded_image,
-            "format": fmt.lower(),
-            "original_size": {"width": width, "height": height}
-        })
+        async with inference_executor.admit():
+            img_bytes, meta = await enhance_source(
+                source, model, mode, fmt, quality, size=size, run=inference_executor.run, timer=timer
+            )
+        
+        if adaptive:
+            meta.update(tier=tier, degraded=shed)
+        # Results shrunk by load would otherwise be served to later, idle-time requests
+        if key is not None and not shed:
+            await inference_executor.run(result_cache.put, key, img_bytes, meta)
+        
+        BYTES_OUT.observe(len(img_bytes), endpoint="enhance_v2")
+        logger.info(f"Enhanced image in {timer.timings}")
+        with timer.stage("response"):
+            response = build_enhance_response(request, img_bytes, meta, timer)
+        return response
     
+    except QueueFullError:
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy. Please retry shortly.",
+            headers={"Retry-After": str(INFERENCE_RETRY_AFTER_S)}
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Enhancement failed: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Image enhancement failed")
+    finally:
+        model.release()
+
+def unpack_archive(data: bytes) -> list:
+    """
+    Extract (filename, bytes) pairs from a zip archive, skipping
+    directories. Entries that exceed the per-file limit or can't be
+    inflated get an HTTPException in place of their bytes, so they fail
+    on their own.
+    """
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(data))
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="Invalid zip archive")
+    
+    entries = [info for info in archive.infolist() if not info.is_dir()]
+    if len(entries) > BULK_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Too many files. Maximum: {BULK_MAX_FILES}")
+    
+    items = []
+    for info in entries:
+        try:
+            # Declared size is checked before inflating to guard against zip bombs
+            validate_file_size(info.file_size)
+            items.append((info.filename, archive.read(info)))
+        except HTTPException as e:
+            items.append((info.filename, e))
+        except (zipfile.BadZipFile, zlib.error, EOFError, RuntimeError, NotImplementedError) as e:
+            # Bad CRC, truncated data, encrypted or unsupported compression
+            logger.warning(f"Unreadable archive entry {info.filename}: {e}")
+            items.append((info.filename, HTTPException(status_code=400, detail="Unreadable archive entry")))
+    return items
+
+def release_once(*callbacks):
+    """
+    A function running each of `callbacks` on its first call only.
+    Streaming responses call it when the body ends and again from a
+    BackgroundTask, which also covers clients that disconnect before the
+    body starts.
+    """
+    pending = list(callbacks)
+    
+    def release():
+        while True:
+            try:
+                callback = pending.pop()
+            except IndexError:
+                return
+            callback()
+    return release
+
+def decode_bulk_item(contents: bytes) -> tuple:
+    """Validate and decode one bulk upload -> (tensor, mime_type, width, height)"""
+    mime_type = validate_image_type(contents)
+    source = validate_image_dimensions(contents)
+    return source.to_tensor((IMG_SIZE, IMG_SIZE)), mime_type, source.width, source.height
+
+@router.post("/enhance_batch")
+@limiter.limit("5/minute")
+async def enhance_batch(
+    request: Request,
+    files: List[UploadFile] = File(None),
+    archive: Optional[UploadFile] = File(None),
+    model_version: Optional[str] = None,
+    format: Optional[str] = None,
+    quality: Optional[int] = None
+):
+    """
+    Enhance many images in one request.
+    Accepts several `files` parts or a zip `archive`. Images are decoded in
+    parallel, run through the model BULK_BATCH_SIZE at a time, and streamed
+    back as NDJSON lines in completion order. A bad image yields an error
+    line for that item only.
+    """
+    items = []
+    if archive is not None:
+        contents, _ = await read_upload(archive, MAX_FILE_SIZE * BULK_MAX_FILES)
+        items = unpack_archive(contents)
+    for upload in files or []:
+        if len(items) >= BULK_MAX_FILES:
+            raise HTTPException(status_code=400, detail=f"Too many files. Maximum: {BULK_MAX_FILES}")
+        try:
+            contents, _ = await read_upload(upload)
+            items.append((upload.filename, contents))
+        except HTTPException as e:
+            if e.status_code != 413:
+                raise
+            items.append((upload.filename, e))
+    if not items:
+        raise HTTPException(status_code=400, detail="No files uploaded")
+    validate_quality(quality)
+    if format is not None:
+        # Reject an unknown format up front rather than on every item
+        choose_output_format(None, format, None)
+    
+    model = await resolve_model(model_version)
+    
+    # The whole batch holds one executor slot and the model pin until the stream finishes
+    if not inference_executor.try_acquire():
+        model.release()
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy. Please retry shortly.",
+            headers={"Retry-After": str(INFERENCE_RETRY_AFTER_S)}
+        )
+    release = release_once(inference_executor.release, model.release)
+    
+    lines = asyncio.Queue()
+    
+    def error_line(index: int, filename: str, e: Exception) -> dict:
+        detail = e.detail if isinstance(e, HTTPException) else "Image enhancement failed"
+        return {"index": index, "filename": filename, "status": "error", "detail": detail}
+    
+    async def decode(index: int, filename: str, contents):
+        try:
+            # Oversized or unreadable entries carry their error so they get their own line
+            if isinstance(contents, HTTPException):
+                raise contents
+            return index, filename, await inference_executor.run(decode_bulk_item, contents)
+        except Exception as e:
+            await lines.put(error_line(index, filename, e))
+            return None
+    
+    async def enhance_chunk(chunk: list):
+        try:
+            batch = torch.cat([decoded[0] for _, _, decoded in chunk], dim=0)
+            outputs = await asyncio.wrap_future(model.submit(batch))
+        except Exception as e:
+            logger.error(f"Batch enhancement failed: {e}", exc_info=True)
+            for index, filename, _ in chunk:
+                await lines.put(error_line(index, filename, e))
+            return
+        
+        async def encode(item, output):
+            index, filename, (_, mime_type, width, height) = item
+            try:
+                fmt = choose_output_format(None, format, mime_type)
+                img_bytes = await inference_executor.run(tensor_to_bytes, output, format=fmt, quality=quality)
+            except Exception as e:
+                await lines.put(error_line(index, filename, e))
+                return
+            await lines.put({
+                "index": index,
+                "filename": filename,
+                "status": "ok",
+                "format": fmt,
+                "model_version": model.version,
+                "original_size": {"width": width, "height": height},
+                "image": base64.b64encode(img_bytes).decode('utf-8'),
+            })
+        
+        await asyncio.gather(*(encode(item, output) for item, output in zip(chunk, outputs)))
+    
+    # Every task the batch starts, so an aborted stream can cancel them all
+    tasks = []
+    
+    async def pipeline():
+        chunk_tasks = []
+        chunk = []
+        try:
+            decodes = [asyncio.create_task(decode(i, name, data)) for i, (name, data) in enumerate(items)]
+            tasks.extend(decodes)
+            for next_decoded in asyncio.as_completed(decodes):
+                decoded = await next_decoded
+                if decoded is None:
+                    continue
+                chunk.append(decoded)
+                if len(chunk) >= BULK_BATCH_SIZE:
+                    chunk_tasks.append(asyncio.create_task(enhance_chunk(chunk)))
+                    tasks.append(chunk_tasks[-1])
+                    chunk = []
+            if chunk:
+                chunk_tasks.append(asyncio.create_task(enhance_chunk(chunk)))
+                tasks.append(chunk_tasks[-1])
+            await asyncio.gather(*chunk_tasks)
+        finally:
+            await lines.put(None)
+    
+    async def close():
+        """Cancel whatever is still running, then free the slot and the pin once it has unwound"""
+        for task in tasks:
+            task.cancel()
+        drained = asyncio.gather(*tasks, return_exceptions=True)
+        drained.add_done_callback(lambda _: release())
+        # A disconnect cancels this coroutine too; the release still waits for the tasks
+        await asyncio.shield(drained)
+    
+    async def stream():
+        tasks.append(asyncio.create_task(pipeline()))
+        try:
+            while (line := await lines.get()) is not None:
+                yield json.dumps(line) + "\n"
+        finally:
+            await close()
+    
+    logger.info(f"enhance_batch: {len(items)} images")
+    return StreamingResponse(stream(), media_type="application/x-ndjson", background=BackgroundTask(close))
+
+@router.post("/enhance_video")
+@limiter.limit("2/minute")
+async def enhance_video(
+    request: Request,
+    file: UploadFile = File(...),
+    mode: str = "fast",
+    output: str = "zip",
+    model_version: Optional[str] = None,
+    format: Optional[str] = None,
+    quality: Optional[int] = None
+):
+    """
+    Enhance a video clip, an animated GIF/WebP/PNG or a zip of frames.
+    Frames go through the model VIDEO_BATCH_SIZE at a time and the result
+    (`output`: zip of frames, mp4 or webm) streams back as it is encoded.
+    Near-duplicate consecutive frames reuse the previous output; `format`
+    and `quality` apply to the frames in a zip, `quality` to the video.
+    """
+    if mode not in ENHANCE_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid mode. Allowed: {', '.join(ENHANCE_MODES)}"
+        )
+    if output not in SEQUENCE_OUTPUTS:
+        raise HTTPException(status_code=400, detail=f"Invalid output. Allowed: {', '.join(SEQUENCE_OUTPUTS)}")
+    validate_quality(quality)
+    frame_format = choose_output_format(None, format, None)
+    
+    contents, _ = await read_upload(file, VIDEO_MAX_FILE_SIZE_MB * 1024 * 1024)
+    try:
+        if output in VIDEO_OUTPUTS:
+            require_av()
+        source = await inference_executor.run(FrameSource, contents, MAX_FILE_SIZE, MAX_DIMENSION)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if source.width > MAX_DIMENSION or source.height > MAX_DIMENSION:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Frame dimensions too large. Maximum: {MAX_DIMENSION}x{MAX_DIMENSION}px"
+        )
+    if source.frame_count and source.frame_count > VIDEO_MAX_FRAMES:
+        raise HTTPException(status_code=400, detail=f"Too many frames. Maximum: {VIDEO_MAX_FRAMES}")
+    
+    model = await resolve_model(model_version)
+    
+    # The whole clip holds one executor slot and the model pin until the stream finishes
+    if not inference_executor.try_acquire():
+        model.release()
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy. Please retry shortly.",
+            headers={"Retry-After": str(INFERENCE_RETRY_AFTER_S)}
+        )
+    
+    release = release_once(inference_executor.release, model.release)
+    stats = {}
+    chunks = stream_sequence(
+        source, model, output, frame_format, quality,
+        size=None if mode == "full" else (IMG_SIZE, IMG_SIZE), stats=stats, run=inference_executor.run,
+    )
+    
+    async def stream():
+        try:
+            # Each step decodes, enhances and encodes at most one batch of frames
+            async for chunk in chunks:
+                yield chunk
+        except Exception as e:
+            # Headers are already sent; the truncated body is all we can signal
+            logger.error(f"Video enhancement failed: {e}", exc_info=True)
+        finally:
+            release()
+            logger.info(f"enhance_video: {source.kind} -> {output}, {stats}")
+    
+    media_type = "application/zip" if output == "zip" else VIDEO_OUTPUTS[output][0]
+    return StreamingResponse(
+        stream(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="enhanced.{output}"'},
+        background=BackgroundTask(release),
+    )
+
+@router.post("/jobs", status_code=202)
+@limiter.limit("10/minute")
+async def create_job(
+    request: Request,
+    file: UploadFile = File(...),
+    mode: str = "fast",
+    model_version: Optional[str] = None,
+    format: Optional[str] = None,
+    quality: Optional[int] = None
+):
+    """
+    Queue an enhancement and return immediately with a job id.
+    Poll /jobs/{id}, or follow /jobs/{id}/events (server-sent events),
+    then download /jobs/{id}/result.
+    """
+    if mode not in ENHANCE_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid mode. Allowed: {', '.join(ENHANCE_MODES)}"
+        )
+    
+    contents, mime_type = await read_image_upload(file)
+    validate_image_dimensions(contents)
+    # Only the version id is needed here; the worker pins it while it runs
+    model = await resolve_model(model_version, pin=False)
+    
+    validate_quality(quality)
+    params = {
+        "mode": mode,
+        "model_version": model.version,
+        "format": choose_output_format(request.headers.get("accept"), format, mime_type),
+        "quality": quality,
+    }
+    try:
+        job = job_queue.submit(contents, params)
+    except QueueFullError:
+        raise HTTPException(
+            status_code=503,
+            detail="Job queue full. Please retry shortly.",
+            headers={"Retry-After": str(INFERENCE_RETRY_AFTER_S)}
+        )
+    
+    return {
+        **job,
+        "status_url": f"{request.url_for('get_job', job_id=job['id']).path}",
+        "events_url": f"{request.url_for('job_events', job_id=job['id']).path}",
+        "result_url": f"{request.url_for('get_job_result', job_id=job['id']).path}",
+    }
+
+def find_job(job_id: str) -> dict:
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Job status, progress and (once done) result metadata.
+    """
+    return public_view(find_job(job_id))
+
+@router.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """
+    Download the enhanced image of a finished job.
+    """
+    job = find_job(job_id)
+    if job["status"] == FAILED:
+        raise HTTPException(status_code=422, detail=f"Job failed: {job['error']}")
+    if job["status"] != DONE:
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return Response(content=job["result"], media_type=f"image/{job['meta']['format']}")
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Server-sent events stream of job progress; ends when the job finishes.
+    """
+    find_job(job_id)
+    
+    async def stream():
+        last = None
+        while True:
+            job = job_queue.get(job_id)
+            if job is None:
+                yield "event: error\ndata: {\"detail\": \"Job not found\"}\n\n"
+                return
+            view = public_view(job)
+            state = (view["status"], view["progress"])
+            if state != last:
+                last = state
+                event = view["status"] if view["status"] in (DONE, FAILED) else "progress"
+                yield f"event: {event}\ndata: {json.dumps(view)}\n\n"
+            if view["status"] in (DONE, FAILED):
+                return
+            await asyncio.sleep(JOB_EVENTS_INTERVAL_S)
+    
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+class ModelLoadRequest(BaseModel):
+    filename: str  # Weights file inside MODEL_DIR
+    version: Optional[str] = None  # Defaults to a hash of the file
+    activate: bool = True
+
+class ModelActivateRequest(BaseModel):
+    version: str
+
+def require_admin(request: Request) -> None:
+    """Model admin endpoints need X-Admin-Token to match ADMIN_TOKEN"""
+    if not ADMIN_TOKEN or request.headers.get("x-admin-token") != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+@router.get("/models")
+async def list_models():
+    """
+    List loaded model versions and which one is active.
+    """
+    return {"models": await asyncio.to_thread(model_manager.list_models)}
+
+@router.post("/models/load", status_code=202)
+async def load_model_version(request: Request, body: ModelLoadRequest):
+    """
+    Load a new weights version in the background, warm it up and (by
+    default) swap it in once ready. Poll /models to see when it is live.
+    """
+    require_admin(request)
+    
+    path = (MODEL_DIR / body.filename).resolve()
+    if path.parent != MODEL_DIR.resolve() or not path.is_file():
+        raise HTTPException(status_code=404, detail="Weights file not found")
+    
+    await asyncio.to_thread(model_manager.load_weights_async, path, version=body.version, activate=body.activate)
+    return {"status": "loading", "filename": body.filename}
+
+@router.post("/models/activate")
+async def activate_model_version(request: Request, body: ModelActivateRequest):
+    """
+    Make an already-loaded version the default.
+    """
+    require_admin(request)
+    try:
+        await asyncio.to_thread(model_manager.activate, body.version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown model version: {body.version}")
+    return {"status": "active", "version": body.version}
 
 @router.post("/analyze")
 @limiter.limit("30/minute")
 async def analyze_image_endpoint(request: Request, file: UploadFile = File(...)):
     """
     Analyze if an image is low-light.
+    Returns brightness, a luminance histogram, a noise estimate and a
+    recommendation; runs on a reduced decode without the model.
     """
-    if file.content_type not in ["image/jpeg", "image/png"]:
-        raise HTTPException(status_code=400, detail="Invalid file type")
+    contents, _ = await read_image_upload(file)
+    source = validate_image_dimensions(contents)
 
     try:
-        contents = await file.read()
-        tensor = process_image(contents)
-        result = analyze_brightness(tensor)
-        return result
+        # Cheap and model-free: the default thread pool, not the inference workers
+        return await asyncio.to_thread(analyze_image, source.image)
     except Exception as e:
         logger.error(f"Error analyzing image: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@router.post("/analyze_batch")
+@limiter.limit("10/minute")
+async def analyze_batch(request: Request, files: List[UploadFile] = File(...)):
+    """
+    Analyze up to BULK_MAX_FILES images in parallel.
+    Each result carries its filename; bad images get an error entry.
+    """
+    if len(files) > BULK_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Too many files. Maximum: {BULK_MAX_FILES}")
+
+    async def analyze(upload: UploadFile) -> dict:
+        try:
+            contents, _ = await read_image_upload(upload)
+            source = validate_image_dimensions(contents)
+            result = await asyncio.to_thread(analyze_image, source.image)
+            return {"filename": upload.filename, "status": "ok", **result}
+        except HTTPException as e:
+            return {"filename": upload.filename, "status": "error", "detail": e.detail}
+        except Exception as e:
+            logger.error(f"Error analyzing {upload.filename}: {e}")
+            return {"filename": upload.filename, "status": "error", "detail": "Analysis failed"}
+
+    return {"results": await asyncio.gather(*(analyze(upload) for upload in files))}
+
 class FeedbackRequest(BaseModel):
     rating: bool  # True (Up) / False (Down)
     is_low_light: bool
@@ -151,20 +834,13 @@ class FeedbackRequest(BaseModel):
 @router.post("/feedback")
 async def submit_feedback(feedback: FeedbackRequest):
     """
-    Store user feedback and metadata in Supabase.
+    Queue user feedback and metadata for a batched insert into Supabase.
     """
-    try:
-        from backend.config import SUPABASE_URL
-        if "your-project" in SUPABASE_URL or not SUPABASE_URL:
-            return {"status": "skipped", "message": "Supabase not configured"}
-
-        data = feedback.dict()
-        response = supabase.table("feedback").insert(data).execute()
-        return {"status": "success", "data": response.data}
-    except Exception as e:
-        logger.error(f"Error submitting feedback: {e}")
-        # Don't block the UI if analytics (feedback) fails
-        return {"status": "error", "message": str(e)}
+    if not storage.enabled:
+        return {"status": "skipped", "message": "Supabase not configured"}
+    # Buffered and written in the background; never blocks the UI
+    storage.feedback.add(feedback.dict())
+    return {"status": "queued"}
 
 @router.post("/share")
 @limiter.limit("5/minute")
@@ -176,97 +852,48 @@ async def share_result(
     """
     Upload images to public storage and create a shareable link.
     """
-    try:
-        from backend.config import SUPABASE_URL
-        if "your-project" in SUPABASE_URL or not SUPABASE_URL:
-            raise HTTPException(
-                status_code=503, 
-                detail="Sharing disabled. Please configure SUPABASE_URL in backend/.env"
-            )
-
-        import uuid
-        import time
-        
-        # Generate unique paths
-        req_id = str(uuid.uuid4())
-        timestamp = int(time.time())
-        orig_path = f"public/{req_id}_{timestamp}_orig.png"
-        enh_path = f"public/{req_id}_{timestamp}_enh.png"
-        
-        # Upload Original
-        orig_content = await original.read()
-        supabase.storage.from_("lumeo-images").upload(
-            orig_path, 
-            orig_content, 
-            {"content-type": "image/png"}
+    if not storage.enabled:
+        raise HTTPException(
+            status_code=503,
+            detail="Sharing disabled. Please configure SUPABASE_URL in backend/.env"
         )
-        
-        # Upload Enhanced
-        enh_content = await enhanced.read()
-        supabase.storage.from_("lumeo-images").upload(
-            enh_path, 
-            enh_content, 
-            {"content-type": "image/png"}
+
+    orig_content, _ = await read_upload(original)
+    enh_content, _ = await read_upload(enhanced)
+    try:
+        share_id = await storage.share(
+            (orig_content, sniff_mime_type(orig_content[:16]) or "image/png"),
+            (enh_content, sniff_mime_type(enh_content[:16]) or "image/png"),
         )
-        
-        # Get Public URLs
-        orig_url = supabase.storage.from_("lumeo-images").get_public_url(orig_path)
-        enh_url = supabase.storage.from_("lumeo-images").get_public_url(enh_path)
-        
-        # Insert into DB
-        data = {
-            "original_url": orig_url,
-            "enhanced_url": enh_url
-        }
-        db_res = supabase.table("shared_results").insert(data).execute()
-        
-        return {"id": db_res.data[0]['id']}
-        
     except Exception as e:
         logger.error(f"Error sharing result: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    return {"id": share_id}
 
 @router.get("/shared/{share_id}")
 async def get_shared_result(share_id: str):
     """
     Retrieve shared result details.
     """
+    if not storage.enabled:
+        raise HTTPException(status_code=503, detail="Sharing disabled")
     try:
-        response = supabase.table("shared_results").select("*").eq("id", share_id).execute()
-        if not response.data:
-            raise HTTPException(status_code=404, detail="Shared result not found")
-        return response.data[0]
+        row = await storage.get_shared(share_id)
     except Exception as e:
         logger.error(f"Error fetching shared result: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    if row is None:
+        raise HTTPException(status_code=404, detail="Shared result not found")
+    return row
 
 @router.api_route("/health", methods=["GET", "HEAD"])
 async def health_check():
     """
     Health check endpoint for monitoring.
-    Returns service status, model status, and system metrics.
+    Returns the latest background snapshot of service, model and system stats.
     """
     try:
-        # Check model is loaded
-        model_loaded = model_manager.model is not None
-        
-        # System metrics
-        cpu_percent = psutil.cpu_percent(interval=0.1)
-        memory = psutil.virtual_memory()
-        
-        return {
-            "status": "healthy" if model_loaded else "degraded",
-            "timestamp": datetime.utcnow().isoformat(),
-            "model": {
-                "loaded": model_loaded,
-                "device": str(next(model_manager.model.parameters()).device) if model_loaded else None
-            },
-            "system": {
-                "cpu_percent": cpu_percent,
-                "memory_percent": memory.percent,
-                "memory_available_gb": memory.available / (1024**3)
-            }
-        }
+        return health_monitor.snapshot()
     except Exception as e:
         logger.error(f"Health check failed: {e}")
         return {
@@ -274,3 +901,17 @@ async def health_check():
             "timestamp": datetime.utcnow().isoformat(),
             "error": "Health check failed"
         }
+
+@router.api_route("/livez", methods=["GET", "HEAD"])
+async def liveness():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "alive"}
+
+@router.api_route("/readyz", methods=["GET", "HEAD"])
+async def readiness():
+    """Readiness probe: 503 until the model is warmed up, or while the inference queue is full"""
+    # Off the event loop: with a model host this asks the host
+    ready, reasons = await asyncio.to_thread(health_monitor.readiness)
+    if not ready:
+        return JSONResponse(status_code=503, content={"status": "not ready", "reasons": reasons})
+    return {"status": "ready"}
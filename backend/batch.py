@@ -0,0 +1,265 @@
+"""
+Offline bulk enhancement.
+
+    python -m backend.batch photos/ --output enhanced/ --format jpeg
+    python -m backend.batch manifest.txt --root /data/photos --output enhanced/
+
+Walks a directory (recursively) or a manifest of paths, one per line,
+and writes each enhanced image under --output at the same relative path,
+with the output format's extension appended (a.jpg -> a.jpg.png).
+A process pool decodes and encodes while this process runs batched
+inference in between, with a bounded number of images in flight. Outputs
+are written atomically, and every finished input is appended to a
+checkpoint file, so an interrupted run picks up where it stopped.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Iterator
+import torch
+from backend.config import IMG_SIZE
+from backend.core.image import process_image, process_image_full, tensor_to_bytes, normalize_output_format
+
+logger = logging.getLogger("lumeo")
+
+INPUT_EXTENSIONS = (".jpg", ".jpeg", ".png")
+CHECKPOINT_NAME = ".lumeo-batch.checkpoint"
+PROGRESS_INTERVAL_S = 10
+
+class Checkpoint:
+    """Append-only log of finished inputs (relative paths, one per line)"""
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.done = set()
+        if self.path.exists():
+            # A torn last line from a crash just won't match, so that input is redone
+            self.done = set(self.path.read_text().splitlines())
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a")
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.done
+
+    def record(self, name: str):
+        self._file.write(name + "\n")
+        self._file.flush()
+        self.done.add(name)
+
+    def close(self):
+        self._file.close()
+
+def find_inputs(source: Path, root: Path = None) -> Iterator[tuple]:
+    """
+    (relative name, path) for each image in a directory tree, or for each
+    line of a manifest file (relative lines resolve against `root`, default
+    the manifest's directory). Lazy, so millions of files never sit in memory.
+    """
+    if source.is_dir():
+        for directory, subdirs, files in os.walk(source):
+            subdirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(INPUT_EXTENSIONS):
+                    path = Path(directory) / name
+                    yield path.relative_to(source).as_posix(), path
+        return
+
+    root = root or source.parent
+    with open(source) as manifest:
+        for line in manifest:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            path = root / line
+            try:
+                name = path.relative_to(root).as_posix()
+            except ValueError:
+                # Absolute path outside the root: keep the tree below its anchor
+                name = path.relative_to(path.anchor).as_posix()
+            yield name, path
+
+def output_path(output_dir: Path, name: str, format: str) -> Path:
+    """Where `name` is written: its extension is kept, so a.jpg and a.png don't collide"""
+    extension = "jpg" if format == "jpeg" else format
+    return output_dir / f"{name}.{extension}"
+
+def _init_worker():
+    # Workers are single-threaded; the parallelism comes from the pool
+    torch.set_num_threads(1)
+
+def decode_file(name: str, path: str, mode: str) -> tuple:
+    """Worker: read and decode one input -> (name, float32 array [1, 3, H, W])"""
+    contents = Path(path).read_bytes()
+    tensor = process_image_full(contents) if mode == "full" else process_image(contents)
+    return name, tensor.numpy()
+
+def encode_file(name: str, pixels, path: str, format: str, quality: int = None) -> str:
+    """Worker: encode one output and write it atomically (temp file + rename)"""
+    img_bytes = tensor_to_bytes(torch.from_numpy(pixels), format=format, quality=quality)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(temp, "wb") as f:
+        f.write(img_bytes)
+    os.replace(temp, path)
+    return name
+
+def infer(manager, tensors: list, mode: str) -> list:
+    """Outputs for decoded inputs: one batched pass (fast) or tiled per image (full)"""
+    if mode == "full":
+        from backend.core.tiling import tiled_predict
+        return [tiled_predict(tensor, manager.predict) for tensor in tensors]
+    outputs = manager.predict(torch.cat(tensors))
+    return [outputs[i:i + 1] for i in range(len(tensors))]
+
+def run(manager, inputs: Iterator[tuple], output_dir: Path, checkpoint: Checkpoint, pool,
+        mode: str = "fast", format: str = "png", quality: int = None,
+        batch_size: int = 16, max_in_flight: int = 64) -> dict:
+    """
+    Pipeline: decode in the pool -> batched inference here -> encode and
+    write in the pool. At most `max_in_flight` images are decoding,
+    waiting for inference or encoding at once. Returns run statistics.
+    """
+    stats = {"enhanced": 0, "skipped": 0, "failed": 0}
+    decodes, encodes = {}, {}
+    ready = []
+    exhausted = False
+    start = last_report = time.perf_counter()
+
+    def flush(count: int):
+        batch, ready[:] = ready[:count], ready[count:]
+        names = [name for name, _ in batch]
+        try:
+            outputs = infer(manager, [torch.from_numpy(pixels) for _, pixels in batch], mode)
+        except Exception as e:
+            logger.error(f"Inference failed for a batch of {len(batch)}: {e}")
+            stats["failed"] += len(batch)
+            return
+        for name, output in zip(names, outputs):
+            future = pool.submit(encode_file, name, output.numpy(), str(output_path(output_dir, name, format)),
+                                 format, quality)
+            encodes[future] = name
+
+    while True:
+        while not exhausted and len(decodes) + len(ready) + len(encodes) < max_in_flight:
+            item = next(inputs, None)
+            if item is None:
+                exhausted = True
+                break
+            name, path = item
+            if name in checkpoint:
+                stats["skipped"] += 1
+                continue
+            decodes[pool.submit(decode_file, name, str(path), mode)] = name
+
+        # Full batches go straight away; a partial one once nothing else is decoding
+        if ready and (len(ready) >= batch_size or not decodes or mode == "full"):
+            flush(batch_size)
+            continue
+        if not decodes and not encodes:
+            break
+
+        done, _ = wait([*decodes, *encodes], return_when=FIRST_COMPLETED)
+        for future in done:
+            if future in decodes:
+                name = decodes.pop(future)
+                try:
+                    ready.append(future.result())
+                except Exception as e:
+                    logger.warning(f"Skipping {name}: {e}")
+                    stats["failed"] += 1
+            else:
+                name = encodes.pop(future)
+                try:
+                    checkpoint.record(future.result())
+                    stats["enhanced"] += 1
+                except Exception as e:
+                    logger.warning(f"Failed to write {name}: {e}")
+                    stats["failed"] += 1
+
+        now = time.perf_counter()
+        if now - last_report >= PROGRESS_INTERVAL_S:
+            last_report = now
+            logger.info(f"{stats['enhanced']} enhanced ({stats['enhanced'] / (now - start):.1f}/s), "
+                        f"{stats['skipped']} skipped, {stats['failed']} failed")
+
+    elapsed = time.perf_counter() - start
+    stats["seconds"] = round(elapsed, 2)
+    stats["images_per_s"] = round(stats["enhanced"] / elapsed, 2) if elapsed else 0.0
+    return stats
+
+def load_manager(weights: str = None, threads: int = None):
+    """A ModelManager owning this process's inference threads"""
+    from backend.core.model import ModelManager
+    from backend.core.threads import ThreadPolicy, default_policy
+
+    manager = ModelManager()
+    manager.policy = ThreadPolicy(threads) if threads else default_policy(workers=1)
+    manager.policy.apply()
+    if weights:
+        manager.load_weights(weights)
+    else:
+        manager.load_model()
+    return manager
+
+def main(argv=None) -> dict:
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Enhance a directory tree or manifest of images offline")
+    parser.add_argument("input", type=Path, help="Directory of images, or a manifest file with one path per line")
+    parser.add_argument("--output", type=Path, required=True, help="Output directory (mirrors input paths)")
+    parser.add_argument("--root", type=Path, default=None, help="Base for relative manifest paths")
+    parser.add_argument("--mode", choices=["fast", "full"], default="fast",
+                        help=f"fast: {IMG_SIZE}x{IMG_SIZE} output; full: native resolution, tiled")
+    parser.add_argument("--format", default="png", help="png, jpeg, webp or avif")
+    parser.add_argument("--quality", type=int, default=None, help="1-100 for lossy formats")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=max(1, cores // 2), help="Decode/encode processes")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="Inference threads (default: the cores left over by --workers)")
+    parser.add_argument("--max-in-flight", type=int, default=None,
+                        help="Images held in the pipeline at once (default: 4 batches)")
+    parser.add_argument("--weights", default=None, help="Weights file (default: MODEL_PATH)")
+    parser.add_argument("--checkpoint", type=Path, default=None,
+                        help=f"Progress file (default: OUTPUT/{CHECKPOINT_NAME})")
+    args = parser.parse_args(argv)
+
+    format = normalize_output_format(args.format)
+    if format is None:
+        parser.error(f"unsupported format '{args.format}'")
+    if args.quality is not None and not 1 <= args.quality <= 100:
+        parser.error("quality must be between 1 and 100")
+    if not args.input.exists():
+        parser.error(f"{args.input} does not exist")
+
+    manager = load_manager(args.weights, args.threads or max(1, cores - args.workers))
+    checkpoint = Checkpoint(args.checkpoint or args.output / CHECKPOINT_NAME)
+    logger.info(f"Resuming after {len(checkpoint.done)} finished inputs" if checkpoint.done else "Starting fresh")
+
+    # spawn: forking a process that already runs OpenMP threads can deadlock the children
+    pool = ProcessPoolExecutor(args.workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_init_worker)
+    try:
+        stats = run(
+            manager, find_inputs(args.input, args.root), args.output, checkpoint, pool,
+            mode=args.mode, format=format, quality=args.quality, batch_size=args.batch_size,
+            max_in_flight=args.max_in_flight or max(args.batch_size * 4, args.workers * 2),
+        )
+    except KeyboardInterrupt:
+        logger.warning("Interrupted; finished images are checkpointed, rerun to resume")
+        raise SystemExit(130)
+    finally:
+        pool.shutdown(cancel_futures=True)
+        checkpoint.close()
+        manager.shutdown()
+
+    print(json.dumps(stats))
+    return stats
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(0 if main()["failed"] == 0 else 1)
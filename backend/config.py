@@ -13,6 +13,9 @@ if env_path.exists():
 # Model settings - HF Spaces puts files at /app/models/
 # Check multiple possible locations
 def get_model_path():
+    # Explicit weights file, e.g. a distilled student (python -m backend.distill)
+    if os.getenv("MODEL_PATH"):
+        return Path(os.getenv("MODEL_PATH"))
     possible_paths = [
         Path("/app/models/lumeo_unet.pth"),  # HF Spaces Docker
         BASE_DIR / "models" / "lumeo_unet.pth",  # Local dev
@@ -25,11 +28,117 @@ def get_model_path():
     return possible_paths[0]
 
 MODEL_PATH = get_model_path()
+MODEL_NAME = os.getenv("MODEL_NAME", "lumeo-unet")
+# Weights version used in the registry and cache keys; derived from the weights file hash when unset
+MODEL_VERSION = os.getenv("MODEL_VERSION")
+# Directory new weight versions may be hot-loaded from, and how many versions stay loaded
+MODEL_DIR = Path(os.getenv("MODEL_DIR", str(MODEL_PATH.parent)))
+MODEL_KEEP_VERSIONS = int(os.getenv("MODEL_KEEP_VERSIONS", 2))
+# Token required by the model admin endpoints (disabled when unset)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
 DEVICE = os.getenv("DEVICE", "cpu")  # Can be overridden via env
 
+# Shared model host: Unix socket of a `python -m backend.core.model_host` process.
+# When set, web workers send tensors to it over shared memory instead of loading weights themselves
+MODEL_HOST = os.getenv("MODEL_HOST", "")
+MODEL_HOST_AUTHKEY = os.getenv("MODEL_HOST_AUTHKEY", "")
+if MODEL_HOST and not MODEL_HOST_AUTHKEY:
+    # Any local process that can reach the socket could otherwise drive the host
+    raise ValueError("MODEL_HOST_AUTHKEY must be set when MODEL_HOST is")
+
+# Inference backend: eager, torchscript, compile, int8 or onnx
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "eager")
+# Images used to calibrate int8 quantization (synthetic frames when unset)
+CALIBRATION_DIR = os.getenv("CALIBRATION_DIR", "")
+CALIBRATION_SAMPLES = int(os.getenv("CALIBRATION_SAMPLES", 16))
+# Numeric precision for the eager/compile backends: fp32, channels_last, bf16 or auto.
+# Falls back to fp32 on hosts without native bf16; auto keeps bf16 only within PRECISION_MIN_PSNR dB of fp32
+INFERENCE_PRECISION = os.getenv("INFERENCE_PRECISION", "fp32")
+PRECISION_MIN_PSNR = float(os.getenv("PRECISION_MIN_PSNR", 35.0))
+
+# CPU thread policy. Cores are split between the WEB_CONCURRENCY workers on the host;
+# 0 threads means an even share. INFERENCE_AUTOTUNE benchmarks thread counts at startup
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", 0))
+INFERENCE_INTEROP_THREADS = int(os.getenv("INFERENCE_INTEROP_THREADS", 0))
+INFERENCE_PIN_CORES = os.getenv("INFERENCE_PIN_CORES", "false").lower() == "true"
+CHANNELS_LAST = os.getenv("CHANNELS_LAST", "false").lower() == "true"
+INFERENCE_AUTOTUNE = os.getenv("INFERENCE_AUTOTUNE", "false").lower() == "true"
+
 # Image settings
 IMG_SIZE = 256
 
+# Output encoding defaults (match Pillow's); lossy formats accept a per-request ?quality=
+OUTPUT_PNG_COMPRESS_LEVEL = int(os.getenv("OUTPUT_PNG_COMPRESS_LEVEL", 6))
+OUTPUT_JPEG_QUALITY = int(os.getenv("OUTPUT_JPEG_QUALITY", 75))
+OUTPUT_JPEG_OPTIMIZE = os.getenv("OUTPUT_JPEG_OPTIMIZE", "false").lower() == "true"
+OUTPUT_JPEG_PROGRESSIVE = os.getenv("OUTPUT_JPEG_PROGRESSIVE", "false").lower() == "true"
+OUTPUT_WEBP_QUALITY = int(os.getenv("OUTPUT_WEBP_QUALITY", 80))
+OUTPUT_WEBP_METHOD = int(os.getenv("OUTPUT_WEBP_METHOD", 4))
+OUTPUT_AVIF_QUALITY = int(os.getenv("OUTPUT_AVIF_QUALITY", 75))
+OUTPUT_AVIF_SPEED = int(os.getenv("OUTPUT_AVIF_SPEED", 6))
+
+# Full-resolution tiled mode: tile size (multiple of 16), overlap and tiles per forward pass
+TILE_SIZE = int(os.getenv("TILE_SIZE", 256))
+TILE_OVERLAP = int(os.getenv("TILE_OVERLAP", 32))
+TILE_BATCH_SIZE = int(os.getenv("TILE_BATCH_SIZE", 4))
+
+# Adaptive fast-mode resolution: the inference size follows the input size, a
+# quality tier (?tier=) and executor load instead of a fixed IMG_SIZE square.
+# Requests passing ?tier= opt in even when ADAPTIVE_RESOLUTION is off.
+ADAPTIVE_RESOLUTION = os.getenv("ADAPTIVE_RESOLUTION", "false").lower() == "true"
+# Longest inference side per tier
+RESOLUTION_TIERS = os.getenv("RESOLUTION_TIERS", "low:256,standard:512,high:768")
+RESOLUTION_DEFAULT_TIER = os.getenv("RESOLUTION_DEFAULT_TIER", "standard")
+RESOLUTION_MIN = int(os.getenv("RESOLUTION_MIN", 128))
+# Executor load (in flight / capacity) past which resolution is shed; the long side halves at full load
+RESOLUTION_LOAD_KNEE = float(os.getenv("RESOLUTION_LOAD_KNEE", 0.5))
+# The long side snaps down to a multiple of this, so concurrent requests share shapes and batch together
+RESOLUTION_BUCKET = int(os.getenv("RESOLUTION_BUCKET", 128))
+
+# Micro-batching: concurrent predict calls are grouped into one forward pass
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", 8))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", 10))
+
+# Inference executor: worker threads for decode/encode plus admission control
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", 2))
+INFERENCE_QUEUE_DEPTH = int(os.getenv("INFERENCE_QUEUE_DEPTH", 16))
+INFERENCE_RETRY_AFTER_S = int(os.getenv("INFERENCE_RETRY_AFTER_S", 5))
+
+# Async jobs: store backend (memory or sqlite), worker threads, queue bound and retention
+JOB_STORE = os.getenv("JOB_STORE", "memory")
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", str(BASE_DIR / "jobs.db"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 1))
+JOB_MAX_QUEUED = int(os.getenv("JOB_MAX_QUEUED", 100))
+JOB_RESULT_TTL_S = int(os.getenv("JOB_RESULT_TTL_S", 3600))
+JOB_STALE_S = int(os.getenv("JOB_STALE_S", 600))
+
+# Result cache: in-memory LRU (0 disables) and optional on-disk tier
+CACHE_MAX_MB = int(os.getenv("CACHE_MAX_MB", 64))
+CACHE_DIR = os.getenv("CACHE_DIR", "")
+CACHE_DISK_MAX_MB = int(os.getenv("CACHE_DISK_MAX_MB", 1024))
+
+# Health snapshot refresh period; /health serves the latest snapshot
+HEALTH_INTERVAL_S = float(os.getenv("HEALTH_INTERVAL_S", 5))
+
+# Video and frame-sequence enhancement (/enhance_video)
+VIDEO_MAX_FILE_SIZE_MB = int(os.getenv("VIDEO_MAX_FILE_SIZE_MB", 100))
+VIDEO_MAX_FRAMES = int(os.getenv("VIDEO_MAX_FRAMES", 1800))
+VIDEO_BATCH_SIZE = int(os.getenv("VIDEO_BATCH_SIZE", 4))
+# Mean absolute difference (0-1) on a small grayscale thumbnail below which a
+# frame reuses the previous output instead of running the model; 0 disables
+VIDEO_REUSE_THRESHOLD = float(os.getenv("VIDEO_REUSE_THRESHOLD", 0.01))
+
 # Supabase settings
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+SUPABASE_BUCKET = os.getenv("SUPABASE_BUCKET", "lumeo-images")
+# "supabase", or "memory" for an in-process fake (local dev and tests)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase")
+# Feedback rows are buffered and inserted in batches off the request path
+FEEDBACK_BATCH_SIZE = int(os.getenv("FEEDBACK_BATCH_SIZE", 50))
+FEEDBACK_FLUSH_INTERVAL_S = float(os.getenv("FEEDBACK_FLUSH_INTERVAL_S", 5))
+FEEDBACK_MAX_BUFFER = int(os.getenv("FEEDBACK_MAX_BUFFER", 5000))
+# Read-through cache for GET /shared/{id}
+SHARED_CACHE_SIZE = int(os.getenv("SHARED_CACHE_SIZE", 1024))
+SHARED_CACHE_TTL_S = int(os.getenv("SHARED_CACHE_TTL_S", 300))
@@ -0,0 +1,157 @@
+"""
+Inference backends for the UNet.
+
+Every builder takes the eager fp32 model and returns a callable mapping a
+[B, 3, H, W] float tensor to the enhanced [B, 3, H, W] float tensor:
+
+- eager:       the fp32 nn.Module as-is
+- torchscript: BatchNorm folded into the convolutions, traced and frozen
+- compile:     BatchNorm folded, then torch.compile
+- int8:        static post-training quantization calibrated on sample images
+- onnx:        exported to ONNX and run with ONNX Runtime on CPU
+
+Run `python -m backend.core.backends` for a PSNR/SSIM/latency parity
+report of each backend against the fp32 reference.
+"""
+import io
+import copy
+import inspect
+import json
+import logging
+import argparse
+from pathlib import Path
+import torch
+from backend.config import IMG_SIZE, CALIBRATION_DIR, CALIBRATION_SAMPLES
+
+logger = logging.getLogger("lumeo")
+
+BACKENDS = ["eager", "torchscript", "compile", "int8", "onnx"]
+
+def fold_batchnorm(model: torch.nn.Module) -> torch.nn.Module:
+    """Return a copy of the model with Conv2d + BatchNorm2d pairs fused"""
+    from torch.fx.experimental.optimization import fuse
+    return fuse(copy.deepcopy(model).eval())
+
+def calibration_samples(count: int = CALIBRATION_SAMPLES, size: int = IMG_SIZE) -> list:
+    """
+    [1, 3, size, size] tensors for calibration and parity checks.
+    Uses images from CALIBRATION_DIR when set, otherwise synthetic
+    low-light frames (dim gradients plus sensor-like noise).
+    """
+    samples = []
+    if CALIBRATION_DIR:
+        from backend.core.image import ImageSource
+        paths = sorted(p for p in Path(CALIBRATION_DIR).iterdir()
+                       if p.suffix.lower() in (".jpg", ".jpeg", ".png"))
+        for path in paths[:count]:
+            samples.append(ImageSource(path.read_bytes()).to_tensor((size, size)))
+    if samples:
+        return samples
+
+    generator = torch.Generator().manual_seed(0)
+    ramp = torch.linspace(0, 1, size)
+    for i in range(count):
+        level = 0.05 + 0.25 * i / max(1, count - 1)
+        base = (ramp[None, :] * ramp[:, None]).expand(3, size, size) * level
+        noise = torch.randn(3, size, size, generator=generator) * 0.02
+        samples.append((base + noise).clamp(0, 1).unsqueeze(0))
+    return samples
+
+def build_torchscript(model: torch.nn.Module, size: int = IMG_SIZE):
+    example = torch.rand(1, 3, size, size)
+    with torch.no_grad():
+        traced = torch.jit.trace(fold_batchnorm(model), example)
+    return torch.jit.optimize_for_inference(torch.jit.freeze(traced))
+
+def build_compiled(model: torch.nn.Module, size: int = IMG_SIZE):
+    compiled = torch.compile(fold_batchnorm(model), dynamic=True)
+    # Compile now rather than on the first request
+    with torch.no_grad():
+        compiled(torch.rand(1, 3, size, size))
+    return compiled
+
+def build_int8(model: torch.nn.Module, size: int = IMG_SIZE, samples: list = None):
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+    engine = "x86" if "x86" in torch.backends.quantized.supported_engines else "fbgemm"
+    torch.backends.quantized.engine = engine
+    samples = samples or calibration_samples(size=size)
+
+    prepared = prepare_fx(copy.deepcopy(model).eval(), get_default_qconfig_mapping(engine), (samples[0],))
+    with torch.no_grad():
+        for sample in samples:
+            prepared(sample)
+    return convert_fx(prepared)
+
+def build_onnx(model: torch.nn.Module, size: int = IMG_SIZE):
+    import onnxruntime as ort
+
+    dynamic = {0: "batch", 2: "height", 3: "width"}
+    # Newer torch defaults to the dynamo exporter; keep the TorchScript one
+    extra = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+    buffer = io.BytesIO()
+    torch.onnx.export(
+        copy.deepcopy(model).eval(), (torch.rand(1, 3, size, size),), buffer,
+        input_names=["input"], output_names=["output"],
+        dynamic_axes={"input": dynamic, "output": dynamic},
+        opset_version=17, **extra,
+    )
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    session = ort.InferenceSession(buffer.getvalue(), options, providers=["CPUExecutionProvider"])
+
+    def run(input_tensor: torch.Tensor) -> torch.Tensor:
+        output = session.run(None, {"input": input_tensor.cpu().contiguous().numpy()})[0]
+        return torch.from_numpy(output)
+
+    return run
+
+BUILDERS = {
+    "torchscript": build_torchscript,
+    "compile": build_compiled,
+    "int8": build_int8,
+    "onnx": build_onnx,
+}
+
+def build_backend(name: str, model: torch.nn.Module, size: int = IMG_SIZE):
+    """Build the named backend; 'eager' returns the model unchanged"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}'. Options: {', '.join(BACKENDS)}")
+    if name == "eager":
+        return model
+    return BUILDERS[name](model, size)
+
+def main():
+    from backend.core.parity import parity_report
+    from backend.core.benchmark import load_model
+
+    parser = argparse.ArgumentParser(description="Compare inference backends against the fp32 model")
+    parser.add_argument("--backends", nargs="+", default=BACKENDS[1:], choices=BACKENDS)
+    parser.add_argument("--weights", default=None, help="Weights file (default: MODEL_PATH)")
+    parser.add_argument("--random-weights", action="store_true", help="Skip loading weights")
+    parser.add_argument("--size", type=int, default=IMG_SIZE)
+    parser.add_argument("--samples", type=int, default=4)
+    parser.add_argument("--min-psnr", type=float, default=35.0, help="Tolerance in dB vs fp32")
+    args = parser.parse_args()
+
+    model = load_model(args.weights, args.random_weights)
+
+    samples = calibration_samples(args.samples, args.size)
+    results = {}
+    for name in args.backends:
+        try:
+            runner = build_backend(name, model, args.size)
+            report = parity_report(model, runner, samples)
+            report["within_tolerance"] = report["psnr_db"] >= args.min_psnr
+        except Exception as e:
+            report = {"error": str(e)}
+        results[name] = report
+        print(f"{name}: {report}")
+
+    candidates = [n for n, r in results.items() if r.get("within_tolerance")]
+    best = min(candidates, key=lambda n: results[n]["latency_ms"], default="eager")
+    print(json.dumps({"results": results, "recommended": best}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+Benchmark suite for the enhancement pipeline.
+
+Measures each stage on its own and the whole enhance_v2 endpoint under
+concurrent load, and writes the results as JSON so runs can be compared
+across commits:
+
+- decode:  process_image on synthetic JPEG/PNG uploads
+- forward: UNet.forward at several batch sizes and resolutions
+- encode:  tensor_to_bytes to PNG and JPEG
+- resolution: the adaptive policy's size per quality tier and load level
+           for the upload size, with the forward latency at that size
+- enhance: POST /api/v1/enhance_v2 with N concurrent clients, in-process
+           (ASGI transport) or against a running server with --url
+
+    python -m backend.core.benchmark --random-weights --output bench.json
+
+Randomly initialised weights time the same as trained ones, so the suite
+runs without the checkpoint. The report records the model's width, depth,
+parameters and GFLOPs, so slimmer variants (--width 32, or a distilled
+student via --weights) can be compared run to run.
+"""
+import io
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+import numpy as np
+import torch
+from PIL import Image
+from backend.config import IMG_SIZE, MODEL_HOST
+
+def summarize(samples_ms: list) -> dict:
+    ordered = sorted(samples_ms)
+    return {
+        "n": len(ordered),
+        "min_ms": round(ordered[0], 3),
+        "median_ms": round(statistics.median(ordered), 3),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+    }
+
+def time_fn(fn, repeats: int = 5, warmup: int = 1) -> dict:
+    """Call fn() warmup + repeats times and summarize the timed calls"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+def synthetic_image(width: int, height: int, format: str = "JPEG", seed: int = 0) -> bytes:
+    """A dark, noisy photo-like image; random content keeps encoders honest"""
+    rng = np.random.default_rng(seed)
+    gradient = np.linspace(10, 60, width, dtype=np.float32)[None, :, None]
+    noise = rng.normal(0, 12, (height, width, 3)).astype(np.float32)
+    pixels = np.clip(gradient + noise, 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format=format)
+    return buffer.getvalue()
+
+def bench_decode(sizes: list, repeats: int) -> dict:
+    from backend.core.image import process_image
+    results = {}
+    for width, height in sizes:
+        for format in ("JPEG", "PNG"):
+            contents = synthetic_image(width, height, format)
+            results[f"{format.lower()}_{width}x{height}"] = time_fn(lambda: process_image(contents), repeats)
+    return results
+
+def bench_forward(model, batch_sizes: list, resolutions: list, repeats: int) -> dict:
+    results = {}
+    with torch.inference_mode():
+        for size in resolutions:
+            for batch in batch_sizes:
+                x = torch.rand(batch, 3, size, size)
+                stats = time_fn(lambda: model(x), repeats)
+                stats["images_per_s"] = round(batch * 1000 / stats["median_ms"], 2)
+                results[f"b{batch}_{size}"] = stats
+    return results
+
+def bench_encode(resolutions: list, repeats: int) -> dict:
+    from backend.core.image import tensor_to_bytes
+    results = {}
+    for size in resolutions:
+        tensor = torch.rand(1, 3, size, size)
+        for format in ("PNG", "JPEG"):
+            results[f"{format.lower()}_{size}"] = time_fn(lambda: tensor_to_bytes(tensor, format=format), repeats)
+    return results
+
+def bench_resolution(model, upload_size: tuple, loads: list, repeats: int) -> dict:
+    from backend.core.resolution import QUALITY_TIERS, choose_resolution
+    results = {}
+    with torch.inference_mode():
+        for tier in QUALITY_TIERS:
+            for load in loads:
+                width, height = choose_resolution(*upload_size, tier, load)
+                x = torch.rand(1, 3, height, width)
+                results[f"{tier}_load{load:g}"] = {"size": [width, height], **time_fn(lambda: model(x), repeats)}
+    return results
+
+async def _load(client, requests: int, concurrency: int, size: tuple, mode: str) -> dict:
+    # Distinct uploads so the result cache never short-circuits the pipeline
+    uploads = [synthetic_image(*size, seed=i) for i in range(requests)]
+    pending = list(range(requests))
+    latencies, statuses = [], {}
+
+    async def worker():
+        while pending:
+            i = pending.pop()
+            start = time.perf_counter()
+            response = await client.post(
+                f"/api/v1/enhance_v2?mode={mode}",
+                files={"file": (f"{i}.jpg", uploads[i], "image/jpeg")},
+                headers={"Accept": "image/*"},
+            )
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        **summarize(latencies),
+        "concurrency": concurrency,
+        "mode": mode,
+        "throughput_rps": round(requests / elapsed, 2),
+        "status_codes": {str(k): v for k, v in sorted(statuses.items())},
+    }
+
+def bench_enhance(model, requests: int, concurrency: int, size: tuple, mode: str = "fast", url: str = None) -> dict:
+    """
+    Drive enhance_v2 with `concurrency` clients. In-process runs serve
+    `model` through the real app with rate limiting disabled; they can't
+    with MODEL_HOST set, as the app then serves the host's model.
+    """
+    import httpx
+
+    if not url and MODEL_HOST:
+        raise ValueError("The in-process enhance benchmark can't run with MODEL_HOST set; pass --url")
+    if url:
+        client = httpx.AsyncClient(base_url=url, timeout=300)
+    else:
+        from backend.api import endpoints
+        from backend.main import app
+        from backend.core.model import model_manager
+        endpoints.limiter.enabled = False
+        model_manager.model = model
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=300)
+
+    async def run():
+        async with client:
+            return await _load(client, requests, concurrency, size, mode)
+    return asyncio.run(run())
+
+def environment(weights: str) -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "torch_threads": torch.get_num_threads(),
+        "weights": weights,
+    }
+
+def load_model(weights: str = None, random_weights: bool = False, base_width: int = 64, depth: int = 4):
+    """The UNet from a weights file at its saved width and depth, or random at the given ones"""
+    from backend.core.model import UNet, unet_config, read_state_dict
+    if random_weights:
+        return UNet(base_width=base_width, depth=depth).eval()
+    from backend.config import MODEL_PATH
+    state_dict = read_state_dict(weights or MODEL_PATH)
+    model = UNet(**unet_config(state_dict))
+    model.load_state_dict(state_dict)
+    return model.eval()
+
+def run_suite(model, stages: list, batch_sizes: list, resolutions: list, upload_size: tuple,
+              repeats: int, requests: int, concurrency: int, url: str = None) -> dict:
+    results = {}
+    if "decode" in stages:
+        results["decode"] = bench_decode([upload_size], repeats)
+    if "forward" in stages:
+        results["forward"] = bench_forward(model, batch_sizes, resolutions, repeats)
+    if "encode" in stages:
+        results["encode"] = bench_encode(resolutions, repeats)
+    if "resolution" in stages:
+        results["resolution"] = bench_resolution(model, upload_size, [0.0, 0.75, 1.0], repeats)
+    if "enhance" in stages:
+        results["enhance"] = bench_enhance(model, requests, concurrency, upload_size, url=url)
+    return results
+
+STAGES = ["decode", "forward", "encode", "resolution", "enhance"]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the enhancement pipeline")
+    parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES)
+    parser.add_argument("--weights", default=None, help="Weights file (default: MODEL_PATH)")
+    parser.add_argument("--random-weights", action="store_true", help="Skip loading weights")
+    parser.add_argument("--width", type=int, default=64, help="Base width with --random-weights")
+    parser.add_argument("--depth", type=int, default=4, help="Depth with --random-weights")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 4, 8])
+    parser.add_argument("--resolutions", nargs="+", type=int, default=[IMG_SIZE, 512])
+    parser.add_argument("--upload-size", nargs=2, type=int, default=[1920, 1080], metavar=("W", "H"))
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=32, help="enhance_v2 requests in the load test")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--url", default=None, help="Load-test a running server instead of the in-process app")
+    parser.add_argument("--output", default=None, help="Write results JSON here (default: stdout)")
+    args = parser.parse_args(argv)
+    if "enhance" in args.stages and not args.url and MODEL_HOST:
+        parser.error("with MODEL_HOST set, the enhance stage needs --url")
+
+    from backend.core.parity import count_params, count_flops
+    model = load_model(args.weights, args.random_weights, args.width, args.depth)
+    report = {
+        "environment": environment("random" if args.random_weights else str(args.weights or "MODEL_PATH")),
+        "model": {
+            "base_width": model.base_width, "depth": model.depth, "params": count_params(model),
+            "gflops": round(count_flops(model, IMG_SIZE) / 1e9, 2),
+        },
+        "results": run_suite(
+            model, args.stages, args.batch_sizes, args.resolutions, tuple(args.upload_size),
+            args.repeats, args.requests, args.concurrency, args.url,
+        ),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(text)
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+from backend.config import CACHE_MAX_MB, CACHE_DIR, CACHE_DISK_MAX_MB
+from backend.core.metrics import Counter, Gauge
+
+logger = logging.getLogger("lumeo")
+
+def cache_key(contents: bytes, *parts) -> str:
+    """
+    Content address for an enhancement result: hash of the upload bytes
+    plus everything that changes the output (weights version, backend,
+    precision, format, mode).
+    """
+    digest = hashlib.sha256(contents)
+    for part in parts:
+        digest.update(b"\0" + str(part).encode())
+    return digest.hexdigest()
+
+class ResultCache:
+    """
+    Two-tier cache of encoded enhancement results.
+
+    The memory tier is an LRU bounded by total payload bytes. The optional
+    disk tier stores `<key>.bin` + `<key>.json` under `disk_dir` so results
+    survive restarts; it is bounded by `disk_max_bytes`, oldest files first.
+    """
+    def __init__(self, max_bytes: int, disk_dir: Optional[str] = None, disk_max_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 or self.disk_dir is not None
+
+    def get(self, key: str) -> Optional[tuple]:
+        """Return (payload, meta) or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        entry = self._disk_get(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        self._memory_put(key, entry)
+        return entry
+
+    def put(self, key: str, payload: bytes, meta: dict):
+        entry = (payload, meta)
+        self._memory_put(key, entry)
+        self._disk_put(key, entry)
+
+    def _memory_put(self, key: str, entry: tuple):
+        size = len(entry[0])
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            self._entries[key] = entry
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted[0])
+                self.evictions += 1
+
+    def _disk_get(self, key: str) -> Optional[tuple]:
+        if self.disk_dir is None:
+            return None
+        try:
+            payload = (self.disk_dir / f"{key}.bin").read_bytes()
+            meta = json.loads((self.disk_dir / f"{key}.json").read_text())
+            os.utime(self.disk_dir / f"{key}.bin")
+            return payload, meta
+        except (OSError, ValueError):
+            return None
+
+    def _disk_put(self, key: str, entry: tuple):
+        if self.disk_dir is None:
+            return
+        payload, meta = entry
+        try:
+            # Write to temp files and rename so readers never see partial entries
+            for suffix, data in ((".json", json.dumps(meta).encode()), (".bin", payload)):
+                tmp = self.disk_dir / f"{key}{suffix}.tmp"
+                tmp.write_bytes(data)
+                os.replace(tmp, self.disk_dir / f"{key}{suffix}")
+            self._disk_evict()
+        except OSError as e:
+            logger.warning(f"Result cache disk write failed: {e}")
+
+    def _disk_evict(self):
+        if self.disk_max_bytes <= 0:
+            return
+        files = [(p.stat().st_mtime, p.stat().st_size, p) for p in self.disk_dir.glob("*.bin")]
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            path.with_suffix(".json").unlink(missing_ok=True)
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "disk": str(self.disk_dir) if self.disk_dir else None,
+        }
+
+result_cache = ResultCache(
+    max_bytes=CACHE_MAX_MB * 1024 * 1024,
+    disk_dir=CACHE_DIR or None,
+    disk_max_bytes=CACHE_DISK_MAX_MB * 1024 * 1024,
+)
+
+Counter("lumeo_cache_hits_total", "Result cache hits (memory and disk)", callback=lambda: result_cache.hits + result_cache.disk_hits)
+Counter("lumeo_cache_misses_total", "Result cache misses", callback=lambda: result_cache.misses)
+Counter("lumeo_cache_evictions_total", "Result cache evictions", callback=lambda: result_cache.evictions)
+Gauge("lumeo_cache_bytes", "Bytes held in the memory cache tier", callback=lambda: result_cache.stats()["bytes"])
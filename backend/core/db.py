@@ -1,6 +1,269 @@
+"""
+Async Supabase access for feedback and sharing.
 
-from supabase import create_client, Client
-from backend.config import SUPABASE_URL, SUPABASE_KEY
+Talks to PostgREST and Storage directly over one pooled httpx.AsyncClient,
+so handlers never block the event loop. Feedback rows are buffered and
+inserted in batches off the request path, and shared results are served
+through a small TTL cache. MemoryBackend implements the same interface
+in-process for local development and tests (STORAGE_BACKEND=memory).
+"""
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Optional
+import httpx
+from backend.core.metrics import Counter, Gauge
+from backend.config import (
+    SUPABASE_URL, SUPABASE_KEY, SUPABASE_BUCKET, STORAGE_BACKEND,
+    FEEDBACK_BATCH_SIZE, FEEDBACK_FLUSH_INTERVAL_S, FEEDBACK_MAX_BUFFER,
+    SHARED_CACHE_SIZE, SHARED_CACHE_TTL_S,
+)
 
-# Initialize Supabase client
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+logger = logging.getLogger("lumeo")
+
+def supabase_configured() -> bool:
+    return bool(SUPABASE_URL and SUPABASE_KEY) and "your-project" not in SUPABASE_URL
+
+class SupabaseBackend:
+    """PostgREST rows and Storage objects over a pooled HTTP client"""
+    def __init__(self, url: str, key: str, transport: httpx.AsyncBaseTransport = None):
+        self.url = url.rstrip("/")
+        self.key = key
+        self._transport = transport
+        self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created on first use so it binds to the serving event loop
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.url,
+                headers={"apikey": self.key, "Authorization": f"Bearer {self.key}"},
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+                timeout=httpx.Timeout(10.0),
+                transport=self._transport,
+            )
+        return self._client
+
+    async def insert(self, table: str, rows: list) -> list:
+        """Insert rows in one request and return them as stored"""
+        response = await self.client.post(
+            f"/rest/v1/{table}", json=rows, headers={"Prefer": "return=representation"}
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def select(self, table: str, **filters) -> list:
+        params = {"select": "*", **{column: f"eq.{value}" for column, value in filters.items()}}
+        response = await self.client.get(f"/rest/v1/{table}", params=params)
+        response.raise_for_status()
+        return response.json()
+
+    async def upload(self, bucket: str, path: str, content: bytes, content_type: str):
+        response = await self.client.post(
+            f"/storage/v1/object/{bucket}/{path}", content=content, headers={"Content-Type": content_type}
+        )
+        response.raise_for_status()
+
+    def public_url(self, bucket: str, path: str) -> str:
+        # Public bucket URLs are deterministic; no round trip needed
+        return f"{self.url}/storage/v1/object/public/{bucket}/{path}"
+
+    async def aclose(self):
+        client, self._client = self._client, None
+        if client is not None:
+            await client.aclose()
+
+class MemoryBackend:
+    """In-process stand-in for SupabaseBackend"""
+    def __init__(self):
+        self.tables = {}
+        self.objects = {}
+
+    async def insert(self, table: str, rows: list) -> list:
+        stored = [{"id": str(uuid.uuid4()), **row} for row in rows]
+        self.tables.setdefault(table, []).extend(stored)
+        return stored
+
+    async def select(self, table: str, **filters) -> list:
+        return [
+            row for row in self.tables.get(table, [])
+            if all(str(row.get(column)) == str(value) for column, value in filters.items())
+        ]
+
+    async def upload(self, bucket: str, path: str, content: bytes, content_type: str):
+        self.objects[(bucket, path)] = (content, content_type)
+
+    def public_url(self, bucket: str, path: str) -> str:
+        return f"memory://{bucket}/{path}"
+
+    async def aclose(self):
+        pass
+
+class FeedbackWriter:
+    """
+    Buffers feedback rows and inserts them in batches, when `batch_size`
+    rows are waiting or every `interval_s`. `add` never waits on the
+    network; if the backend is down the buffer is capped at `max_buffer`
+    and the oldest rows are dropped.
+    """
+    def __init__(self, backend, table: str = "feedback", batch_size: int = FEEDBACK_BATCH_SIZE,
+                 interval_s: float = FEEDBACK_FLUSH_INTERVAL_S, max_buffer: int = FEEDBACK_MAX_BUFFER):
+        self.backend = backend
+        self.table = table
+        self.batch_size = max(1, batch_size)
+        self.interval_s = interval_s
+        self.max_buffer = max(self.batch_size, max_buffer)
+        self.written = 0
+        self.dropped = 0
+        self._rows = []
+        self._task = None
+        self._wake = None
+        self._stopping = False
+
+    @property
+    def buffered(self) -> int:
+        return len(self._rows)
+
+    def add(self, row: dict):
+        """Queue a row for the next batch; call from the event loop"""
+        self._rows.append(row)
+        self._trim()
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._stopping = False
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        if len(self._rows) >= self.batch_size:
+            self._wake.set()
+
+    def _trim(self):
+        overflow = len(self._rows) - self.max_buffer
+        if overflow > 0:
+            del self._rows[:overflow]
+            self.dropped += overflow
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval_s)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self):
+        while self._rows:
+            batch, self._rows = self._rows[:self.batch_size], self._rows[self.batch_size:]
+            try:
+                await self.backend.insert(self.table, batch)
+                self.written += len(batch)
+            except asyncio.CancelledError:
+                # Not known to be written; keep it for the next flush
+                self._rows = batch + self._rows
+                raise
+            except Exception as e:
+                logger.warning(f"Feedback flush of {len(batch)} rows failed, will retry: {e}")
+                self._rows = batch + self._rows
+                self._trim()
+                return
+
+    async def stop(self):
+        """Let an in-progress flush finish, then write whatever is left"""
+        task, self._task = self._task, None
+        if task is not None:
+            self._stopping = True
+            self._wake.set()
+            await task
+        await self.flush()
+
+class TTLCache:
+    """Small LRU with per-entry expiry"""
+    def __init__(self, max_entries: int = SHARED_CACHE_SIZE, ttl_s: float = SHARED_CACHE_TTL_S):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries = OrderedDict()
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: str, value):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_s, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+class Storage:
+    """Feedback and share operations on top of a backend (None when disabled)"""
+    def __init__(self, backend, bucket: str = SUPABASE_BUCKET):
+        self.backend = backend
+        self.bucket = bucket
+        self.feedback = FeedbackWriter(backend)
+        self.shared_cache = TTLCache()
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    async def share(self, original: tuple, enhanced: tuple) -> str:
+        """
+        Upload (bytes, content_type) pairs concurrently and record the share.
+        Returns the share id.
+        """
+        prefix = f"public/{uuid.uuid4()}_{int(time.time())}"
+        paths = []
+        for suffix, (_, content_type) in zip(("orig", "enh"), (original, enhanced)):
+            extension = "jpg" if content_type == "image/jpeg" else "png"
+            paths.append(f"{prefix}_{suffix}.{extension}")
+
+        await asyncio.gather(*(
+            self.backend.upload(self.bucket, path, content, content_type)
+            for path, (content, content_type) in zip(paths, (original, enhanced))
+        ))
+        rows = await self.backend.insert("shared_results", [{
+            "original_url": self.backend.public_url(self.bucket, paths[0]),
+            "enhanced_url": self.backend.public_url(self.bucket, paths[1]),
+        }])
+        row = rows[0]
+        self.shared_cache.put(str(row["id"]), row)
+        return row["id"]
+
+    async def get_shared(self, share_id: str) -> Optional[dict]:
+        """Read-through: cached rows skip the database"""
+        row = self.shared_cache.get(share_id)
+        if row is not None:
+            return row
+        rows = await self.backend.select("shared_results", id=share_id)
+        if not rows:
+            return None
+        self.shared_cache.put(share_id, rows[0])
+        return rows[0]
+
+    async def close(self):
+        if self.enabled:
+            await self.feedback.stop()
+            await self.backend.aclose()
+
+def create_storage(kind: str = STORAGE_BACKEND) -> Storage:
+    if kind == "memory":
+        return Storage(MemoryBackend())
+    if kind == "supabase":
+        return Storage(SupabaseBackend(SUPABASE_URL, SUPABASE_KEY) if supabase_configured() else None)
+    raise ValueError(f"Unknown storage backend '{kind}'. Options: supabase, memory")
+
+storage = create_storage()
+
+Gauge("lumeo_feedback_buffered", "Feedback rows waiting for the next batch insert", callback=lambda: storage.feedback.buffered)
+Counter("lumeo_feedback_written_total", "Feedback rows inserted", callback=lambda: storage.feedback.written)
+Counter("lumeo_feedback_dropped_total", "Feedback rows dropped from a full buffer", callback=lambda: storage.feedback.dropped)
@@ -0,0 +1,120 @@
+import asyncio
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from backend.config import INFERENCE_WORKERS, INFERENCE_QUEUE_DEPTH
+from backend.core.metrics import STAGE_SECONDS, Gauge
+
+logger = logging.getLogger("lumeo")
+
+class QueueFullError(Exception):
+    """Raised when the inference executor is at capacity"""
+    pass
+
+class StageTimer:
+    """
+    Records wall-clock time per pipeline stage in milliseconds.
+    With an endpoint name, each stage is also observed in the
+    lumeo_stage_seconds histogram.
+    """
+    def __init__(self, endpoint: str = None):
+        self.endpoint = endpoint
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timings[name] = round(elapsed * 1000, 2)
+            if self.endpoint:
+                STAGE_SECONDS.observe(elapsed, endpoint=self.endpoint, stage=name)
+
+    def server_timing(self) -> str:
+        """Format timings for the Server-Timing response header"""
+        return ", ".join(f"{name};dur={ms}" for name, ms in self.timings.items())
+
+async def run_inline(fn, *args, **kwargs):
+    """InferenceExecutor.run stand-in that calls `fn` on the current thread"""
+    return fn(*args, **kwargs)
+
+class InferenceExecutor:
+    """
+    Bounded worker pool for CPU-heavy work (decode, inference, encode).
+
+    Keeps blocking calls off the asyncio event loop and applies admission
+    control: at most `max_workers + max_queue` heavy requests are admitted
+    at once, the rest are rejected immediately so callers can return 503.
+    """
+    def __init__(self, max_workers: int = INFERENCE_WORKERS, max_queue: int = INFERENCE_QUEUE_DEPTH):
+        self.max_workers = max(1, max_workers)
+        self.capacity = self.max_workers + max(0, max_queue)
+        self._pool = None
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def saturated(self) -> bool:
+        return self._in_flight >= self.capacity
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="lumeo-worker")
+            return self._pool
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                return False
+            self._in_flight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+
+    @asynccontextmanager
+    async def admit(self):
+        """
+        Reserve a slot for one request for the duration of the block.
+        Raises QueueFullError when the executor is saturated.
+        """
+        if not self.try_acquire():
+            logger.warning(f"Inference queue full ({self.capacity} in flight), rejecting request")
+            raise QueueFullError()
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def run(self, fn, *args, **kwargs):
+        """Run a blocking function on the worker pool and await its result"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_pool(), lambda: fn(*args, **kwargs))
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "in_flight": self._in_flight,
+            "capacity": self.capacity,
+        }
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+inference_executor = InferenceExecutor()
+
+Gauge("lumeo_inference_in_flight", "Heavy requests admitted to the executor", callback=lambda: inference_executor.in_flight)
+Gauge("lumeo_inference_capacity", "Maximum admitted heavy requests", callback=lambda: inference_executor.capacity)
@@ -0,0 +1,100 @@
+"""
+Background health sampler.
+
+System and model stats are refreshed on a daemon thread every
+HEALTH_INTERVAL_S, so /health returns a ready-made snapshot instead of
+sampling the CPU on the event loop for every probe.
+"""
+import time
+import logging
+import threading
+from datetime import datetime
+import psutil
+from backend.config import HEALTH_INTERVAL_S, INFERENCE_BACKEND
+from backend.core.model import model_manager
+from backend.core.executor import inference_executor
+from backend.core.cache import result_cache
+
+logger = logging.getLogger("lumeo")
+
+class HealthMonitor:
+    def __init__(self, interval_s: float = HEALTH_INTERVAL_S):
+        self.interval_s = max(0.1, interval_s)
+        self._snapshot = None
+        self.startup_ms = {}
+        self._thread = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopping.clear()
+            # Prime psutil so the first non-blocking sample is meaningful
+            psutil.cpu_percent(interval=None)
+            self._thread = threading.Thread(target=self._loop, name="lumeo-health", daemon=True)
+            self._thread.start()
+
+    def shutdown(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        self._stopping.set()
+        if thread is not None:
+            thread.join(timeout=2)
+
+    def _loop(self):
+        while not self._stopping.is_set():
+            try:
+                self._snapshot = self.sample()
+            except Exception as e:
+                logger.error(f"Health sampling failed: {e}")
+            self._stopping.wait(self.interval_s)
+
+    def sample(self) -> dict:
+        """Collect a fresh snapshot (non-blocking CPU reading)"""
+        current = model_manager.current
+        model_loaded = current is not None
+        memory = psutil.virtual_memory()
+        return {
+            "status": "healthy" if model_loaded else "degraded",
+            "timestamp": datetime.utcnow().isoformat(),
+            "sampled_at": time.time(),
+            "model": {
+                "loaded": model_loaded,
+                "device": current.device if model_loaded else None,
+                # From the one lookup above; each property would be a round trip to a model host
+                "backend": current.backend if model_loaded else INFERENCE_BACKEND,
+                "version": current.version if model_loaded else "unknown"
+            },
+            "startup_ms": self.startup_ms,
+            "threads": model_manager.policy.info() if getattr(model_manager, "policy", None) else None,
+            "inference": inference_executor.stats(),
+            "cache": result_cache.stats(),
+            "system": {
+                "cpu_percent": psutil.cpu_percent(interval=None),
+                "memory_percent": memory.percent,
+                "memory_available_gb": memory.available / (1024**3)
+            }
+        }
+
+    def snapshot(self) -> dict:
+        """Latest snapshot; sampled inline only if the sampler hasn't run yet"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self._snapshot = self.sample()
+        return snapshot
+
+    def readiness(self) -> tuple:
+        """
+        (ready, reasons). Checked live since it is cheap: the default model
+        must be loaded and warmed, and the inference executor not saturated.
+        """
+        reasons = []
+        if model_manager.current is None:
+            reasons.append("model not loaded")
+        if inference_executor.saturated:
+            reasons.append("inference queue full")
+        return not reasons, reasons
+
+health_monitor = HealthMonitor()
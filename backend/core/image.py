@@ -1,45 +1,160 @@
-
 import io
+import threading
 import numpy as np
 import torch
-from PIL import Image
-from torchvision import transforms
-from backend.config import IMG_SIZE
-
-# Define transformations
-# 1. Resize to fixed size for model
-# 2. Convert to tensor
-transform_pipeline = transforms.Compose([
-    transforms.Resize((IMG_SIZE, IMG_SIZE)),
-    transforms.ToTensor(),
-])
+from typing import Optional
+from PIL import Image, features
+from backend.config import (
+    IMG_SIZE, OUTPUT_PNG_COMPRESS_LEVEL, OUTPUT_JPEG_QUALITY, OUTPUT_JPEG_OPTIMIZE,
+    OUTPUT_JPEG_PROGRESSIVE, OUTPUT_WEBP_QUALITY, OUTPUT_WEBP_METHOD,
+    OUTPUT_AVIF_QUALITY, OUTPUT_AVIF_SPEED,
+)
+
+# File signatures for the formats we accept
+SIGNATURES = {
+    b"\xff\xd8\xff": "image/jpeg",
+    b"\x89PNG\r\n\x1a\n": "image/png",
+}
+
+def sniff_mime_type(header: bytes) -> Optional[str]:
+    """
+    Detect the MIME type from the first bytes of the file.
+    Returns None for anything that isn't a supported image format.
+    """
+    for signature, mime_type in SIGNATURES.items():
+        if header.startswith(signature):
+            return mime_type
+    return None
+
+class ImageSource:
+    """
+    An upload parsed exactly once.
+
+    Construction only reads the header (type and dimensions); pixel data is
+    decoded a single time by `to_tensor`, directly at the target scale.
+    """
+    def __init__(self, contents: bytes):
+        self.mime_type = sniff_mime_type(contents[:16])
+        # PIL parses the header lazily; nothing is decoded yet
+        self.image = Image.open(io.BytesIO(contents))
+        self.width, self.height = self.image.size
+
+    def to_tensor(self, size: Optional[tuple] = None, out: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """
+        Decode -> Tensor [1, 3, H, W] in [0, 1].
+        size: (width, height) to resize to, or None for native resolution.
+        out: optional preallocated [3, H, W] or [1, 3, H, W] float tensor to fill.
+        """
+        image = self.image
+        if size is not None and image.format == "JPEG":
+            # Let libjpeg decode at 1/2, 1/4 or 1/8 scale when the target is smaller
+            image.draft("RGB", size)
+        return image_to_tensor(image, size, out)
+
+def image_to_tensor(image: Image.Image, size: Optional[tuple] = None, out: Optional[torch.Tensor] = None) -> torch.Tensor:
+    """
+    PIL image -> Tensor [1, 3, H, W] in [0, 1], resized to size (width, height) if given.
+    out: optional preallocated [3, H, W] or [1, 3, H, W] float tensor to fill.
+    """
+    image = image.convert("RGB")
+    if size is not None and image.size != tuple(size):
+        image = image.resize(size, Image.BILINEAR)
+
+    # HWC uint8 view of the decoded frame -> CHW float in one vectorized pass
+    pixels = np.asarray(image).transpose(2, 0, 1)
+    if out is None:
+        out = torch.empty(pixels.shape, dtype=torch.float32)
+    out = out.view(pixels.shape)
+    np.multiply(pixels, np.float32(1 / 255.0), out=out.numpy(), dtype=np.float32)
+    return out.unsqueeze(0)  # Add batch dimension
 
 def process_image(image_bytes: bytes) -> torch.Tensor:
     """
     Convert bytes -> PIL -> Tensor [1, 3, H, W]
     """
-    image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-    tensor = transform_pipeline(image)
-    return tensor.unsqueeze(0)  # Add batch dimension
+    return ImageSource(image_bytes).to_tensor((IMG_SIZE, IMG_SIZE))
 
-def tensor_to_bytes(tensor: torch.Tensor, format: str = 'PNG') -> bytes:
+def process_image_full(image_bytes: bytes) -> torch.Tensor:
     """
-    Convert Tensor [1, 3, H, W] -> bytes
+    Convert bytes -> PIL -> Tensor [1, 3, H, W] at native resolution
+    """
+    return ImageSource(image_bytes).to_tensor()
+
+# Output formats by name, with their Pillow writer. WebP and AVIF depend on the Pillow build.
+OUTPUT_FORMATS = {"png": "PNG", "jpeg": "JPEG", "webp": "WEBP", "avif": "AVIF"}
+FORMAT_ALIASES = {"jpg": "jpeg"}
+
+def _pillow_supports(name: str) -> bool:
+    if name in ("png", "jpeg"):
+        return True
+    try:
+        return bool(features.check(name))
+    except ValueError:
+        return False
+
+SUPPORTED_OUTPUT_FORMATS = [name for name in OUTPUT_FORMATS if _pillow_supports(name)]
+
+def normalize_output_format(name: str) -> Optional[str]:
+    """Canonical output format name ("png", "jpeg", ...) or None if unsupported"""
+    name = name.lower()
+    name = FORMAT_ALIASES.get(name, name)
+    return name if name in SUPPORTED_OUTPUT_FORMATS else None
+
+def save_options(name: str, quality: Optional[int] = None) -> dict:
+    """Pillow save() arguments for an output format; quality overrides the lossy default"""
+    if name == "png":
+        return {"compress_level": OUTPUT_PNG_COMPRESS_LEVEL}
+    if name == "jpeg":
+        return {"quality": quality or OUTPUT_JPEG_QUALITY, "optimize": OUTPUT_JPEG_OPTIMIZE,
+                "progressive": OUTPUT_JPEG_PROGRESSIVE}
+    if name == "webp":
+        return {"quality": quality or OUTPUT_WEBP_QUALITY, "method": OUTPUT_WEBP_METHOD}
+    if name == "avif":
+        return {"quality": quality or OUTPUT_AVIF_QUALITY, "speed": OUTPUT_AVIF_SPEED}
+    return {}
+
+# Per-thread scratch buffers reused across encodes
+_scratch = threading.local()
+
+def _buffer(kind: str, shape: tuple, dtype: torch.dtype) -> torch.Tensor:
+    numel = int(np.prod(shape))
+    flat = getattr(_scratch, kind, None)
+    if flat is None or flat.numel() < numel:
+        flat = torch.empty(numel, dtype=dtype)
+        setattr(_scratch, kind, flat)
+    return flat[:numel].view(shape)
+
+def tensor_to_uint8(tensor: torch.Tensor) -> np.ndarray:
+    """
+    [1, 3, H, W] or [3, H, W] float in [0, 1] -> [H, W, 3] uint8.
+    Clamps and scales in place in a reused float buffer, then converts and
+    transposes in one copy into a reused uint8 buffer (same truncation as
+    torchvision's ToPILImage). The result is only valid until this thread's
+    next call.
     """
-    # Squeeze batch dimension if needed
     if tensor.dim() == 4:
         tensor = tensor.squeeze(0)
+    channels, height, width = tensor.shape
+    scratch = _buffer("float", (channels, height, width), torch.float32)
+    torch.clamp(tensor, 0, 1, out=scratch)
+    scratch.mul_(255)
+    pixels = _buffer("uint8", (height, width, channels), torch.uint8)
+    pixels.copy_(scratch.permute(1, 2, 0))
+    return pixels.numpy()
+
+def tensor_to_bytes(tensor: torch.Tensor, format: str = 'PNG', quality: Optional[int] = None) -> bytes:
+    """
+    Convert Tensor [1, 3, H, W] -> bytes in png, jpeg, webp or avif
+    """
+    name = normalize_output_format(format)
+    if name is None:
+        raise ValueError(f"Unsupported output format '{format}'. Options: {', '.join(SUPPORTED_OUTPUT_FORMATS)}")
     
-    # Clip to valid range [0, 1]
-    tensor = torch.clamp(tensor, 0, 1)
-    
-    # Convert to PIL
-    to_pil = transforms.ToPILImage()
-    image = to_pil(tensor)
+    image = Image.fromarray(tensor_to_uint8(tensor))
     
     # Save to bytes
     img_byte_arr = io.BytesIO()
-    image.save(img_byte_arr, format=format)
+    image.save(img_byte_arr, format=OUTPUT_FORMATS[name], **save_options(name, quality))
     return img_byte_arr.getvalue()
 
 def analyze_brightness(tensor: torch.Tensor) -> dict:
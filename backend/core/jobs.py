@@ -0,0 +1,351 @@
+"""
+Asynchronous enhancement jobs.
+
+POST /jobs stores the upload and returns immediately; a pool of worker
+threads claims queued jobs, runs the enhancement pipeline and stores the
+result. Storage is pluggable: an in-process MemoryJobStore, or a
+SQLiteJobStore that survives restarts and can be shared with standalone
+worker processes (`python -m backend.core.jobs`).
+"""
+import json
+import asyncio
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from typing import Optional
+from backend.config import JOB_STORE, JOB_DB_PATH, JOB_WORKERS, JOB_MAX_QUEUED, JOB_RESULT_TTL_S, JOB_STALE_S
+from backend.core.metrics import Gauge
+
+logger = logging.getLogger("lumeo")
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+FINISHED = (DONE, FAILED)
+
+def new_job(contents: bytes, params: dict) -> dict:
+    now = time.time()
+    return {
+        "id": uuid.uuid4().hex,
+        "status": QUEUED,
+        "progress": 0.0,
+        "params": params,
+        "input": contents,
+        "result": None,
+        "meta": None,
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+def public_view(job: dict) -> dict:
+    """Job fields safe to return to clients (no payload bytes)"""
+    return {k: v for k, v in job.items() if k not in ("input", "result")}
+
+class MemoryJobStore:
+    """Jobs kept in a dict; lost on restart, private to this process"""
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, job: dict):
+        with self._lock:
+            self._jobs[job["id"]] = job
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def update(self, job_id: str, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields, updated_at=time.time())
+
+    def claim(self) -> Optional[dict]:
+        """Atomically move the oldest queued job to running and return it"""
+        with self._lock:
+            queued = [j for j in self._jobs.values() if j["status"] == QUEUED]
+            if not queued:
+                return None
+            job = min(queued, key=lambda j: j["created_at"])
+            job.update(status=RUNNING, updated_at=time.time())
+            return dict(job)
+
+    def count(self, status: str) -> int:
+        with self._lock:
+            return sum(1 for j in self._jobs.values() if j["status"] == status)
+
+    def touch(self, job_ids: list):
+        """Heartbeat: mark these jobs as still running"""
+        now = time.time()
+        with self._lock:
+            for job_id in job_ids:
+                job = self._jobs.get(job_id)
+                if job is not None and job["status"] == RUNNING:
+                    job["updated_at"] = now
+
+    def purge(self, older_than: float):
+        with self._lock:
+            expired = [i for i, j in self._jobs.items()
+                       if j["status"] in FINISHED and j["updated_at"] < older_than]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def recover(self, stale_before: float):
+        # Jobs die with the process; nothing can be left running elsewhere
+        pass
+
+class SQLiteJobStore:
+    """
+    Jobs in a SQLite file. Claims use a conditional UPDATE, so several
+    processes can safely pull from the same queue.
+    """
+    COLUMNS = ["id", "status", "progress", "params", "input", "result", "meta", "error", "created_at", "updated_at"]
+    JSON_COLUMNS = ("params", "meta")
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT, progress REAL, params TEXT, input BLOB, "
+            "result BLOB, meta TEXT, error TEXT, created_at REAL, updated_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def _encode(self, field: str, value):
+        return json.dumps(value) if field in self.JSON_COLUMNS and value is not None else value
+
+    def _row(self, row) -> Optional[dict]:
+        if row is None:
+            return None
+        job = dict(zip(self.COLUMNS, row))
+        for field in self.JSON_COLUMNS:
+            if job[field] is not None:
+                job[field] = json.loads(job[field])
+        return job
+
+    def create(self, job: dict):
+        values = [self._encode(c, job[c]) for c in self.COLUMNS]
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO jobs ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))})", values
+            )
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return self._row(row)
+
+    def update(self, job_id: str, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        values = [self._encode(name, value) for name, value in fields.items()]
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", values + [job_id])
+            self._conn.commit()
+
+    def claim(self) -> Optional[dict]:
+        with self._lock:
+            while True:
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if row is None:
+                    return None
+                claimed = self._conn.execute(
+                    "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status = ?",
+                    (RUNNING, time.time(), row[0], QUEUED),
+                ).rowcount
+                self._conn.commit()
+                if claimed:
+                    break
+        return self.get(row[0])
+
+    def count(self, status: str) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
+
+    def touch(self, job_ids: list):
+        """Heartbeat: mark these jobs as still running so recover() leaves them alone"""
+        if not job_ids:
+            return
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET updated_at = ? WHERE status = ? AND id IN ({', '.join('?' * len(job_ids))})",
+                (time.time(), RUNNING, *job_ids),
+            )
+            self._conn.commit()
+
+    def purge(self, older_than: float):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?", (*FINISHED, older_than)
+            )
+            self._conn.commit()
+
+    def recover(self, stale_before: float):
+        """Requeue running jobs not touched since stale_before (their worker died)"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, progress = 0 WHERE status = ? AND updated_at < ?",
+                (QUEUED, RUNNING, stale_before),
+            )
+            self._conn.commit()
+
+def create_store(kind: str = JOB_STORE):
+    if kind == "memory":
+        return MemoryJobStore()
+    if kind == "sqlite":
+        return SQLiteJobStore(JOB_DB_PATH)
+    raise ValueError(f"Unknown job store '{kind}'. Options: memory, sqlite")
+
+class JobQueue:
+    """
+    Worker pool processing jobs from a store with a handler function.
+    handler(job, progress) -> (result bytes, meta dict); progress takes a
+    fraction in [0, 1].
+
+    A housekeeping thread heartbeats this process's running jobs, purges
+    expired results and requeues jobs whose worker stopped heartbeating.
+    """
+    def __init__(self, store, handler, workers: int = JOB_WORKERS, max_queued: int = JOB_MAX_QUEUED):
+        self.store = store
+        self.handler = handler
+        # 0 workers: this process only enqueues (standalone workers share a SQLite store)
+        self.workers = max(0, workers)
+        self.max_queued = max_queued
+        self._threads = []
+        self._running = set()
+        # Heartbeats must land well within JOB_STALE_S
+        self.housekeeping_interval = min(60.0, JOB_STALE_S / 3)
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"lumeo-job-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            thread = threading.Thread(target=self._housekeep, name="lumeo-job-housekeeping", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def shutdown(self, timeout: float = 5.0):
+        with self._lock:
+            threads, self._threads = self._threads, []
+        self._stopping.set()
+        self._wake.set()
+        for thread in threads:
+            thread.join(timeout)
+
+    def submit(self, contents: bytes, params: dict) -> dict:
+        """Store a new job and wake a worker. Raises QueueFullError when full."""
+        from backend.core.executor import QueueFullError
+        if self.store.count(QUEUED) >= self.max_queued:
+            raise QueueFullError()
+        self.start()
+        job = new_job(contents, params)
+        self.store.create(job)
+        self._wake.set()
+        return public_view(job)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        return self.store.get(job_id)
+
+    def _work(self):
+        while not self._stopping.is_set():
+            job = self.store.claim()
+            if job is None:
+                self._wake.wait(1.0)
+                self._wake.clear()
+                continue
+            self.run(job)
+
+    def _housekeep(self):
+        while True:
+            try:
+                self.housekeep()
+            except Exception as e:
+                logger.error(f"Job housekeeping failed: {e}", exc_info=True)
+            if self._stopping.wait(self.housekeeping_interval):
+                return
+
+    def housekeep(self):
+        """Heartbeat running jobs, purge expired results and requeue orphans"""
+        with self._lock:
+            running = list(self._running)
+        self.store.touch(running)
+        now = time.time()
+        self.store.purge(now - JOB_RESULT_TTL_S)
+        self.store.recover(now - JOB_STALE_S)
+
+    def run(self, job: dict):
+        job_id = job["id"]
+        last = [0.0]
+        with self._lock:
+            self._running.add(job_id)
+
+        def progress(fraction: float):
+            # Throttle writes; SSE clients poll the store
+            if fraction - last[0] >= 0.05 or fraction >= 1.0:
+                last[0] = fraction
+                self.store.update(job_id, progress=round(fraction, 3))
+
+        started = time.perf_counter()
+        try:
+            result, meta = self.handler(job, progress)
+            meta = {**meta, "processing_ms": round((time.perf_counter() - started) * 1000, 2)}
+            self.store.update(job_id, status=DONE, progress=1.0, result=result, meta=meta, input=None)
+            logger.info(f"Job {job_id} done in {meta['processing_ms']} ms")
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+            self.store.update(job_id, status=FAILED, error=str(e) or type(e).__name__, input=None)
+        finally:
+            with self._lock:
+                self._running.discard(job_id)
+
+def enhance_job(job: dict, progress) -> tuple:
+    """Default handler: run the enhancement pipeline on the stored upload"""
+    from backend.core.image import ImageSource
+    from backend.core.model import model_manager
+    from backend.core.pipeline import enhance_source
+
+    params = job["params"]
+    model = model_manager.acquire(params.get("model_version"))
+    try:
+        return asyncio.run(enhance_source(
+            ImageSource(job["input"]), model,
+            mode=params.get("mode", "fast"), format=params.get("format", "png"),
+            quality=params.get("quality"), progress=progress,
+        ))
+    finally:
+        model.release()
+
+job_queue = JobQueue(create_store(), enhance_job)
+
+Gauge("lumeo_jobs_queued", "Jobs waiting for a worker", callback=lambda: job_queue.store.count(QUEUED))
+
+if __name__ == "__main__":
+    # Standalone worker process sharing the SQLite queue with the web workers
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if JOB_STORE != "sqlite":
+        raise SystemExit("Standalone job workers need JOB_STORE=sqlite")
+    job_queue.workers = max(1, job_queue.workers)
+    job_queue.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        job_queue.shutdown()
@@ -0,0 +1,142 @@
+"""
+Minimal Prometheus-style metrics.
+
+Counters, gauges and histograms with labels, rendered in the Prometheus
+text exposition format by `render()` for the /metrics endpoint. Metrics
+register with the process-wide REGISTRY unless given another Registry
+(tests use their own). Kept dependency-free; values live in this process
+only, so scrape each uvicorn worker separately.
+"""
+import math
+import threading
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+BYTES_BUCKETS = (1e4, 5e4, 1e5, 5e5, 1e6, 2.5e6, 5e6, 1e7, 2.5e7)
+
+class Registry:
+    """A set of metrics rendered together"""
+    def __init__(self):
+        self.metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self.metrics.append(metric)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self.metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+def _format_labels(labelnames: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    """
+    Base metric. With `callback`, the (unlabelled) value is read from the
+    callback at scrape time instead of being updated by the caller.
+    """
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), callback=None,
+                 registry: Registry = REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def render(self) -> list:
+        if self.callback is not None:
+            try:
+                value = self.callback()
+                with self._lock:
+                    self._values[()] = value
+            except Exception:
+                pass
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key: tuple, value) -> list:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS,
+                 registry: Registry = REGISTRY):
+        super().__init__(name, documentation, labelnames, registry=registry)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def _render_sample(self, key: tuple, value) -> list:
+        counts, total = value
+        lines = []
+        for bound, count in zip(self.buckets, counts):
+            le = 'le="' + _format_value(bound) + '"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {counts[-1]}")
+        return lines
+
+def render(registry: Registry = REGISTRY) -> str:
+    return registry.render()
+
+# Pipeline metrics
+STAGE_SECONDS = Histogram(
+    "lumeo_stage_seconds", "Time spent in each request pipeline stage", ("endpoint", "stage")
+)
+REQUESTS = Counter("lumeo_requests_total", "Requests by endpoint and outcome", ("endpoint", "status"))
+BYTES_IN = Histogram("lumeo_request_bytes", "Upload size in bytes", ("endpoint",), BYTES_BUCKETS)
+BYTES_OUT = Histogram("lumeo_response_bytes", "Encoded result size in bytes", ("endpoint",), BYTES_BUCKETS)
+BATCH_SIZE = Histogram("lumeo_batch_size", "Images per batched forward pass", ("model",), BATCH_BUCKETS)
+INFERENCE_SECONDS = Histogram("lumeo_inference_seconds", "Forward pass latency per batch", ("model",))
+MODEL_LOAD_SECONDS = Gauge("lumeo_model_load_seconds", "Time taken to load and warm each model version", ("model",))
+STARTUP_SECONDS = Gauge("lumeo_startup_seconds", "Process startup time by phase", ("phase",))
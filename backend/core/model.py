@@ -1,8 +1,18 @@
 
 import torch
 import sys
+import queue
+import threading
+import time
+import logging
+from concurrent.futures import Future
 from pathlib import Path
-from backend.config import MODEL_PATH, DEVICE
+import hashlib
+from backend.config import (
+    MODEL_PATH, MODEL_NAME, MODEL_VERSION, MODEL_KEEP_VERSIONS, DEVICE, IMG_SIZE,
+    INFERENCE_BACKEND, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS, MODEL_HOST, INFERENCE_AUTOTUNE,
+    INFERENCE_PRECISION,
+)
 
 # Ensure the root directory is in sys.path to allow importing 'models'
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
@@ -10,71 +20,509 @@ if str(BASE_DIR) not in sys.path:
     sys.path.append(str(BASE_DIR))
 
 try:
-    from models.unet import UNet
+    from models.unet import UNet, unet_config
 except ImportError:
     # Fallback if running from a different context
     import sys
     sys.path.append(str(BASE_DIR))
-    from models.unet import UNet
+    from models.unet import UNet, unet_config
+
+from backend.core.executor import StageTimer
+from backend.core.threads import default_policy, autotune, set_memory_format
+from backend.core.precision import resolve_precision, uses_channels_last, autocast, pick_auto, AUTO_SAMPLES
+from backend.core.metrics import BATCH_SIZE, INFERENCE_SECONDS, MODEL_LOAD_SECONDS, Gauge
+
+logger = logging.getLogger("lumeo")
+
+class BatchScheduler:
+    """
+    Micro-batching queue in front of a predict function.
+
+    Requests submitted from any thread are collected for up to `max_wait_ms`
+    (or until `max_batch_size` inputs are pending), concatenated along the
+    batch dimension, run through a single forward pass and split back out
+    to each caller's Future.
+    """
+    _STOP = object()
+
+    def __init__(self, predict_fn, max_batch_size: int = BATCH_MAX_SIZE, max_wait_ms: float = BATCH_MAX_WAIT_MS):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        """Requests waiting to be picked up for a batch"""
+        return self._queue.qsize()
+
+    def start(self):
+        """Start the batching thread if needed. Raises RuntimeError after shutdown()."""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("BatchScheduler has been shut down")
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="lumeo-batcher", daemon=True)
+                self._thread.start()
+
+    def shutdown(self, timeout: float = 5.0):
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+            self._closed = True
+        if thread is not None and thread.is_alive():
+            self._queue.put(self._STOP)
+            thread.join(timeout)
+
+    def submit(self, input_tensor: torch.Tensor) -> Future:
+        """
+        Queue a [N, 3, H, W] tensor for inference.
+        Returns a Future resolving to the matching [N, 3, H, W] output.
+        """
+        self.start()
+        future = Future()
+        self._queue.put((input_tensor, future))
+        return future
+
+    def _collect(self, first) -> list:
+        batch = [first]
+        size = first[0].shape[0]
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is self._STOP:
+                # Finish this batch first, then stop on the next loop
+                self._queue.put(self._STOP)
+                break
+            batch.append(item)
+            size += item[0].shape[0]
+        return batch
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                break
+            batch = self._collect(item)
+            # Inputs of different spatial size can't share a tensor
+            groups = {}
+            for tensor, future in batch:
+                if future.set_running_or_notify_cancel():
+                    groups.setdefault(tuple(tensor.shape[1:]), []).append((tensor, future))
+            for group in groups.values():
+                self._process(group)
+
+    def _process(self, group: list):
+        tensors = [tensor for tensor, _ in group]
+        try:
+            inputs = tensors[0] if len(tensors) == 1 else torch.cat(tensors, dim=0)
+            outputs = self.predict_fn(inputs)
+        except Exception as e:
+            logger.error(f"Batched inference failed: {e}")
+            for _, future in group:
+                future.set_exception(e)
+            return
+
+        logger.debug(f"Batched forward pass: {len(group)} requests, batch size {inputs.shape[0]}")
+        offset = 0
+        for tensor, future in group:
+            n = tensor.shape[0]
+            future.set_result(outputs[offset:offset + n])
+            offset += n
+
+def read_state_dict(path) -> dict:
+    """
+    Load a checkpoint memory-mapped so tensors are backed by the page cache
+    (shared by every worker process on the host) rather than read into
+    private memory. Legacy non-zip checkpoints can't be mapped and are read
+    in full.
+    """
+    # map_location=DEVICE ensures we can load CUDA weights on CPU if needed
+    try:
+        return torch.load(path, map_location=torch.device(DEVICE), mmap=True)
+    except RuntimeError as e:
+        if "mmap" not in str(e):
+            raise
+        logger.info(f"{path} is not mmap-able, loading into memory")
+        return torch.load(path, map_location=torch.device(DEVICE))
+
+def file_version(path: Path) -> str:
+    """Short content hash of a weights file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+class LoadedModel:
+    """
+    One version of one model, ready to serve.
+    Each version has its own batching queue, so batches never mix weights.
+    """
+    def __init__(self, name: str, version: str, model, runner=None, backend: str = "eager", path=None,
+                 precision: str = "fp32"):
+        self.name = name
+        self.version = version
+        self.model = model
+        self.runner = runner if runner is not None else model
+        self.backend = backend
+        self.path = path
+        self.precision = precision
+        self.loaded_at = time.time()
+        self.load_timings = {}
+        # Inputs are converted to match a channels_last model
+        self.channels_last = False
+        self.scheduler = BatchScheduler(self.predict)
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def predict(self, input_tensor):
+        """
+        Run inference on the input tensor.
+        Input: [N, 3, H, W] tensor
+        Output: [N, 3, H, W] tensor
+        """
+        start = time.perf_counter()
+        output = self.run(input_tensor)
+        INFERENCE_SECONDS.observe(time.perf_counter() - start, model=self.version)
+        BATCH_SIZE.observe(input_tensor.shape[0], model=self.version)
+        return output
+
+    def run(self, input_tensor):
+        """Forward pass in this version's precision and memory format, without metrics"""
+        with torch.inference_mode(), autocast(self.precision):
+            input_tensor = input_tensor.to(DEVICE)
+            if self.channels_last:
+                input_tensor = input_tensor.contiguous(memory_format=torch.channels_last)
+            # Outputs leave in fp32 whatever the compute precision
+            return self.runner(input_tensor).float().cpu()
+
+    def acquire(self):
+        """Pin this version: retire() waits for the matching release()"""
+        with self._lock:
+            self.in_flight += 1
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def submit(self, input_tensor) -> Future:
+        """Queue the input on this version's micro-batching scheduler"""
+        self.acquire()
+        try:
+            future = self.scheduler.submit(input_tensor)
+        except Exception:
+            self.release()
+            raise
+        future.add_done_callback(lambda _future: self.release())
+        return future
+
+    @property
+    def device(self) -> str:
+        param = next(self.model.parameters(), None)
+        return str(param.device) if param is not None else DEVICE
+
+    def warm_up(self, size: int = IMG_SIZE):
+        """Run a dummy batch so the first real request doesn't pay for lazy init"""
+        self.predict(torch.zeros(1, 3, size, size))
+
+    def retire(self, timeout: float = 60.0):
+        """Stop the batching thread once pinned and in-flight requests have drained"""
+        def drain():
+            deadline = time.monotonic() + timeout
+            while self.in_flight > 0 and time.monotonic() < deadline:
+                time.sleep(0.05)
+            self.scheduler.shutdown()
+            logger.info(f"Retired model {self.name}:{self.version}")
+        threading.Thread(target=drain, name="lumeo-retire", daemon=True).start()
+
+    def info(self) -> dict:
+        return {
+            "name": self.name,
+            "version": self.version,
+            "backend": self.backend,
+            "precision": self.precision,
+            "in_flight": self.in_flight,
+            "loaded_at": self.loaded_at,
+            "load_ms": self.load_timings,
+        }
 
 class ModelManager:
+    """
+    Registry of loaded model versions, keyed by (name, version).
+
+    New weights are loaded and warmed in the background, then swapped in
+    atomically: new requests go to the new active version while requests
+    already submitted finish on the version they started with.
+    """
     _instance = None
-    model = None
+    models = None
+    active = None
+    policy = None
+    _lock = threading.Lock()
+    # Serialises first-use loading, so racing requests don't each load the weights
+    _load_lock = threading.Lock()
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(ModelManager, cls).__new__(cls)
+            cls._instance.models = {}
+            cls._instance.active = {}
             # cls._instance.load_model() # Removed to allow lazy loading and avoid import-time error
         return cls._instance
 
+    @classmethod
+    def standalone(cls, policy=None):
+        """A manager with its own registry, outside the process-wide instance (tests, tools)"""
+        manager = super().__new__(cls)
+        manager.models = {}
+        manager.active = {}
+        manager.policy = policy
+        manager._lock = threading.Lock()
+        manager._load_lock = threading.Lock()
+        return manager
+
+    @property
+    def current(self):
+        """The active LoadedModel for the default model name, or None"""
+        version = self.active.get(MODEL_NAME)
+        return self.models.get((MODEL_NAME, version))
+
+    @property
+    def model(self):
+        current = self.current
+        return current.model if current is not None else None
+
+    @model.setter
+    def model(self, model):
+        # Serve an in-memory model directly (tests, notebooks)
+        self.register(LoadedModel(MODEL_NAME, "local", model.eval()))
+
+    @property
+    def weights_version(self) -> str:
+        current = self.current
+        return current.version if current is not None else "unknown"
+
+    @property
+    def backend(self) -> str:
+        current = self.current
+        return current.backend if current is not None else INFERENCE_BACKEND
+
     def load_model(self):
-        if self.model is not None:
-            return
+        """Load the default weights unless loaded; concurrent callers wait for the one load"""
+        with self._load_lock:
+            if self.current is not None:
+                return
+
+            if self.policy is None:
+                self.policy = default_policy()
+                self.policy.apply()
+            entry = self.load_weights(MODEL_PATH, name=MODEL_NAME, version=MODEL_VERSION)
+            if INFERENCE_AUTOTUNE:
+                # Memory format can only be switched on the eager fp32 module;
+                # other precisions are timed as they will run
+                tune_format = entry.backend == "eager" and entry.precision == "fp32"
+                self.policy = autotune(entry.runner if tune_format else entry.run, self.policy,
+                                       tune_format=tune_format)
+                if tune_format:
+                    entry.channels_last = self.policy.channels_last
 
-        print(f"Loading model from {MODEL_PATH}...")
+    def load_weights(self, path, name: str = MODEL_NAME, version: str = None,
+                     backend: str = INFERENCE_BACKEND, precision: str = INFERENCE_PRECISION,
+                     activate: bool = True) -> LoadedModel:
+        """
+        Load, warm up and register one weights file.
+        With activate=True the new version becomes the default atomically.
+        """
+        path = Path(path)
+        started = time.perf_counter()
+        timer = StageTimer()
+        print(f"Loading model from {path}...")
         try:
             # Debug: Check file size and header
-            if MODEL_PATH.exists():
-                size_mb = MODEL_PATH.stat().st_size / (1024 * 1024)
-                print(f"Model file found at {MODEL_PATH} (Size: {size_mb:.2f} MB)")
+            if path.exists():
+                size_mb = path.stat().st_size / (1024 * 1024)
+                print(f"Model file found at {path} (Size: {size_mb:.2f} MB)")
                 
                 # Check for LFS pointer
-                with open(MODEL_PATH, 'rb') as f:
+                with open(path, 'rb') as f:
                     header = f.read(100)
                     print(f"File header: {header}")
                     if b"version https://git-lfs.github.com/spec/v1" in header:
                         print("CRITICAL ERROR: Model file is an LFS pointer, not the actual weights!")
             else:
-                print(f"CRITICAL ERROR: Model file not found at {MODEL_PATH}")
-
-            # Initialize model architecture
-            self.model = UNet()
-            
-            # Load weights
-            # map_location=DEVICE ensures we can load CUDA weights on CPU if needed
-            state_dict = torch.load(MODEL_PATH, map_location=torch.device(DEVICE))
-            self.model.load_state_dict(state_dict)
-            
-            # Set to eval mode
-            self.model.to(DEVICE)
-            self.model.eval()
+                print(f"CRITICAL ERROR: Model file not found at {path}")
+
+            with timer.stage("weights"):
+                # Load weights; assign=True adopts the (memory-mapped) tensors
+                # instead of copying them into the freshly initialised ones
+                state_dict = read_state_dict(path)
+                
+                # Initialize model architecture at the width and depth the weights were trained with
+                model = UNet(**unet_config(state_dict))
+                model.load_state_dict(state_dict, assign=True)
+                
+                # Set to eval mode
+                model.to(DEVICE)
+                model.eval()
             print("Model loaded successfully!")
         except Exception as e:
             print(f"Error loading model: {e}")
             raise e
 
-    def predict(self, input_tensor):
+        precision = resolve_precision(precision, backend)
+        if precision == "auto":
+            from backend.core.backends import calibration_samples
+            with timer.stage("precision"):
+                precision, _ = pick_auto(model, calibration_samples(AUTO_SAMPLES))
+        channels_last = backend in ("eager", "compile") and (
+            uses_channels_last(precision) or self.policy is not None and self.policy.channels_last
+        )
+        if channels_last:
+            set_memory_format(model, True)
+        with timer.stage("backend"):
+            runner, backend = self.build_runner(model, backend)
+        entry = LoadedModel(name, version or file_version(path), model, runner, backend, path, precision)
+        entry.channels_last = channels_last and backend in ("eager", "compile")
+        with timer.stage("warm_up"):
+            entry.warm_up()
+        entry.load_timings = timer.timings
+        print(f"Model {entry.version} ready in {timer.timings} ms")
+        MODEL_LOAD_SECONDS.set(round(time.perf_counter() - started, 3), model=entry.version)
+        self.register(entry, activate=activate)
+        return entry
+
+    def load_weights_async(self, path, **kwargs) -> threading.Thread:
+        """Load weights on a background thread; serving continues meanwhile"""
+        def load():
+            try:
+                self.load_weights(path, **kwargs)
+            except Exception as e:
+                logger.error(f"Background model load from {path} failed: {e}")
+        thread = threading.Thread(target=load, name="lumeo-model-load", daemon=True)
+        thread.start()
+        return thread
+
+    def build_runner(self, model, name: str) -> tuple:
+        """
+        Build the configured inference backend on top of the eager model,
+        falling back to eager fp32 if it can't be built on this host.
+        Raises ValueError for unknown backend names.
+        """
+        from backend.core.backends import BACKENDS, build_backend
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown inference backend '{name}'. Options: {', '.join(BACKENDS)}")
+        try:
+            runner = build_backend(name, model)
+            logger.info(f"Inference backend: {name}")
+            return runner, name
+        except Exception as e:
+            logger.warning(f"Could not build '{name}' inference backend, using eager: {e}")
+            return model, "eager"
+
+    def register(self, entry: LoadedModel, activate: bool = True):
+        retired = []
+        with self._lock:
+            key = (entry.name, entry.version)
+            replaced = self.models.pop(key, None)
+            if replaced is not None:
+                retired.append(replaced)
+            self.models[key] = entry
+            if activate or entry.name not in self.active:
+                self.active[entry.name] = entry.version
+
+            # Keep the active version plus the most recently registered others for A/B
+            versions = [
+                m for (n, _), m in reversed(self.models.items())
+                if n == entry.name and m.version != self.active[entry.name]
+            ]
+            for old in versions[max(0, MODEL_KEEP_VERSIONS - 1):]:
+                del self.models[(old.name, old.version)]
+                retired.append(old)
+        logger.info(f"Registered model {entry.name}:{entry.version}" + (" (active)" if activate else ""))
+        for old in retired:
+            old.retire()
+
+    def activate(self, version: str, name: str = MODEL_NAME):
+        with self._lock:
+            if (name, version) not in self.models:
+                raise KeyError(f"{name}:{version}")
+            self.active[name] = version
+
+    def get(self, version: str = None, name: str = MODEL_NAME, pin: bool = False) -> LoadedModel:
+        """
+        Resolve a model version, loading the default weights on first use.
+        Raises KeyError for unknown names or versions.
+        """
+        if self.current is None and name == MODEL_NAME:
+            self.load_model()
+        with self._lock:
+            version = version or self.active.get(name)
+            entry = self.models.get((name, version))
+            if entry is None:
+                raise KeyError(f"{name}:{version}")
+            if pin:
+                # Under the registry lock, so a concurrent swap either sees
+                # the pin or has already replaced the entry
+                entry.acquire()
+        return entry
+
+    def acquire(self, version: str = None, name: str = MODEL_NAME) -> LoadedModel:
+        """
+        get() for a whole request: the version stays loaded until release()
+        is called on the returned model, even if it is swapped out meanwhile.
+        """
+        return self.get(version, name, pin=True)
+
+    def list_models(self) -> list:
+        with self._lock:
+            return [
+                {**entry.info(), "active": self.active.get(entry.name) == entry.version}
+                for entry in self.models.values()
+            ]
+
+    def predict(self, input_tensor, version: str = None):
         """
         Run inference on the input tensor.
         Input: [1, 3, H, W] tensor
         Output: [1, 3, H, W] tensor
         """
-        if self.model is None:
-            self.load_model()
-            
-        with torch.no_grad():
-            input_tensor = input_tensor.to(DEVICE)
-            output = self.model(input_tensor)
-            return output.cpu()
+        return self.get(version).predict(input_tensor)
+
+    def submit(self, input_tensor, version: str = None) -> Future:
+        """
+        Queue the input tensor on the micro-batching scheduler.
+        Returns a Future resolving to the output tensor; await it from
+        async code with asyncio.wrap_future().
+        """
+        return self.get(version).submit(input_tensor)
+
+    def shutdown(self):
+        with self._lock:
+            entries = list(self.models.values())
+            # Schedulers can't restart, so a later load_model() loads afresh
+            self.models.clear()
+            self.active.clear()
+        for entry in entries:
+            entry.scheduler.shutdown()
+
+if MODEL_HOST:
+    # Web worker of a shared model host: no local weights
+    from backend.core.model_host import ModelHostClient
+    model_manager = ModelHostClient()
+else:
+    model_manager = ModelManager()
 
-model_manager = ModelManager()
+Gauge(
+    "lumeo_batch_queue_depth", "Inference requests waiting for a batch",
+    callback=lambda: sum(entry.scheduler.pending for entry in list(model_manager.models.values()))
+)
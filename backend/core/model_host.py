@@ -0,0 +1,390 @@
+"""
+Shared model host.
+
+Running uvicorn with several workers normally gives every process its own
+ModelManager and its own copy of the weights. With MODEL_HOST set to a
+Unix socket path, one host process per machine owns the weights, the
+intra-op threads and the micro-batcher, and web workers become thin
+clients:
+
+    MODEL_HOST=/tmp/lumeo-model.sock python -m backend.core.model_host
+    MODEL_HOST=/tmp/lumeo-model.sock uvicorn backend.main:app --workers 4
+
+Control messages go over a multiprocessing Connection; tensors don't. Each
+client thread owns a shared memory slot: the input is written into it,
+the host runs the model on a tensor viewing that memory and writes the
+output back into the same slot (the UNet preserves the input shape).
+Requests from all workers meet in the host's BatchScheduler, so they are
+batched together as well.
+
+A request pins its model version on the host (describe with pin=True)
+until it sends release, so a hot reload can't retire the version between
+the tiles of one request. Pins belong to the client, not the connection
+they arrived on, and are dropped when the client's last connection
+closes, so a worker that dies can't leave versions pinned.
+"""
+import os
+import time
+import uuid
+import socket
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+import torch
+from backend.config import MODEL_HOST, MODEL_HOST_AUTHKEY, MODEL_NAME, INFERENCE_BACKEND, INFERENCE_WORKERS
+
+logger = logging.getLogger("lumeo")
+
+ERRORS = {"KeyError": KeyError, "ValueError": ValueError}
+# How long a client reuses the host's answer to "which version is active"
+DESCRIBE_TTL_S = 1.0
+
+def attach(name: str) -> SharedMemory:
+    """Open a client's shared memory slot without taking ownership of it"""
+    try:
+        return SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: stop the resource tracker from unlinking the client's segment
+        from multiprocessing import resource_tracker
+        shm = SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+def tensor_view(shm: SharedMemory, shape) -> torch.Tensor:
+    """float32 tensor sharing the slot's memory"""
+    return torch.from_numpy(np.ndarray(shape, dtype=np.float32, buffer=shm.buf))
+
+class ModelHost:
+    """Serves a ModelManager to local web workers over a Unix socket"""
+    def __init__(self, manager, address: str = MODEL_HOST, authkey: str = MODEL_HOST_AUTHKEY):
+        self.manager = manager
+        self.address = address
+        self.authkey = authkey.encode()
+        self._listener = None
+        # client id -> [open connections, pinned LoadedModels]
+        self._clients = {}
+        self._clients_lock = threading.Lock()
+
+    def serve_forever(self):
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        self._listener = Listener(self.address, family="AF_UNIX", authkey=self.authkey)
+        logger.info(f"Model host listening on {self.address}")
+        while True:
+            # shutdown() clears the attribute before closing the listener
+            listener = self._listener
+            if listener is None:
+                return
+            try:
+                conn = listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                # Listener closed by shutdown(), or a client failed authentication
+                continue
+            if self._listener is None:
+                conn.close()
+                return
+            threading.Thread(target=self._serve, args=(conn,), name="lumeo-host-conn", daemon=True).start()
+
+    def shutdown(self):
+        listener, self._listener = self._listener, None
+        if listener is None:
+            return
+        # Closing the socket doesn't interrupt a blocked accept(); a throwaway
+        # connection wakes it so serve_forever sees the shutdown and returns
+        try:
+            with socket.socket(socket.AF_UNIX) as wake:
+                wake.connect(self.address)
+        except OSError:
+            pass
+        listener.close()
+
+    def _serve(self, conn):
+        slot = None
+        client = None
+        try:
+            while True:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    return
+                if client is None and request.get("client"):
+                    client = request["client"]
+                    self._connect(client)
+                try:
+                    if request["op"] == "predict" and (slot is None or slot.name != request["slot"]):
+                        if slot is not None:
+                            slot.close()
+                        slot = attach(request["slot"])
+                    reply = self.handle(request, slot)
+                except Exception as e:
+                    reply = {"error": type(e).__name__, "message": str(e)}
+                conn.send(reply)
+        finally:
+            if client is not None:
+                self._disconnect(client)
+            if slot is not None:
+                slot.close()
+            conn.close()
+
+    def _connect(self, client: str):
+        with self._clients_lock:
+            self._clients.setdefault(client, [0, []])[0] += 1
+
+    def _disconnect(self, client: str):
+        """Drop one of a client's connections; its pins go with the last one"""
+        with self._clients_lock:
+            state = self._clients[client]
+            state[0] -= 1
+            if state[0] > 0:
+                return
+            del self._clients[client]
+        if state[1]:
+            logger.warning(f"Releasing {len(state[1])} pins of a disconnected client")
+        for entry in state[1]:
+            entry.release()
+
+    def _pin(self, client: str, entry):
+        with self._clients_lock:
+            if client not in self._clients:
+                entry.release()
+                raise ValueError("Pins need a connected client id")
+            self._clients[client][1].append(entry)
+
+    def _pinned(self, client: str, version: str, remove: bool = False):
+        """The client's pinned entry for `version`, or None"""
+        with self._clients_lock:
+            pins = self._clients[client][1] if client in self._clients else []
+            for entry in pins:
+                if entry.version == version:
+                    if remove:
+                        pins.remove(entry)
+                    return entry
+        return None
+
+    def handle(self, request: dict, slot: SharedMemory = None) -> dict:
+        op = request["op"]
+        client = request.get("client")
+        if op == "predict":
+            # A version the client pinned keeps serving after a swap retires it from the registry
+            entry = self._pinned(client, request["version"])
+            if entry is not None:
+                entry.acquire()
+            else:
+                entry = self.manager.acquire(request["version"])
+            try:
+                view = tensor_view(slot, request["shape"])
+                output = entry.submit(view).result()
+            finally:
+                entry.release()
+            if tuple(output.shape) != tuple(view.shape):
+                raise ValueError(f"Output shape {tuple(output.shape)} does not match input {tuple(view.shape)}")
+            view.copy_(output)
+            return {"version": entry.version}
+        if op == "describe":
+            entry = self.manager.get(request.get("version"), pin=request.get("pin", False))
+            if request.get("pin"):
+                self._pin(client, entry)
+            return {"version": entry.version, "backend": entry.backend, "device": entry.device,
+                    "precision": entry.precision}
+        if op == "release":
+            entry = self._pinned(client, request["version"], remove=True)
+            if entry is not None:
+                entry.release()
+            return {}
+        if op == "list":
+            return {"models": self.manager.list_models()}
+        if op == "load":
+            self.manager.load_weights_async(request["path"], version=request.get("version"),
+                                            activate=request.get("activate", True))
+            return {}
+        if op == "activate":
+            self.manager.activate(request["version"])
+            return {}
+        raise ValueError(f"Unknown op '{op}'")
+
+class RemoteModel:
+    """A model version served by the host; same serving interface as LoadedModel"""
+    def __init__(self, client, name: str, version: str, backend: str, device: str, precision: str = "fp32"):
+        self.client = client
+        self.name = name
+        self.version = version
+        self.backend = backend
+        self.device = device
+        self.precision = precision
+
+    def predict(self, input_tensor):
+        return self.client.predict(input_tensor, self.version)
+
+    def submit(self, input_tensor) -> Future:
+        return self.client.pool.submit(self.predict, input_tensor)
+
+    def acquire(self):
+        """Pin this version on the host (a blocking round trip)"""
+        self.client.get(self.version, self.name, pin=True)
+
+    def release(self):
+        self.client.release(self.version)
+
+class ModelHostClient:
+    """
+    Stand-in for ModelManager in web workers when MODEL_HOST is set.
+    Each thread keeps its own connection and shared memory slot; slots are
+    unlinked on shutdown(). Version lookups are cached for DESCRIBE_TTL_S
+    so request handlers and health checks rarely wait on the socket.
+    """
+    def __init__(self, address: str = MODEL_HOST, authkey: str = MODEL_HOST_AUTHKEY):
+        self.address = address
+        self.authkey = authkey.encode()
+        # Identifies this worker's pins across its per-thread connections
+        self.id = uuid.uuid4().hex
+        # No local versions; kept for the metrics that walk the registry
+        self.models = {}
+        # Enough threads to keep the host's batcher fed from this worker
+        self.pool = ThreadPoolExecutor(max_workers=max(4, INFERENCE_WORKERS * 4), thread_name_prefix="lumeo-host")
+        self._local = threading.local()
+        self._slots = []
+        self._slots_lock = threading.Lock()
+        # version -> (expires at, RemoteModel)
+        self._described = {}
+
+    def _call(self, request: dict) -> dict:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+        try:
+            conn.send({**request, "client": self.id})
+            reply = conn.recv()
+        except (EOFError, OSError):
+            # Host restarted; reconnect on the next call
+            self._local.conn = None
+            conn.close()
+            raise
+        if "error" in reply:
+            raise ERRORS.get(reply["error"], RuntimeError)(reply["message"])
+        return reply
+
+    def _slot(self, nbytes: int) -> SharedMemory:
+        slot = getattr(self._local, "slot", None)
+        if slot is None or slot.size < nbytes:
+            if slot is not None:
+                self._free(slot)
+            slot = self._local.slot = SharedMemory(create=True, size=nbytes)
+            with self._slots_lock:
+                self._slots.append(slot)
+        return slot
+
+    def _free(self, slot: SharedMemory):
+        with self._slots_lock:
+            if slot not in self._slots:
+                return
+            self._slots.remove(slot)
+        try:
+            slot.close()
+        except BufferError:
+            # A tensor still views it; the mapping goes when that does
+            pass
+        slot.unlink()
+
+    def predict(self, input_tensor, version: str = None):
+        input_tensor = input_tensor.detach().to(torch.float32).contiguous()
+        slot = self._slot(input_tensor.numel() * 4)
+        view = tensor_view(slot, tuple(input_tensor.shape))
+        view.copy_(input_tensor)
+        self._call({"op": "predict", "version": version, "slot": slot.name, "shape": tuple(input_tensor.shape)})
+        # The slot is reused by this thread's next call
+        return view.clone()
+
+    def submit(self, input_tensor, version: str = None) -> Future:
+        return self.pool.submit(self.predict, input_tensor, version)
+
+    def get(self, version: str = None, name: str = MODEL_NAME, pin: bool = False) -> RemoteModel:
+        """
+        Resolve a version on the host. Raises KeyError for unknown versions.
+        With pin=True the host keeps the version loaded until release() is
+        called on the returned model.
+        """
+        now = time.monotonic()
+        cached = self._described.get(version)
+        if cached is not None and cached[0] > now and not pin:
+            return cached[1]
+        reply = self._call({"op": "describe", "version": version, "pin": pin})
+        model = RemoteModel(self, name, reply["version"], reply["backend"], reply["device"],
+                            reply.get("precision", "fp32"))
+        self._described[version] = (now + DESCRIBE_TTL_S, model)
+        return model
+
+    def acquire(self, version: str = None, name: str = MODEL_NAME) -> RemoteModel:
+        return self.get(version, name, pin=True)
+
+    def release(self, version: str):
+        """Drop a pin; sent from the pool, as requests release on the event loop"""
+        try:
+            future = self.pool.submit(self._call, {"op": "release", "version": version})
+        except RuntimeError:
+            # Shut down: the host drops the pins when the connections close
+            return
+        future.add_done_callback(
+            lambda done: done.exception() and logger.warning(f"Releasing {version} failed: {done.exception()}")
+        )
+
+    @property
+    def current(self):
+        try:
+            return self.get()
+        except Exception:
+            return None
+
+    @property
+    def weights_version(self) -> str:
+        current = self.current
+        return current.version if current is not None else "unknown"
+
+    @property
+    def backend(self) -> str:
+        current = self.current
+        return current.backend if current is not None else INFERENCE_BACKEND
+
+    def load_model(self):
+        """Check the host is reachable and has the default model loaded"""
+        current = self.get()
+        logger.info(f"Using model host {self.address} ({current.version}, {current.backend})")
+
+    def load_weights_async(self, path, version: str = None, activate: bool = True):
+        self._call({"op": "load", "path": str(path), "version": version, "activate": activate})
+
+    def activate(self, version: str, name: str = MODEL_NAME):
+        self._call({"op": "activate", "version": version})
+        self._described.clear()
+
+    def list_models(self) -> list:
+        return self._call({"op": "list"})["models"]
+
+    def shutdown(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        with self._slots_lock:
+            slots = list(self._slots)
+        for slot in slots:
+            self._free(slot)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if not MODEL_HOST:
+        raise SystemExit("Set MODEL_HOST to the Unix socket path to serve on")
+    from backend.core.model import ModelManager
+    from backend.core.threads import default_policy
+
+    manager = ModelManager()
+    # The host is the only process on the machine running inference
+    manager.policy = default_policy(workers=1)
+    manager.policy.apply()
+    manager.load_model()
+    host = ModelHost(manager)
+    try:
+        host.serve_forever()
+    except KeyboardInterrupt:
+        host.shutdown()
+        manager.shutdown()
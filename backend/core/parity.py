@@ -0,0 +1,101 @@
+import time
+import torch
+import torch.nn.functional as F
+
+def psnr(output: torch.Tensor, reference: torch.Tensor) -> float:
+    """Peak signal-to-noise ratio in dB for tensors in [0, 1]"""
+    mse = F.mse_loss(output.float(), reference.float()).item()
+    if mse == 0:
+        return float("inf")
+    return 10 * torch.log10(torch.tensor(1.0 / mse)).item()
+
+def _gaussian_window(size: int = 11, sigma: float = 1.5) -> torch.Tensor:
+    coords = torch.arange(size, dtype=torch.float32) - size // 2
+    g = torch.exp(-(coords ** 2) / (2 * sigma ** 2))
+    g /= g.sum()
+    return (g[:, None] * g[None, :]).view(1, 1, size, size)
+
+def ssim(output: torch.Tensor, reference: torch.Tensor) -> float:
+    """Mean structural similarity for [B, C, H, W] tensors in [0, 1]"""
+    output, reference = output.float(), reference.float()
+    channels = output.shape[1]
+    window = _gaussian_window().to(output.device).repeat(channels, 1, 1, 1)
+    pad = window.shape[-1] // 2
+
+    def blur(x):
+        return F.conv2d(x, window, padding=pad, groups=channels)
+
+    c1, c2 = 0.01 ** 2, 0.03 ** 2
+    mu_x, mu_y = blur(output), blur(reference)
+    sigma_x = blur(output * output) - mu_x ** 2
+    sigma_y = blur(reference * reference) - mu_y ** 2
+    sigma_xy = blur(output * reference) - mu_x * mu_y
+    score = ((2 * mu_x * mu_y + c1) * (2 * sigma_xy + c2)) / \
+            ((mu_x ** 2 + mu_y ** 2 + c1) * (sigma_x + sigma_y + c2))
+    return score.mean().item()
+
+def time_call(fn, input_tensor: torch.Tensor, repeats: int = 3) -> tuple:
+    """Run fn once to warm up, then return (output, best latency in ms)"""
+    with torch.inference_mode():
+        output = fn(input_tensor)
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn(input_tensor)
+            best = min(best, (time.perf_counter() - start) * 1000)
+    return output, best
+
+def parity_report(reference, candidate, samples: list, repeats: int = 3) -> dict:
+    """
+    Compare a candidate inference callable against the fp32 reference.
+    Returns worst-case PSNR/SSIM over the samples and best-of-N latencies.
+    """
+    psnrs, ssims, ref_ms, cand_ms = [], [], [], []
+    for sample in samples:
+        expected, ref_latency = time_call(reference, sample, repeats)
+        actual, cand_latency = time_call(candidate, sample, repeats)
+        psnrs.append(psnr(actual.clamp(0, 1), expected.clamp(0, 1)))
+        ssims.append(ssim(actual.clamp(0, 1), expected.clamp(0, 1)))
+        ref_ms.append(ref_latency)
+        cand_ms.append(cand_latency)
+
+    reference_ms = sum(ref_ms) / len(ref_ms)
+    latency_ms = sum(cand_ms) / len(cand_ms)
+    return {
+        "psnr_db": round(min(psnrs), 2),
+        "ssim": round(min(ssims), 4),
+        "latency_ms": round(latency_ms, 2),
+        "reference_latency_ms": round(reference_ms, 2),
+        "speedup": round(reference_ms / latency_ms, 2) if latency_ms else None,
+    }
+
+def count_params(model: torch.nn.Module) -> int:
+    return sum(p.numel() for p in model.parameters())
+
+def count_flops(model: torch.nn.Module, size: int = 256) -> int:
+    """
+    Convolution FLOPs (2 x multiply-accumulates) for one [1, 3, size, size]
+    forward pass. Pointwise layers (BatchNorm, ReLU, pooling) are ignored.
+    """
+    macs = []
+
+    def conv_hook(module, inputs, output):
+        kernel = module.kernel_size[0] * module.kernel_size[1] // module.groups
+        if isinstance(module, torch.nn.ConvTranspose2d):
+            macs.append(inputs[0].numel() * module.out_channels * kernel)
+        else:
+            macs.append(output.numel() * module.in_channels * kernel)
+
+    handles = [m.register_forward_hook(conv_hook) for m in model.modules()
+               if isinstance(m, (torch.nn.Conv2d, torch.nn.ConvTranspose2d))]
+    # Eval mode so BatchNorm running statistics aren't touched
+    training = model.training
+    model.eval()
+    try:
+        with torch.inference_mode():
+            model(torch.zeros(1, 3, size, size))
+    finally:
+        model.train(training)
+        for handle in handles:
+            handle.remove()
+    return 2 * sum(macs)
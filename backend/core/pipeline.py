@@ -0,0 +1,56 @@
+import asyncio
+from backend.config import IMG_SIZE
+from backend.core.image import ImageSource, tensor_to_bytes, normalize_output_format
+from backend.core.executor import StageTimer, run_inline
+from backend.core.tiling import tiled_predict_async
+
+async def enhance_source(source: ImageSource, model, mode: str = "fast", format: str = "png",
+                         quality: int = None, size: tuple = None, progress=None, run=run_inline,
+                         timer: StageTimer = None) -> tuple:
+    """
+    Decode -> inference -> encode for one parsed upload, shared by
+    /enhance_v2 and the job workers. Model batches are awaited rather than
+    waited on, so no thread is held during inference; decode and encode go
+    through `run` (e.g. InferenceExecutor.run).
+    size: (width, height) for the fast mode (default IMG_SIZE square).
+    Stages are recorded on `timer` and `progress(fraction)` is called as
+    they complete, if given. Returns (encoded bytes, metadata dict).
+    """
+    report = progress or (lambda fraction: None)
+    timer = timer or StageTimer()
+
+    if mode == "full":
+        with timer.stage("decode"):
+            input_tensor = await run(source.to_tensor)
+        report(0.1)
+        # Tiles go through the batcher in groups of TILE_BATCH_SIZE
+        with timer.stage("inference"):
+            output_tensor = await tiled_predict_async(
+                input_tensor,
+                model.submit,
+                progress=lambda done, total: report(0.1 + 0.8 * done / total),
+                run=run,
+            )
+    else:
+        # Single decode, at reduced scale for JPEGs
+        with timer.stage("decode"):
+            input_tensor = await run(source.to_tensor, size or (IMG_SIZE, IMG_SIZE))
+        report(0.1)
+        # Micro-batched with concurrent requests
+        with timer.stage("inference"):
+            output_tensor = await asyncio.wrap_future(model.submit(input_tensor))
+        report(0.9)
+
+    with timer.stage("encode"):
+        img_bytes = await run(tensor_to_bytes, output_tensor, format=format, quality=quality)
+    report(1.0)
+
+    meta = {
+        "format": normalize_output_format(format),
+        "mode": mode,
+        "model_version": model.version,
+        "original_size": {"width": source.width, "height": source.height},
+        "output_size": {"width": output_tensor.shape[-1], "height": output_tensor.shape[-2]},
+        "inference_size": {"width": input_tensor.shape[-1], "height": input_tensor.shape[-2]},
+    }
+    return img_bytes, meta
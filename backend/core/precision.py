@@ -0,0 +1,130 @@
+"""
+Reduced-precision inference modes (INFERENCE_PRECISION):
+
+- fp32:          float32, NCHW unless CHANNELS_LAST is set
+- channels_last: float32 in NHWC, the layout oneDNN convolutions prefer
+- bf16:          bfloat16 autocast in NHWC; runs natively on CPUs with
+                 AVX512-BF16 or AMX (and on CUDA devices that support it)
+- auto:          bf16 when the host runs it natively and, on a check
+                 at load time, it is faster and within PRECISION_MIN_PSNR of
+                 fp32; fp32 otherwise
+
+Every mode runs under torch.inference_mode(). Modes the host or the
+backend can't run fall back to fp32 with a warning. Run
+`python -m backend.core.precision` for a parity report of each mode.
+"""
+import copy
+import json
+import logging
+import argparse
+import contextlib
+import torch
+from backend.config import DEVICE, IMG_SIZE, PRECISION_MIN_PSNR
+
+logger = logging.getLogger("lumeo")
+
+PRECISIONS = ["fp32", "channels_last", "bf16", "auto"]
+# Backends that run the nn.Module itself, so autocast and memory format apply
+MODULE_BACKENDS = ("eager", "compile")
+# The 'auto' check at load time, sized like the CLI's defaults: one image
+# or one timing is too noisy to decide a speedup on
+AUTO_SAMPLES = 4
+AUTO_REPEATS = 3
+
+def cpu_flags() -> set:
+    """Feature flags of the host CPU (empty where /proc/cpuinfo doesn't exist)"""
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    return set(line.split(":", 1)[1].split())
+    except OSError:
+        pass
+    return set()
+
+def native_bf16(device: str = DEVICE) -> bool:
+    """Whether bf16 convolutions run in hardware here rather than emulated (slower than fp32)"""
+    if device.startswith("cuda"):
+        return torch.cuda.is_available() and torch.cuda.is_bf16_supported()
+    return torch.backends.mkldnn.is_available() and bool({"avx512_bf16", "amx_bf16"} & cpu_flags())
+
+def uses_channels_last(precision: str) -> bool:
+    return precision in ("channels_last", "bf16")
+
+def autocast(precision: str, device: str = DEVICE):
+    """Autocast context for `precision` (a no-op for the fp32 modes)"""
+    if precision != "bf16":
+        return contextlib.nullcontext()
+    return torch.autocast("cuda" if device.startswith("cuda") else "cpu", dtype=torch.bfloat16)
+
+def resolve_precision(requested: str, backend: str, device: str = DEVICE) -> str:
+    """
+    The mode to actually run for a requested one: fp32 when the backend
+    doesn't run the module or the host has no native bf16. 'auto' stays
+    'auto' when bf16 is possible; see pick_auto. Raises ValueError for
+    unknown modes.
+    """
+    if requested not in PRECISIONS:
+        raise ValueError(f"Unknown inference precision '{requested}'. Options: {', '.join(PRECISIONS)}")
+    if requested == "fp32":
+        return requested
+    if backend not in MODULE_BACKENDS:
+        logger.warning(f"INFERENCE_PRECISION={requested} needs the eager or compile backend, using fp32 with {backend}")
+        return "fp32"
+    if requested in ("bf16", "auto") and not native_bf16(device):
+        if requested == "bf16":
+            logger.warning("No native bf16 on this host (needs AVX512-BF16 or AMX), using fp32")
+        return "fp32"
+    return requested
+
+def make_runner(model: torch.nn.Module, precision: str, device: str = DEVICE):
+    """Callable running a copy of `model` in `precision`, for parity checks"""
+    if uses_channels_last(precision):
+        model = copy.deepcopy(model).to(memory_format=torch.channels_last)
+
+    def run(x):
+        if uses_channels_last(precision):
+            x = x.contiguous(memory_format=torch.channels_last)
+        with autocast(precision, device):
+            return model(x).float()
+    return run
+
+def pick_auto(model: torch.nn.Module, samples: list, min_psnr: float = PRECISION_MIN_PSNR,
+              repeats: int = AUTO_REPEATS) -> tuple:
+    """(bf16 or fp32, parity report of bf16 against fp32 over `samples`, best of `repeats`) for the 'auto' mode"""
+    from backend.core.parity import parity_report
+    report = parity_report(model, make_runner(model, "bf16"), samples, repeats=repeats)
+    precision = "bf16" if report["psnr_db"] >= min_psnr and (report["speedup"] or 0) > 1 else "fp32"
+    logger.info(f"Auto precision picked {precision}: {report}")
+    return precision, report
+
+def main():
+    from backend.core.parity import parity_report
+    from backend.core.backends import calibration_samples
+    from backend.core.benchmark import load_model
+
+    parser = argparse.ArgumentParser(description="Compare inference precision modes against fp32")
+    parser.add_argument("--precisions", nargs="+", default=["channels_last", "bf16"], choices=PRECISIONS[:3])
+    parser.add_argument("--weights", default=None, help="Weights file (default: MODEL_PATH)")
+    parser.add_argument("--random-weights", action="store_true", help="Skip loading weights")
+    parser.add_argument("--size", type=int, default=IMG_SIZE)
+    parser.add_argument("--samples", type=int, default=AUTO_SAMPLES)
+    parser.add_argument("--min-psnr", type=float, default=PRECISION_MIN_PSNR, help="Tolerance in dB vs fp32")
+    args = parser.parse_args()
+
+    model = load_model(args.weights, args.random_weights)
+
+    samples = calibration_samples(args.samples, args.size)
+    results = {}
+    for precision in args.precisions:
+        report = parity_report(model, make_runner(model, precision), samples)
+        report["within_tolerance"] = report["psnr_db"] >= args.min_psnr
+        results[precision] = report
+        print(f"{precision}: {report}")
+
+    candidates = [p for p, r in results.items() if r["within_tolerance"]]
+    best = min(candidates, key=lambda p: results[p]["latency_ms"], default="fp32")
+    print(json.dumps({"native_bf16": native_bf16("cpu"), "results": results, "recommended": best}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Adaptive inference resolution for the fast mode.
+
+Instead of every image running at IMG_SIZE x IMG_SIZE, the policy picks a
+per-request size that keeps the aspect ratio:
+
+- the quality tier caps the long side (RESOLUTION_TIERS),
+- inputs are never upscaled, except up to RESOLUTION_MIN,
+- past RESOLUTION_LOAD_KNEE the long side shrinks with executor load, to
+  half at saturation, so latency degrades gradually instead of queueing,
+
+and both sides are rounded down to multiples of 16 (the UNet pools four times).
+
+The micro-batcher only groups requests of the same shape, so exact
+per-image sizes would run almost every request alone. Sizes are snapped
+to buckets instead: the long side down to a multiple of RESOLUTION_BUCKET
+and the aspect ratio to the nearest common one (ASPECT_BUCKETS) when it
+is within ASPECT_TOLERANCE. That trades a slight stretch for shared
+shapes; RESOLUTION_BUCKET=0 keeps exact sizes.
+"""
+import math
+from backend.config import (
+    RESOLUTION_TIERS, RESOLUTION_DEFAULT_TIER, RESOLUTION_MIN, RESOLUTION_LOAD_KNEE, RESOLUTION_BUCKET,
+)
+
+ALIGN = 16
+# Long side / short side of common photo and video frames
+ASPECT_BUCKETS = (1.0, 5 / 4, 4 / 3, 3 / 2, 16 / 9, 2.0)
+# Largest relative aspect change made to land in a bucket
+ASPECT_TOLERANCE = 0.05
+
+def parse_tiers(spec: str) -> dict:
+    """'low:256,standard:512' -> {'low': 256, 'standard': 512}"""
+    tiers = {}
+    for item in spec.split(","):
+        name, _, size = item.strip().partition(":")
+        tiers[name.strip()] = int(size)
+    return tiers
+
+def check_default_tier(tiers: dict, default: str):
+    """Raises ValueError when the default tier isn't one of `tiers`"""
+    if default not in tiers:
+        raise ValueError(f"RESOLUTION_DEFAULT_TIER '{default}' is not in RESOLUTION_TIERS "
+                         f"(options: {', '.join(tiers)})")
+
+QUALITY_TIERS = parse_tiers(RESOLUTION_TIERS)
+# Fail at startup rather than on the first request that omits ?tier=
+check_default_tier(QUALITY_TIERS, RESOLUTION_DEFAULT_TIER)
+
+def align(value: float) -> int:
+    """Round down to a multiple of ALIGN (at least ALIGN), so caps are never exceeded"""
+    return max(ALIGN, int(value) // ALIGN * ALIGN)
+
+def load_pressure(load: float, knee: float = RESOLUTION_LOAD_KNEE) -> float:
+    """0 at or below the knee, rising linearly to 1 at full load"""
+    if knee >= 1:
+        return 0.0
+    return min(1.0, max(0.0, (load - knee) / (1 - knee)))
+
+def snap_aspect(ratio: float, tolerance: float = ASPECT_TOLERANCE) -> float:
+    """The nearest of ASPECT_BUCKETS to a long/short `ratio`, or `ratio` itself when none is close"""
+    bucket = min(ASPECT_BUCKETS, key=lambda b: abs(math.log(ratio / b)))
+    return bucket if abs(ratio / bucket - 1) <= tolerance else ratio
+
+def choose_resolution(width: int, height: int, tier: str = RESOLUTION_DEFAULT_TIER, load: float = 0.0,
+                      minimum: int = RESOLUTION_MIN, bucket: int = RESOLUTION_BUCKET) -> tuple:
+    """
+    (width, height) to run inference at for a width x height input.
+    `load` is the executor's in-flight fraction. Raises ValueError for
+    unknown tiers.
+    """
+    if tier not in QUALITY_TIERS:
+        raise ValueError(f"Unknown tier '{tier}'. Options: {', '.join(QUALITY_TIERS)}")
+    long_side = min(max(width, height), QUALITY_TIERS[tier])
+    long_side *= 1 - 0.5 * load_pressure(load)
+    long_side = max(long_side, minimum)
+    ratio = max(width, height) / min(width, height)
+    if bucket:
+        long_side = max(long_side // bucket * bucket, align(minimum))
+        ratio = snap_aspect(ratio)
+    long_side, short_side = align(long_side), align(long_side / ratio)
+    return (long_side, short_side) if width >= height else (short_side, long_side)
@@ -0,0 +1,147 @@
+"""
+CPU thread policy for inference.
+
+Every process defaults to one intra-op thread per core, so several uvicorn
+workers on one host oversubscribe it several times over. The policy gives
+each worker an even share of the cores (optionally pinned to it), and
+`autotune` benchmarks a few thread counts and memory formats on the real
+model at startup to pick the fastest for the host.
+"""
+import os
+import logging
+import tempfile
+import torch
+from backend.config import (
+    WEB_CONCURRENCY, INFERENCE_THREADS, INFERENCE_INTEROP_THREADS,
+    INFERENCE_PIN_CORES, CHANNELS_LAST, IMG_SIZE,
+)
+
+logger = logging.getLogger("lumeo")
+
+# Lock files held for the life of the process to reserve a core slot
+_slot_locks = []
+
+def available_cores() -> list:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def claim_worker_slot(workers: int) -> int:
+    """
+    Index of this process among the workers on the host, claimed with a
+    lock file so workers starting together get distinct slots.
+    Returns -1 when every slot is taken or locking is unsupported.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        return -1
+    for slot in range(workers):
+        handle = open(os.path.join(tempfile.gettempdir(), f"lumeo-worker-{slot}.lock"), "w")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            continue
+        _slot_locks.append(handle)
+        return slot
+    return -1
+
+def split_cores(cores: list, workers: int, slot: int) -> list:
+    """
+    The contiguous share of `cores` belonging to worker `slot`. When they
+    don't divide evenly, the first slots get one extra core each.
+    """
+    if len(cores) <= workers:
+        return [cores[slot % len(cores)]]
+    share, extra = divmod(len(cores), workers)
+    start = slot * share + min(slot, extra)
+    return cores[start:start + share + (slot < extra)]
+
+class ThreadPolicy:
+    """Intra/inter-op thread counts, optional core pinning and memory format"""
+    def __init__(self, intra: int, inter: int = 0, cores: list = None, channels_last: bool = False):
+        self.intra = max(1, intra)
+        self.inter = inter
+        self.cores = cores
+        self.channels_last = channels_last
+
+    def apply(self):
+        if self.cores and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, self.cores)
+        if self.inter:
+            try:
+                torch.set_num_interop_threads(self.inter)
+            except RuntimeError:
+                # Only settable before the first inter-op parallel work
+                logger.warning("Inter-op threads already initialised; INFERENCE_INTEROP_THREADS ignored")
+        torch.set_num_threads(self.intra)
+        logger.info(f"Inference thread policy: {self.info()}")
+
+    def info(self) -> dict:
+        return {
+            "intra_op_threads": self.intra,
+            "inter_op_threads": torch.get_num_interop_threads(),
+            "cores": self.cores,
+            "channels_last": self.channels_last,
+        }
+
+def default_policy(workers: int = WEB_CONCURRENCY) -> ThreadPolicy:
+    """Policy from config: an even share of the host's cores per worker"""
+    workers = max(1, workers)
+    cores = available_cores()
+    pinned = None
+    if INFERENCE_PIN_CORES and workers > 1:
+        slot = claim_worker_slot(workers)
+        if slot >= 0:
+            pinned = split_cores(cores, workers, slot)
+        else:
+            logger.warning("No free core slot for this worker; running unpinned")
+    share = len(pinned) if pinned else len(cores) // workers
+    return ThreadPolicy(
+        intra=INFERENCE_THREADS or share,
+        inter=INFERENCE_INTEROP_THREADS,
+        cores=pinned,
+        channels_last=CHANNELS_LAST,
+    )
+
+def thread_candidates(limit: int) -> list:
+    """1, 2, 4, ... up to and including `limit`"""
+    counts = {limit}
+    n = 1
+    while n < limit:
+        counts.add(n)
+        n *= 2
+    return sorted(counts)
+
+def set_memory_format(model, channels_last: bool):
+    model.to(memory_format=torch.channels_last if channels_last else torch.contiguous_format)
+
+def autotune(model, policy: ThreadPolicy, size: int = IMG_SIZE, repeats: int = 2, tune_format: bool = True) -> ThreadPolicy:
+    """
+    Time a [1, 3, size, size] forward pass for each thread count up to the
+    policy's share (and with/without channels_last when `tune_format`),
+    then apply and return the fastest policy.
+    """
+    from backend.core.parity import time_call
+
+    sample = torch.rand(1, 3, size, size)
+    formats = (False, True) if tune_format else (policy.channels_last,)
+    results = []
+    for channels_last in formats:
+        if tune_format:
+            set_memory_format(model, channels_last)
+        x = sample.contiguous(memory_format=torch.channels_last) if channels_last else sample
+        for threads in thread_candidates(policy.intra):
+            torch.set_num_threads(threads)
+            _, latency = time_call(model, x, repeats=repeats)
+            results.append((latency, threads, channels_last))
+            logger.info(f"Autotune: {threads} threads, channels_last={channels_last}: {latency:.1f} ms")
+
+    latency, threads, channels_last = min(results)
+    if tune_format:
+        set_memory_format(model, channels_last)
+    best = ThreadPolicy(threads, policy.inter, policy.cores, channels_last)
+    torch.set_num_threads(best.intra)
+    logger.info(f"Autotune picked {threads} threads, channels_last={channels_last} ({latency:.1f} ms)")
+    return best
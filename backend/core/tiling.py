@@ -0,0 +1,133 @@
+import asyncio
+import torch
+import torch.nn.functional as F
+from backend.config import TILE_SIZE, TILE_OVERLAP, TILE_BATCH_SIZE
+from backend.core.executor import run_inline
+
+# The UNet pools four times, so every spatial dimension must be a multiple of 16
+SIZE_MULTIPLE = 16
+
+def tile_starts(length: int, tile: int, stride: int) -> list:
+    """
+    Start offsets covering [0, length) with tiles of `tile` pixels.
+    The last tile is aligned to the end so no tile runs off the image.
+    """
+    if length <= tile:
+        return [0]
+    starts = list(range(0, length - tile, stride))
+    starts.append(length - tile)
+    return starts
+
+def feather_window(tile: int, overlap: int) -> torch.Tensor:
+    """
+    [1, 1, tile, tile] blending weights: 1 in the centre, ramping linearly
+    down across the overlap band so neighbouring tiles cross-fade.
+    """
+    ramp = torch.ones(tile)
+    if overlap > 0:
+        edge = torch.linspace(0, 1, overlap + 2)[1:-1]
+        ramp[:overlap] = edge
+        ramp[-overlap:] = edge.flip(0)
+    return (ramp[:, None] * ramp[None, :]).view(1, 1, tile, tile)
+
+class TileGrid:
+    """
+    Overlapping tiles over a [1, 3, H, W] image and the feathered blend of
+    their outputs. batches() yields (coords, tiles) in groups of
+    `batch_size`; each model output goes back through add(), and result()
+    returns the blended image at the input size.
+    """
+    def __init__(self, input_tensor: torch.Tensor, tile_size: int = TILE_SIZE,
+                 overlap: int = TILE_OVERLAP, batch_size: int = TILE_BATCH_SIZE):
+        if tile_size % SIZE_MULTIPLE:
+            raise ValueError(f"tile_size must be a multiple of {SIZE_MULTIPLE}")
+        self.tile_size = tile_size
+        self.batch_size = max(1, batch_size)
+        overlap = max(0, min(overlap, tile_size // 2))
+
+        _, channels, self.height, self.width = input_tensor.shape
+
+        # Pad images smaller than one tile; tiles themselves are always tile_size
+        pad_h = max(tile_size, self.height) - self.height
+        pad_w = max(tile_size, self.width) - self.width
+        if pad_h or pad_w:
+            input_tensor = F.pad(input_tensor, (0, pad_w, 0, pad_h), mode="replicate")
+        self.input = input_tensor
+        padded_h, padded_w = input_tensor.shape[2:]
+
+        stride = tile_size - overlap
+        self.coords = [(y, x) for y in tile_starts(padded_h, tile_size, stride)
+                              for x in tile_starts(padded_w, tile_size, stride)]
+
+        self.window = feather_window(tile_size, overlap)
+        self.output = torch.zeros(1, channels, padded_h, padded_w)
+        self.weights = torch.zeros(1, 1, padded_h, padded_w)
+        self.done = 0
+
+    @property
+    def total(self) -> int:
+        return len(self.coords)
+
+    def batches(self):
+        size = self.tile_size
+        for i in range(0, len(self.coords), self.batch_size):
+            chunk = self.coords[i:i + self.batch_size]
+            yield chunk, torch.cat([self.input[:, :, y:y + size, x:x + size] for y, x in chunk], dim=0)
+
+    def add(self, chunk: list, result: torch.Tensor):
+        size = self.tile_size
+        for (y, x), tile_out in zip(chunk, result.float()):
+            self.output[:, :, y:y + size, x:x + size] += tile_out * self.window
+            self.weights[:, :, y:y + size, x:x + size] += self.window
+        self.done += len(chunk)
+
+    def result(self) -> torch.Tensor:
+        self.output /= self.weights.clamp_min(1e-8)
+        return self.output[:, :, :self.height, :self.width]
+
+def tiled_predict(
+    input_tensor: torch.Tensor,
+    predict_fn,
+    tile_size: int = TILE_SIZE,
+    overlap: int = TILE_OVERLAP,
+    batch_size: int = TILE_BATCH_SIZE,
+    progress=None,
+) -> torch.Tensor:
+    """
+    Run a fully convolutional model over a [1, 3, H, W] image of any size.
+
+    The image is split into overlapping tiles, tiles are sent through
+    `predict_fn` in batches of `batch_size`, and the outputs are blended
+    with feathered weights. Model memory is bounded by the tile batch;
+    only the output accumulator scales with the image area.
+    `progress(done, total)` is called after each tile batch if given.
+    """
+    grid = TileGrid(input_tensor, tile_size, overlap, batch_size)
+    for chunk, tiles in grid.batches():
+        grid.add(chunk, predict_fn(tiles))
+        if progress is not None:
+            progress(grid.done, grid.total)
+    return grid.result()
+
+async def tiled_predict_async(
+    input_tensor: torch.Tensor,
+    submit_fn,
+    tile_size: int = TILE_SIZE,
+    overlap: int = TILE_OVERLAP,
+    batch_size: int = TILE_BATCH_SIZE,
+    progress=None,
+    run=run_inline,
+) -> torch.Tensor:
+    """
+    tiled_predict for callers on an event loop. `submit_fn(tiles)` returns a
+    concurrent.futures.Future (e.g. LoadedModel.submit) that is awaited, so
+    no thread is held while tiles wait in the batcher. Tiling and blending
+    go through `run` (e.g. InferenceExecutor.run).
+    """
+    grid = await run(TileGrid, input_tensor, tile_size, overlap, batch_size)
+    for chunk, tiles in grid.batches():
+        result = await asyncio.wrap_future(submit_fn(tiles))
+        await run(grid.add, chunk, result)
+        if progress is not None:
+            progress(grid.done, grid.total)
+    return await run(grid.result)
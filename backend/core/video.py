@@ -0,0 +1,301 @@
+"""
+Video and frame-sequence enhancement.
+
+Frames are decoded one at a time by a generator, run through the model
+VIDEO_BATCH_SIZE at a time and encoded into the output as they come back,
+so memory stays flat however long the clip is. Consecutive near-duplicate
+frames (static shots, bursts) reuse the last output instead of running the
+model again.
+
+Inputs:  a zip of frames, an animated GIF/WebP/PNG, or a video file (PyAV)
+Outputs: a zip of frames, or MP4/WebM (PyAV)
+
+PyAV is optional (pip install av); without it only image sequences work.
+"""
+import io
+import asyncio
+import time
+import zipfile
+import logging
+from fractions import Fraction
+from typing import AsyncIterator, Iterable, Iterator, Optional
+import numpy as np
+import torch
+from PIL import Image, ImageSequence
+from backend.config import IMG_SIZE, VIDEO_MAX_FRAMES, VIDEO_BATCH_SIZE, VIDEO_REUSE_THRESHOLD
+from backend.core.image import image_to_tensor, normalize_output_format, sniff_mime_type, tensor_to_bytes, tensor_to_uint8
+from backend.core.executor import run_inline
+from backend.core.tiling import tiled_predict_async
+
+logger = logging.getLogger("lumeo")
+
+DEFAULT_FPS = 24
+# Side of the grayscale thumbnail compared between consecutive frames
+SIGNATURE_SIZE = 32
+FRAME_EXTENSIONS = (".jpg", ".jpeg", ".png")
+# Output container -> (media type, PyAV codec)
+VIDEO_OUTPUTS = {"mp4": ("video/mp4", "libx264"), "webm": ("video/webm", "libvpx-vp9")}
+SEQUENCE_OUTPUTS = ["zip", *VIDEO_OUTPUTS]
+
+def require_av():
+    try:
+        import av
+    except ImportError:
+        raise ValueError("Video files need PyAV (pip install av); send a zip of frames or an animated image instead")
+    return av
+
+def sniff_sequence_type(header: bytes) -> str:
+    """'zip', 'animated' (GIF/WebP/PNG) or 'video' from the first bytes"""
+    if header.startswith(b"PK\x03\x04"):
+        return "zip"
+    if header.startswith(b"GIF8") or (header[:4] == b"RIFF" and header[8:12] == b"WEBP") \
+            or sniff_mime_type(header) == "image/png":
+        return "animated"
+    return "video"
+
+class FrameSource:
+    """
+    An uploaded clip: type, size, frame rate and (when the container says)
+    frame count are read up front; frames are decoded lazily, one at a time.
+    Raises ValueError for unreadable input, and while iterating for a frame
+    over `max_dimension` (streams and zips can change size after the first).
+    """
+    def __init__(self, contents: bytes, max_frame_bytes: int = None, max_dimension: int = None):
+        self.contents = contents
+        self.kind = sniff_sequence_type(contents[:16])
+        self.max_frame_bytes = max_frame_bytes
+        self.max_dimension = max_dimension
+        self.fps = DEFAULT_FPS
+        self.frame_count = None
+        av = require_av() if self.kind == "video" else None
+        try:
+            if self.kind == "zip":
+                self._open_zip()
+            elif self.kind == "animated":
+                image = Image.open(io.BytesIO(contents))
+                self.width, self.height = image.size
+                self.frame_count = getattr(image, "n_frames", 1)
+                if image.info.get("duration"):
+                    self.fps = 1000 / image.info["duration"]
+            else:
+                with av.open(io.BytesIO(contents)) as container:
+                    stream = container.streams.video[0]
+                    self.width, self.height = stream.codec_context.width, stream.codec_context.height
+                    self.frame_count = stream.frames or None
+                    self.fps = float(stream.average_rate or DEFAULT_FPS)
+        except Exception as e:
+            raise ValueError(f"Unreadable {self.kind} input: {e}")
+
+    def _open_zip(self):
+        with zipfile.ZipFile(io.BytesIO(self.contents)) as archive:
+            self.names = sorted(
+                info.filename for info in archive.infolist()
+                if not info.is_dir() and info.filename.lower().endswith(FRAME_EXTENSIONS)
+            )
+            if not self.names:
+                raise ValueError("no .jpg or .png frames")
+            self.frame_count = len(self.names)
+            with Image.open(archive.open(self.names[0])) as first:
+                self.width, self.height = first.size
+
+    def _check_dimensions(self, width: int, height: int, index: int):
+        if self.max_dimension and (width > self.max_dimension or height > self.max_dimension):
+            raise ValueError(f"Frame {index} is {width}x{height}px. "
+                             f"Maximum: {self.max_dimension}x{self.max_dimension}px")
+
+    def __iter__(self) -> Iterator[Image.Image]:
+        if self.kind == "zip":
+            with zipfile.ZipFile(io.BytesIO(self.contents)) as archive:
+                for index, name in enumerate(self.names):
+                    # Declared size is checked before inflating to guard against zip bombs
+                    if self.max_frame_bytes and archive.getinfo(name).file_size > self.max_frame_bytes:
+                        raise ValueError(f"Frame {name} is too large")
+                    # Image.open only reads the header, so this is checked before decoding
+                    image = Image.open(io.BytesIO(archive.read(name)))
+                    self._check_dimensions(*image.size, index)
+                    yield image
+        elif self.kind == "animated":
+            with Image.open(io.BytesIO(self.contents)) as image:
+                for index, frame in enumerate(ImageSequence.Iterator(image)):
+                    self._check_dimensions(*frame.size, index)
+                    yield frame.convert("RGB")
+        else:
+            av = require_av()
+            with av.open(io.BytesIO(self.contents)) as container:
+                stream = container.streams.video[0]
+                stream.thread_type = "AUTO"
+                for index, frame in enumerate(container.decode(stream)):
+                    self._check_dimensions(frame.width, frame.height, index)
+                    yield frame.to_image()
+
+def frame_signature(image: Image.Image) -> np.ndarray:
+    """Tiny grayscale thumbnail in [0, 1] for cheap frame-difference checks"""
+    thumbnail = image.convert("L").resize((SIGNATURE_SIZE, SIGNATURE_SIZE), Image.BOX)
+    return np.asarray(thumbnail, dtype=np.float32) * (1 / 255)
+
+def _next_frame(frames: Iterator[Image.Image], with_signature: bool) -> Optional[tuple]:
+    """(image, signature or None) for the next frame, or None at the end"""
+    image = next(frames, None)
+    if image is None:
+        return None
+    return image, frame_signature(image) if with_signature else None
+
+async def enhance_frames(frames: Iterable[Image.Image], model, size: Optional[tuple] = (IMG_SIZE, IMG_SIZE),
+                         batch_size: int = VIDEO_BATCH_SIZE, reuse_threshold: float = VIDEO_REUSE_THRESHOLD,
+                         max_frames: int = VIDEO_MAX_FRAMES, stats: dict = None,
+                         run=run_inline) -> AsyncIterator[torch.Tensor]:
+    """
+    Yield one enhanced [1, 3, H, W] tensor per input frame, in order.
+
+    size: (width, height) like the fast mode, or None for native resolution
+    (tiled, like the full mode). Frames within `reuse_threshold` of the last
+    enhanced frame reuse its output. At most `batch_size` decoded frames are
+    held at a time; `stats` (if given) counts frames and reuses. Decoding
+    goes through `run` (e.g. InferenceExecutor.run) and model batches are
+    awaited, so no thread waits on the batcher.
+    """
+    stats = stats if stats is not None else {}
+    stats.update(frames=0, enhanced=0, reused=0)
+    frames = iter(frames)
+    # Per pending frame: its index in `batch`, or None to repeat the previous output
+    pending, batch = [], []
+    key_signature = None
+    last_output = None
+
+    async def flush():
+        nonlocal last_output
+        if batch:
+            if size is None:
+                outputs = [await tiled_predict_async(tensor, model.submit, run=run) for tensor in batch]
+            else:
+                stacked = await asyncio.wrap_future(model.submit(torch.cat(batch)))
+                outputs = [stacked[i:i + 1] for i in range(len(batch))]
+        for slot in pending:
+            if slot is not None:
+                last_output = outputs[slot]
+            yield last_output
+        pending.clear()
+        batch.clear()
+
+    while True:
+        frame = await run(_next_frame, frames, reuse_threshold > 0)
+        if frame is None:
+            break
+        if stats["frames"] >= max_frames:
+            logger.warning(f"Sequence truncated at VIDEO_MAX_FRAMES={max_frames}")
+            break
+        image, signature = frame
+        stats["frames"] += 1
+        if signature is not None:
+            if key_signature is not None and float(np.abs(signature - key_signature).mean()) < reuse_threshold:
+                pending.append(None)
+                stats["reused"] += 1
+                continue
+            key_signature = signature
+        pending.append(len(batch))
+        batch.append(await run(image_to_tensor, image, size))
+        stats["enhanced"] += 1
+        if len(batch) >= batch_size:
+            async for output in flush():
+                yield output
+    async for output in flush():
+        yield output
+
+class ChunkBuffer(io.RawIOBase):
+    """Write-only, unseekable sink whose contents are taken with drain()"""
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+class ZipFrameSink:
+    """Writes frames as frame_000000.png, ... into a zip on `fileobj`"""
+    def __init__(self, fileobj, format: str = "png", quality: int = None):
+        self.format = normalize_output_format(format)
+        if self.format is None:
+            raise ValueError(f"Unsupported frame format '{format}'")
+        self.quality = quality
+        self.archive = zipfile.ZipFile(fileobj, "w", compression=zipfile.ZIP_STORED)
+        self.count = 0
+
+    def write(self, tensor: torch.Tensor):
+        extension = "jpg" if self.format == "jpeg" else self.format
+        info = zipfile.ZipInfo(f"frame_{self.count:06d}.{extension}", date_time=time.localtime()[:6])
+        # Encoded frames are already compressed
+        self.archive.writestr(info, tensor_to_bytes(tensor, format=self.format, quality=self.quality))
+        self.count += 1
+
+    def close(self):
+        self.archive.close()
+
+class VideoSink:
+    """Encodes frames into an MP4 (fragmented, so it can stream) or WebM with PyAV"""
+    def __init__(self, fileobj, container: str = "mp4", fps: float = DEFAULT_FPS, quality: int = None):
+        self.av = require_av()
+        options = {"movflags": "frag_keyframe+empty_moov"} if container == "mp4" else {}
+        self.container = self.av.open(fileobj, mode="w", format=container, options=options)
+        self.codec = VIDEO_OUTPUTS[container][1]
+        self.rate = Fraction(fps).limit_denominator(1001)
+        # quality 1-100 -> constant rate factor 51-0 (lower is better)
+        self.crf = None if quality is None else round(51 * (100 - quality) / 99)
+        self.stream = None
+
+    def write(self, tensor: torch.Tensor):
+        """Encode one frame; raises ValueError if its size differs from the first frame's"""
+        pixels = tensor_to_uint8(tensor)
+        # 4:2:0 chroma needs even dimensions
+        pixels = pixels[:pixels.shape[0] // 2 * 2, :pixels.shape[1] // 2 * 2]
+        if self.stream is not None and pixels.shape[:2] != (self.stream.height, self.stream.width):
+            height, width = pixels.shape[:2]
+            raise ValueError(f"Frame is {width}x{height}px but the video is "
+                             f"{self.stream.width}x{self.stream.height}px")
+        if self.stream is None:
+            self.stream = self.container.add_stream(self.codec, rate=self.rate)
+            self.stream.height, self.stream.width = pixels.shape[:2]
+            self.stream.pix_fmt = "yuv420p"
+            if self.crf is not None:
+                self.stream.options = {"crf": str(self.crf)}
+        frame = self.av.VideoFrame.from_ndarray(np.ascontiguousarray(pixels), format="rgb24")
+        self.container.mux(self.stream.encode(frame))
+
+    def close(self):
+        if self.stream is not None:
+            # Flush frames buffered in the encoder
+            self.container.mux(self.stream.encode(None))
+        self.container.close()
+
+def make_sink(fileobj, output: str, fps: float, format: str = "png", quality: int = None):
+    if output == "zip":
+        return ZipFrameSink(fileobj, format, quality)
+    if output in VIDEO_OUTPUTS:
+        return VideoSink(fileobj, output, fps, quality)
+    raise ValueError(f"Unsupported output '{output}'. Options: {', '.join(SEQUENCE_OUTPUTS)}")
+
+async def stream_sequence(source: FrameSource, model, output: str = "zip", format: str = "png", quality: int = None,
+                          size: Optional[tuple] = (IMG_SIZE, IMG_SIZE), stats: dict = None,
+                          run=run_inline) -> AsyncIterator[bytes]:
+    """
+    Enhance `source` and yield the encoded output in chunks as frames
+    complete. Pulling one chunk does at most one batch of work; decoding
+    and encoding go through `run`.
+    """
+    buffer = ChunkBuffer()
+    sink = await run(make_sink, buffer, output, source.fps, format, quality)
+    async for tensor in enhance_frames(source, model, size, stats=stats, run=run):
+        await run(sink.write, tensor)
+        chunk = buffer.drain()
+        if chunk:
+            yield chunk
+    await run(sink.close)
+    chunk = buffer.drain()
+    if chunk:
+        yield chunk
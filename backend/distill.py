@@ -0,0 +1,206 @@
+"""
+Slimmer UNet students for serving.
+
+    python -m backend.distill --width 32 --output models/lumeo_unet_small.pth
+    python -m backend.distill --width 32 --data /data/low_light --steps 5000 --output ...
+    python -m backend.distill --compare models/lumeo_unet_small.pth
+
+The student starts as a structured prune of the teacher (default
+MODEL_PATH): in every conv block, the output channels with the largest
+BatchNorm scales are kept, and the kept indices are threaded through the
+skip connections so the slices line up. It is then distilled on the
+teacher's own outputs, so no ground-truth pairs are needed: images from
+--data (or synthetic low-light frames) are randomly cropped, flipped and
+dimmed, and the student is trained to match the teacher with an L1 loss.
+A student with a different depth can't inherit the teacher's weights and
+is distilled from scratch.
+
+The saved file is a plain state dict. The width and depth are read back
+from it, so serving the student is just MODEL_PATH=<file>. Each run
+ends with a report of params, FLOPs, latency and PSNR/SSIM against the
+teacher.
+"""
+import json
+import time
+import logging
+import argparse
+from pathlib import Path
+import torch
+import torch.nn.functional as F
+from backend.config import IMG_SIZE
+from backend.core.model import UNet
+
+logger = logging.getLogger("lumeo")
+
+def top_channels(scores: torch.Tensor, count: int) -> torch.Tensor:
+    """Indices of the `count` highest scores, in their original order"""
+    return scores.topk(count).indices.sort().values
+
+def _copy_bn(source: torch.nn.BatchNorm2d, target: torch.nn.BatchNorm2d, keep: torch.Tensor):
+    for name in ("weight", "bias", "running_mean", "running_var"):
+        getattr(target, name).copy_(getattr(source, name)[keep])
+
+def _prune_block(source, target, in_keep: torch.Tensor) -> torch.Tensor:
+    """Copy the kept channels of a ConvBlock; returns its kept output channels"""
+    conv1, bn1, _, conv2, bn2, _ = source.conv
+    new_conv1, new_bn1, _, new_conv2, new_bn2, _ = target.conv
+    mid = top_channels(bn1.weight.abs(), new_conv1.out_channels)
+    out = top_channels(bn2.weight.abs(), new_conv2.out_channels)
+    new_conv1.weight.copy_(conv1.weight[mid][:, in_keep])
+    _copy_bn(bn1, new_bn1, mid)
+    new_conv2.weight.copy_(conv2.weight[out][:, mid])
+    _copy_bn(bn2, new_bn2, out)
+    return out
+
+@torch.no_grad()
+def prune(teacher: UNet, base_width: int) -> UNet:
+    """A UNet of the teacher's depth at `base_width`, initialised from the teacher's strongest channels"""
+    student = UNet(base_width=base_width, depth=teacher.depth).eval()
+    keep = torch.arange(teacher.enc1.conv.conv[0].in_channels)
+    skips = []
+    for source, target in zip(teacher.encoders, student.encoders):
+        keep = _prune_block(source.conv, target.conv, keep)
+        skips.append(keep)
+    keep = _prune_block(teacher.bottleneck, student.bottleneck, keep)
+
+    for source, target, skip in zip(teacher.decoders, student.decoders, reversed(skips)):
+        # ConvTranspose2d weights are [in, out, kH, kW]
+        up = top_channels(source.up.weight.abs().sum(dim=(0, 2, 3)), target.up.out_channels)
+        target.up.weight.copy_(source.up.weight[keep][:, up])
+        target.up.bias.copy_(source.up.bias[up])
+        # The block sees [upsampled, skip] concatenated
+        keep = _prune_block(source.conv, target.conv, torch.cat([up, skip + source.up.out_channels]))
+
+    student.out_conv.weight.copy_(teacher.out_conv.weight[:, keep])
+    student.out_conv.bias.copy_(teacher.out_conv.bias)
+    return student
+
+def training_images(data_dir: Path = None, count: int = 64, size: int = IMG_SIZE) -> list:
+    """[1, 3, H, W] tensors to distill on: images from data_dir, or synthetic low-light frames"""
+    if data_dir is not None:
+        from backend.core.image import ImageSource
+        paths = sorted(p for p in Path(data_dir).rglob("*") if p.suffix.lower() in (".jpg", ".jpeg", ".png"))
+        images = []
+        for path in paths[:count]:
+            source = ImageSource(path.read_bytes())
+            # Short side at `size`, keeping the aspect ratio
+            scale = size / min(source.width, source.height)
+            images.append(source.to_tensor((round(source.width * scale), round(source.height * scale))))
+        if images:
+            return images
+        logger.warning(f"No images found in {data_dir}, using synthetic frames")
+    from backend.core.backends import calibration_samples
+    return calibration_samples(count, size)
+
+def random_batch(images: list, batch_size: int, crop: int, generator: torch.Generator) -> torch.Tensor:
+    """Random crops of random images, flipped and dimmed at random"""
+    crops = []
+    for _ in range(batch_size):
+        image = images[torch.randint(len(images), (1,), generator=generator).item()]
+        height, width = image.shape[2:]
+        y = torch.randint(height - crop + 1, (1,), generator=generator).item()
+        x = torch.randint(width - crop + 1, (1,), generator=generator).item()
+        tile = image[:, :, y:y + crop, x:x + crop]
+        if torch.rand(1, generator=generator).item() < 0.5:
+            tile = tile.flip(3)
+        crops.append(tile * (0.5 + torch.rand(1, generator=generator).item()))
+    return torch.cat(crops).clamp(0, 1)
+
+def distill(teacher: UNet, student: UNet, images: list, steps: int = 2000, batch_size: int = 8,
+            crop: int = 128, lr: float = 1e-4, seed: int = 0, log_every: int = 100) -> list:
+    """
+    Train `student` to reproduce `teacher` on random crops (L1 loss, AdamW
+    with cosine decay). Returns the loss every `log_every` steps.
+    """
+    crop = min(crop, *(min(image.shape[2:]) for image in images))
+    crop -= crop % 2 ** student.depth
+    generator = torch.Generator().manual_seed(seed)
+    optimizer = torch.optim.AdamW(student.parameters(), lr=lr, weight_decay=1e-4)
+    scheduler = torch.optim.lr_scheduler.CosineAnnealingLR(optimizer, T_max=steps, eta_min=lr / 100)
+    teacher.eval()
+    student.train()
+    history = []
+    started = time.perf_counter()
+    for step in range(1, steps + 1):
+        batch = random_batch(images, batch_size, crop, generator)
+        with torch.no_grad():
+            target = teacher(batch)
+        loss = F.l1_loss(student(batch), target)
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+        scheduler.step()
+        if step % log_every == 0 or step == steps:
+            history.append(round(loss.item(), 5))
+            logger.info(f"Step {step}/{steps}: L1 {loss.item():.5f} ({time.perf_counter() - started:.0f}s)")
+    return history
+
+def compare(teacher: UNet, student: UNet, samples: list) -> dict:
+    """Params, GFLOPs and latency of both models, and the student's PSNR/SSIM against the teacher"""
+    from backend.core.parity import parity_report, count_params, count_flops
+
+    size = samples[0].shape[-1]
+    teacher.eval()
+    student.eval()
+    report = parity_report(teacher, student, samples)
+    return {
+        "teacher": {"base_width": teacher.base_width, "depth": teacher.depth, "params": count_params(teacher),
+                    "gflops": round(count_flops(teacher, size) / 1e9, 2),
+                    "latency_ms": report["reference_latency_ms"]},
+        "student": {"base_width": student.base_width, "depth": student.depth, "params": count_params(student),
+                    "gflops": round(count_flops(student, size) / 1e9, 2),
+                    "latency_ms": report["latency_ms"]},
+        "psnr_db": report["psnr_db"],
+        "ssim": report["ssim"],
+        "speedup": report["speedup"],
+        "size_ratio": round(count_params(teacher) / count_params(student), 2),
+    }
+
+def main(argv=None) -> dict:
+    from backend.config import MODEL_PATH
+    from backend.core.backends import calibration_samples
+    from backend.core.benchmark import load_model
+
+    parser = argparse.ArgumentParser(description="Prune and distill a slimmer UNet from the served one")
+    parser.add_argument("--teacher", default=str(MODEL_PATH), help="Teacher weights (default: MODEL_PATH)")
+    parser.add_argument("--output", type=Path, default=None, help="Where to save the student's state dict")
+    parser.add_argument("--compare", type=Path, default=None, help="Only report on an existing student")
+    parser.add_argument("--width", type=int, default=32, help="Student base width (the teacher's is 64)")
+    parser.add_argument("--depth", type=int, default=None, help="Student depth (default: the teacher's)")
+    parser.add_argument("--data", type=Path, default=None, help="Directory of training images (default: synthetic)")
+    parser.add_argument("--images", type=int, default=256, help="Training images to load")
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--crop", type=int, default=128)
+    parser.add_argument("--lr", type=float, default=None, help="Default: 1e-4 from a pruned start, 1e-3 from scratch")
+    parser.add_argument("--samples", type=int, default=4, help="Images for the parity report")
+    args = parser.parse_args(argv)
+    if args.compare is None and args.output is None:
+        parser.error("--output is required unless --compare is given")
+    if args.depth is not None and not 1 <= args.depth <= 4:
+        # Serving sizes are multiples of 16, i.e. at most four 2x poolings
+        parser.error("--depth must be between 1 and 4")
+
+    teacher = load_model(args.teacher)
+    if args.compare is not None:
+        student = load_model(args.compare)
+    else:
+        depth = args.depth or teacher.depth
+        pruned = depth == teacher.depth and args.width <= teacher.base_width
+        student = prune(teacher, args.width) if pruned else UNet(base_width=args.width, depth=depth)
+        logger.info(f"Student: width {args.width}, depth {depth}, "
+                    f"{'pruned from the teacher' if pruned else 'from scratch'}")
+        images = training_images(args.data, args.images, IMG_SIZE)
+        lr = args.lr or (1e-4 if pruned else 1e-3)
+        distill(teacher, student, images, args.steps, args.batch_size, args.crop, lr)
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        torch.save(student.eval().state_dict(), args.output)
+        logger.info(f"Saved student to {args.output}; serve it with MODEL_PATH={args.output}")
+
+    report = compare(teacher, student, calibration_samples(args.samples, IMG_SIZE))
+    print(json.dumps(report, indent=2))
+    return report
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    main()
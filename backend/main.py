@@ -1,15 +1,22 @@
 import os
 import logging
 import time
+import psutil
 from typing import List
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from .api import endpoints
 from .core.model import model_manager
+from .core.executor import inference_executor
+from .core.jobs import job_queue
+from .core.health import health_monitor
+from .core.db import storage
+from .core.metrics import REQUESTS, STARTUP_SECONDS, render as render_metrics
+from .core.executor import StageTimer
 
 # Configure logging
 # Configure logging
@@ -24,6 +31,10 @@ logging.basicConfig(
 
 logger = logging.getLogger("lumeo")
 
+# Time from process creation to the end of module imports (interpreter, uvicorn, torch, app)
+PROCESS_STARTED = psutil.Process().create_time()
+IMPORTS_DONE = time.time()
+
 app = FastAPI(
     title="Lumeo API",
     description="Low-light image enhancement backend",
@@ -61,6 +72,45 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
+# Largest body any route accepts (a bulk archive or a video) plus multipart framing
+MAX_REQUEST_SIZE = max(
+    endpoints.MAX_FILE_SIZE * endpoints.BULK_MAX_FILES, endpoints.VIDEO_MAX_FILE_SIZE_MB * 1024 * 1024
+) + 1024 * 1024
+
+@app.middleware("http")
+async def limit_request_size(request: Request, call_next):
+    """Reject oversized bodies from Content-Length before they are spooled"""
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > MAX_REQUEST_SIZE:
+        return JSONResponse(status_code=413, content={"detail": "Request body too large"})
+    return await call_next(request)
+
+API_PREFIX = "/api/v1"
+
+def route_label(request: Request) -> str:
+    """
+    The matched route's full path template, as clients see it. Routes of an
+    included router carry only their own path, so the router's prefix and
+    any mount root are added back.
+    """
+    route = request.scope.get("route")
+    if route is None:
+        return "unmatched"
+    prefix = API_PREFIX if route in endpoints.router.routes else ""
+    return request.scope.get("root_path", "") + prefix + route.path
+
+@app.middleware("http")
+async def count_requests(request: Request, call_next):
+    """Count responses per route template and status code"""
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        # Use the route template so path parameters don't explode label cardinality
+        REQUESTS.inc(endpoint=route_label(request), status=status_code)
+
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -86,23 +136,41 @@ async def global_exception_handler(request: Request, exc: Exception):
     )
 
 # Routes
-app.include_router(endpoints.router, prefix="/api/v1", tags=["enhancement"])
+app.include_router(endpoints.router, prefix=API_PREFIX, tags=["enhancement"])
 
 @app.on_event("startup")
 async def startup_event():
+    timer = StageTimer()
     # Warm up model
     try:
-        model_manager.load_model()
+        with timer.stage("model_load"):
+            model_manager.load_model()
         logger.info("Application started and model warmed up.")
     except Exception as e:
         logger.error(f"Failed to load model: {e}")
         logger.warning("Application started, but model loading failed. Inference endpoints will error.")
+    health_monitor.start()
+    
+    # Startup phase timings, also exposed in /health and /metrics
+    startup = {
+        "imports": round((IMPORTS_DONE - PROCESS_STARTED) * 1000, 2),
+        **timer.timings,
+        "total": round((time.time() - PROCESS_STARTED) * 1000, 2),
+    }
+    health_monitor.startup_ms = startup
+    for phase, ms in startup.items():
+        STARTUP_SECONDS.set(ms / 1000, phase=phase)
+    logger.info(f"Startup timings (ms): {startup}")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     # Clean up resources
-    if model_manager.model:
-        del model_manager.model
+    health_monitor.shutdown()
+    job_queue.shutdown()
+    inference_executor.shutdown()
+    model_manager.shutdown()
+    # Flush buffered feedback and close pooled connections
+    await storage.close()
     import torch
     if torch.cuda.is_available():
         torch.cuda.empty_cache()
@@ -117,3 +185,8 @@ def read_root():
         "docs": "/docs",
         "health": "/api/v1/health"
     }
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus text exposition of this worker's metrics"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
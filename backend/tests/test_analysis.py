@@ -0,0 +1,35 @@
+import io
+import subprocess
+import sys
+import numpy as np
+from PIL import Image
+
+from backend.core.analysis import analyze_bytes, estimate_noise
+
+def encode(pixels: np.ndarray, format: str) -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format=format)
+    return buffer.getvalue()
+
+def test_dark_and_bright_images():
+    """Dark images are recommended for enhancement, bright ones skipped"""
+    dark = analyze_bytes(encode(np.full((600, 800, 3), 30, np.uint8), "JPEG"))
+    bright = analyze_bytes(encode(np.full((600, 800, 3), 200, np.uint8), "PNG"))
+    assert dark["is_low_light"] and dark["recommendation"] == "enhance"
+    assert not bright["is_low_light"] and bright["recommendation"] == "skip"
+    assert (dark["width"], dark["height"]) == (800, 600)
+    assert abs(sum(dark["histogram"]) - 1) < 1e-3
+    assert np.argmax(dark["histogram"]) == 30 * 32 // 256
+
+def test_noise_estimate_is_rescaled_to_full_resolution():
+    """White noise is measured at full-resolution strength despite the reduced decode"""
+    rng = np.random.default_rng(0)
+    pixels = np.clip(rng.normal(60, 15, (1024, 1024)), 0, 255).astype(np.uint8)
+    result = analyze_bytes(encode(np.stack([pixels] * 3, axis=-1), "PNG"))
+    assert abs(result["noise_sigma"] - 15 / 255) < 0.01
+    assert estimate_noise(np.zeros((8, 8), np.float32)) == 0.0
+
+def test_analysis_does_not_import_torch():
+    """The analyzer stays importable without loading torch"""
+    code = "import sys; import backend.core.analysis; assert 'torch' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], check=True)
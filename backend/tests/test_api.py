@@ -51,6 +51,38 @@ def test_enhance_valid_image():
     assert "image" in data
     assert "format" in data
 
+def test_enhance_binary_response():
+    """Test raw image response when the client accepts images"""
+    img = create_test_image('PNG')
+    
+    response = client.post(
+        "/api/v1/enhance_v2",
+        files={"file": ("test.png", img, "image/png")},
+        headers={"Accept": "image/*"}
+    )
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    assert response.headers["x-original-width"] == "256"
+    assert response.content.startswith(b"\x89PNG")
+
+def test_enhance_batch_reports_per_item_errors():
+    """Test batch enhancement streams results and isolates bad files"""
+    response = client.post(
+        "/api/v1/enhance_batch",
+        files=[
+            ("files", ("a.png", create_test_image('PNG'), "image/png")),
+            ("files", ("b.txt", io.BytesIO(b"not an image"), "text/plain")),
+        ]
+    )
+    
+    assert response.status_code == 200
+    import json
+    results = {item["filename"]: item for item in map(json.loads, response.text.splitlines())}
+    assert results["a.png"]["status"] == "ok"
+    assert "image" in results["a.png"]
+    assert results["b.txt"]["status"] == "error"
+
 def test_enhance_invalid_file_type():
     """Test enhancement with invalid file type"""
     response = client.post(
@@ -0,0 +1,88 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from PIL import Image
+from backend.batch import Checkpoint, _init_worker, find_inputs, run
+
+class Halve:
+    """Stand-in ModelManager recording batch sizes"""
+    def __init__(self):
+        self.batches = []
+
+    def predict(self, batch):
+        self.batches.append(batch.shape[0])
+        return batch * 0.5
+
+def make_tree(root: Path, count: int) -> list:
+    names = []
+    for i in range(count):
+        name = f"sub/{i}.png" if i % 2 else f"{i}.jpg"
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        Image.new("RGB", (40, 30), (i * 10, 0, 0)).save(path)
+        names.append(name)
+    return names
+
+def enhance(source: Path, output: Path, manager, pool=None, **kwargs) -> dict:
+    checkpoint = Checkpoint(output / ".checkpoint")
+    with pool or ThreadPoolExecutor(2) as pool:
+        stats = run(manager, find_inputs(source), output, checkpoint, pool, **kwargs)
+    checkpoint.close()
+    return stats
+
+def test_directory_is_enhanced_in_batches_and_mirrored(tmp_path):
+    """Inputs are batched up to batch_size and written at their relative paths"""
+    names = make_tree(tmp_path / "in", 7)
+    (tmp_path / "in" / "broken.png").write_bytes(b"not an image")
+    manager = Halve()
+
+    stats = enhance(tmp_path / "in", tmp_path / "out", manager, format="jpeg", batch_size=3, max_in_flight=6)
+
+    assert (stats["enhanced"], stats["failed"]) == (7, 1)
+    assert max(manager.batches) == 3 and sum(manager.batches) == 7
+    for name in names:
+        assert Image.open(tmp_path / "out" / f"{name}.jpg").size == (256, 256)
+    # No temp files left behind by the atomic writes
+    assert not list((tmp_path / "out").rglob("*.tmp"))
+
+def test_inputs_differing_only_by_extension_keep_separate_outputs(tmp_path):
+    """a.jpg and a.png are both written instead of one replacing the other"""
+    (tmp_path / "in").mkdir()
+    Image.new("RGB", (40, 30), (200, 0, 0)).save(tmp_path / "in" / "a.jpg")
+    Image.new("RGB", (40, 30), (0, 0, 200)).save(tmp_path / "in" / "a.png")
+
+    stats = enhance(tmp_path / "in", tmp_path / "out", Halve())
+
+    assert stats["enhanced"] == 2
+    assert sorted(path.name for path in (tmp_path / "out").glob("a.*")) == ["a.jpg.png", "a.png.png"]
+    red, _, blue = Image.open(tmp_path / "out" / "a.png.png").getpixel((128, 128))
+    assert blue > red
+
+def test_rerun_resumes_from_checkpoint(tmp_path):
+    """Inputs recorded in the checkpoint are skipped on the next run"""
+    make_tree(tmp_path / "in", 4)
+    enhance(tmp_path / "in", tmp_path / "out", Halve())
+    (tmp_path / "in" / "new.png").write_bytes((tmp_path / "in" / "0.jpg").read_bytes())
+
+    manager = Halve()
+    stats = enhance(tmp_path / "in", tmp_path / "out", manager)
+    assert (stats["enhanced"], stats["skipped"]) == (1, 4)
+    assert sum(manager.batches) == 1
+
+def test_spawned_process_pool_decodes_and_encodes(tmp_path):
+    """The worker functions survive pickling into the spawn pool the CLI uses"""
+    names = make_tree(tmp_path / "in", 4)
+    pool = ProcessPoolExecutor(2, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker)
+
+    stats = enhance(tmp_path / "in", tmp_path / "out", Halve(), pool=pool, format="jpeg", batch_size=2)
+
+    assert (stats["enhanced"], stats["failed"]) == (4, 0)
+    for name in names:
+        assert Image.open(tmp_path / "out" / f"{name}.jpg").size == (256, 256)
+
+def test_manifest_paths_resolve_against_root(tmp_path):
+    """Relative manifest lines resolve against the manifest's directory, skipping comments"""
+    make_tree(tmp_path / "photos", 3)
+    manifest = tmp_path / "list.txt"
+    manifest.write_text("# nightly\nphotos/0.jpg\n\nphotos/sub/1.png\n")
+    assert [name for name, _ in find_inputs(manifest)] == ["photos/0.jpg", "photos/sub/1.png"]
@@ -0,0 +1,30 @@
+import json
+import pytest
+
+from backend.core.benchmark import main, summarize
+
+def test_summarize_percentiles():
+    """Summaries report the count, minimum, median and 95th percentile of the samples"""
+    stats = summarize([float(i) for i in range(1, 101)])
+    assert stats["n"] == 100
+    assert stats["min_ms"] == 1.0
+    assert stats["median_ms"] == 50.5
+    assert stats["p95_ms"] == 96.0
+
+@pytest.mark.benchmark
+def test_benchmark_suite_smoke(tmp_path):
+    """Run every stage at toy sizes with random weights and check the JSON report"""
+    output = tmp_path / "bench.json"
+    main([
+        "--random-weights", "--batch-sizes", "1", "2", "--resolutions", "64",
+        "--upload-size", "96", "64", "--repeats", "1", "--requests", "4",
+        "--concurrency", "2", "--output", str(output),
+    ])
+    report = json.loads(output.read_text())
+    results = report["results"]
+    assert set(results) == {"decode", "forward", "encode", "resolution", "enhance"}
+    assert results["resolution"]["low_load0"]["size"] == [128, 80]
+    assert set(results["forward"]) == {"b1_64", "b2_64"}
+    assert results["enhance"]["status_codes"] == {"200": 4}
+    assert report["environment"]["weights"] == "random"
+    assert report["model"]["params"] > 0 and report["model"]["gflops"] > 0
@@ -0,0 +1,34 @@
+from backend.core.cache import ResultCache, cache_key
+
+def test_cache_key_depends_on_all_parts():
+    """Same bytes with a different version, precision or format map to different keys"""
+    assert cache_key(b"img", "v1", "PNG") == cache_key(b"img", "v1", "PNG")
+    assert cache_key(b"img", "v1", "PNG") != cache_key(b"img", "v2", "PNG")
+    assert cache_key(b"img", "v1", "PNG") != cache_key(b"img", "v1", "JPEG")
+    # INFERENCE_PRECISION changes the output without changing the weights version
+    assert cache_key(b"img", "v1", "eager", "fp32", "PNG") != cache_key(b"img", "v1", "eager", "bf16", "PNG")
+
+def test_memory_tier_evicts_least_recently_used():
+    """The memory tier stays within its byte budget, evicting LRU entries"""
+    cache = ResultCache(max_bytes=10)
+    cache.put("a", b"12345", {})
+    cache.put("b", b"12345", {})
+    assert cache.get("a") is not None  # a is now most recent
+    cache.put("c", b"12345", {})
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.evictions == 1
+    assert cache.stats()["bytes"] <= 10
+
+def test_disk_tier_survives_restart(tmp_path):
+    """Entries written to disk are served by a fresh cache instance"""
+    cache = ResultCache(max_bytes=0, disk_dir=str(tmp_path))
+    cache.put("k", b"payload", {"format": "png"})
+
+    restarted = ResultCache(max_bytes=1024, disk_dir=str(tmp_path))
+    payload, meta = restarted.get("k")
+    assert payload == b"payload"
+    assert meta == {"format": "png"}
+    assert restarted.disk_hits == 1
@@ -0,0 +1,108 @@
+import json
+import asyncio
+import httpx
+from backend.core.db import FeedbackWriter, MemoryBackend, Storage, SupabaseBackend, TTLCache
+def test_feedback_is_inserted_in_batches():
+    """Buffered rows go out batch_size at a time, in order"""
+    backend = MemoryBackend()
+    calls = []
+    insert = backend.insert
+
+    async def counting_insert(table, rows):
+        calls.append(len(rows))
+        return await insert(table, rows)
+    backend.insert = counting_insert
+
+    async def run():
+        writer = FeedbackWriter(backend, batch_size=2, interval_s=60, max_buffer=10)
+        for i in range(5):
+            writer.add({"rating": True, "n": i})
+        await asyncio.sleep(0.01)
+        await writer.stop()
+        return writer
+
+    writer = asyncio.run(run())
+    assert sum(calls) == 5 and max(calls) == 2
+    assert writer.written == 5 and writer.buffered == 0
+    assert [row["n"] for row in backend.tables["feedback"]] == [0, 1, 2, 3, 4]
+
+def test_stop_waits_for_an_in_progress_insert():
+    """Stopping mid-insert neither loses nor duplicates the batch being written"""
+    backend = MemoryBackend()
+    insert = backend.insert
+
+    async def slow_insert(table, rows):
+        await asyncio.sleep(0.05)
+        return await insert(table, rows)
+    backend.insert = slow_insert
+
+    async def run():
+        writer = FeedbackWriter(backend, batch_size=2, interval_s=60, max_buffer=10)
+        for i in range(3):
+            writer.add({"n": i})
+        # The first batch is now being inserted by the background task
+        await asyncio.sleep(0.01)
+        await writer.stop()
+        return writer
+
+    writer = asyncio.run(run())
+    assert writer.written == 3 and writer.buffered == 0
+    assert [row["n"] for row in backend.tables["feedback"]] == [0, 1, 2]
+
+def test_feedback_buffer_is_bounded_when_backend_fails():
+    """With the backend down the oldest rows are dropped past max_buffer"""
+    class Down(MemoryBackend):
+        async def insert(self, table, rows):
+            raise httpx.ConnectError("down")
+
+    async def run():
+        writer = FeedbackWriter(Down(), batch_size=2, interval_s=60, max_buffer=4)
+        for i in range(6):
+            writer.add({"n": i})
+        await writer.stop()
+        return writer
+
+    writer = asyncio.run(run())
+    assert writer.buffered == 4 and writer.dropped == 2
+
+def test_share_and_cached_lookup_over_rest():
+    """Shares upload both images and later lookups are served from cache"""
+    requests = []
+
+    def handler(request: httpx.Request):
+        requests.append((request.method, request.url.path))
+        assert request.headers["apikey"] == "key"
+        if request.url.path.startswith("/storage/"):
+            return httpx.Response(200, json={"Key": request.url.path})
+        if request.method == "POST":
+            rows = json.loads(request.content)
+            return httpx.Response(201, json=[{"id": "abc", **rows[0]}])
+        return httpx.Response(200, json=[])
+
+    async def run():
+        storage = Storage(SupabaseBackend("https://x.supabase.co", "key", transport=httpx.MockTransport(handler)))
+        share_id = await storage.share((b"a", "image/jpeg"), (b"b", "image/png"))
+        row = await storage.get_shared(share_id)
+        missing = await storage.get_shared("nope")
+        await storage.close()
+        return share_id, row, missing
+
+    share_id, row, missing = asyncio.run(run())
+    assert share_id == "abc" and missing is None
+    assert row["original_url"].startswith("https://x.supabase.co/storage/v1/object/public/")
+    assert row["original_url"].endswith("_orig.jpg")
+    uploads = [path for method, path in requests if path.startswith("/storage/")]
+    assert len(uploads) == 2
+    # The share was served from cache; only the miss reached the database
+    assert requests.count(("GET", "/rest/v1/shared_results")) == 1
+
+def test_ttl_cache_expires_and_evicts():
+    """Entries expire after the TTL and the oldest is evicted when full"""
+    cache = TTLCache(max_entries=2, ttl_s=-1)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+
+    cache = TTLCache(max_entries=2, ttl_s=60)
+    for key in "abc":
+        cache.put(key, key)
+    assert cache.get("a") is None and cache.get("c") == "c"
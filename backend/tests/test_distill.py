@@ -0,0 +1,63 @@
+import torch
+
+from backend.core.model import UNet, unet_config
+from backend.core.parity import count_flops, count_params
+from backend.distill import compare, distill, prune, training_images
+
+def teacher():
+    """A small UNet with spread-out BatchNorm statistics"""
+    torch.manual_seed(0)
+    model = UNet(base_width=8, depth=2).eval()
+    # Spread the BatchNorm scales so pruning has something to rank
+    for module in model.modules():
+        if isinstance(module, torch.nn.BatchNorm2d):
+            module.weight.data.uniform_(0.1, 1.0)
+            module.running_var.uniform_(0.5, 1.5)
+    return model
+
+def test_default_unet_keeps_checkpoint_layout():
+    """The default UNet keeps the served checkpoint's keys; width and depth read back from weights"""
+    model = UNet()
+    assert unet_config(model.state_dict()) == {"base_width": 64, "depth": 4}
+    assert {"enc4.conv.conv.0.weight", "bottleneck.conv.0.weight", "dec1.up.weight"} <= set(model.state_dict())
+    slim = UNet(base_width=16, depth=3)
+    assert unet_config(slim.state_dict()) == {"base_width": 16, "depth": 3}
+    # Half the width is a quarter of the parameters and convolution FLOPs
+    assert round(count_params(UNet()) / count_params(UNet(base_width=32)), 1) == 4.0
+    assert round(count_flops(UNet(), 64) / count_flops(UNet(base_width=32), 64), 1) == 4.0
+
+def test_pruning_to_full_width_is_exact():
+    """Pruning to the teacher's own width reproduces the teacher"""
+    model = teacher()
+    x = torch.rand(2, 3, 32, 32)
+    with torch.no_grad():
+        assert torch.equal(prune(model, 8)(x), model(x))
+
+def test_distilled_student_approaches_teacher():
+    """A few distillation steps lower the loss and raise PSNR against the teacher"""
+    model = teacher()
+    torch.manual_seed(1)
+    student = UNet(base_width=4, depth=2)
+    images = training_images(count=4, size=32)
+    before = compare(model, student, images[:2])
+
+    history = distill(model, student, images, steps=30, batch_size=4, crop=32, lr=1e-3, log_every=10)
+    after = compare(model, student, images[:2])
+
+    assert history[-1] < history[0]
+    assert after["psnr_db"] > before["psnr_db"]
+    assert after["student"]["params"] < after["teacher"]["params"]
+
+def test_manager_loads_student_weights(tmp_path):
+    """A saved student loads with its own width and depth read from the weights"""
+    from backend.core.model import ModelManager
+    path = tmp_path / "student.pth"
+    torch.save(prune(teacher(), 4).state_dict(), path)
+
+    manager = ModelManager.standalone()
+    try:
+        entry = manager.load_weights(path, name="student", version="s1", backend="eager", precision="fp32")
+        assert (entry.model.base_width, entry.model.depth) == (4, 2)
+        assert entry.predict(torch.rand(1, 3, 32, 32)).shape == (1, 3, 32, 32)
+    finally:
+        manager.shutdown()
@@ -0,0 +1,87 @@
+import io
+import time
+import asyncio
+import httpx
+import torch
+from fastapi import FastAPI
+from PIL import Image
+from backend.api import endpoints
+from backend.core.executor import InferenceExecutor
+from backend.core.model import LoadedModel, ModelManager, MODEL_NAME
+
+def png(level: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 32), (level, level, level)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+async def disconnect_after_first_line(app, request: httpx.Request) -> list:
+    """Drive `app` with `request` and hang up as soon as the first body chunk arrives"""
+    body = request.read()
+    hang_up = asyncio.Event()
+    received = []
+    sent_body = False
+
+    async def receive():
+        nonlocal sent_body
+        if not sent_body:
+            sent_body = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await hang_up.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            received.append(message["body"])
+            hang_up.set()
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": request.url.path, "raw_path": request.url.raw_path, "root_path": "",
+        "query_string": b"", "headers": [(k.lower(), v) for k, v in request.headers.raw],
+        "client": ("test", 1), "server": ("test", 80),
+    }
+    await app(scope, receive, send)
+    return received
+
+def test_disconnect_cancels_outstanding_work(monkeypatch):
+    """A client hanging up mid-stream stops the queued decodes and frees the executor slot"""
+    executor = InferenceExecutor(max_workers=1, max_queue=1)
+    manager = ModelManager.standalone()
+    manager.register(LoadedModel(MODEL_NAME, "v1", torch.nn.Identity()))
+    decoded = []
+
+    def slow_decode(contents):
+        time.sleep(0.02)
+        decoded.append(len(contents))
+        return decode(contents)
+    decode = endpoints.decode_bulk_item
+    monkeypatch.setattr(endpoints, "decode_bulk_item", slow_decode)
+    monkeypatch.setattr(endpoints, "inference_executor", executor)
+    monkeypatch.setattr(endpoints, "model_manager", manager)
+    monkeypatch.setattr(endpoints.limiter, "enabled", False)
+
+    app = FastAPI()
+    app.state.limiter = endpoints.limiter
+    app.include_router(endpoints.router, prefix="/api/v1")
+    # The broken first file gives a line right away; the rest are still queued
+    files = [("files", ("bad.png", b"not an image", "image/png"))]
+    files += [("files", (f"{i}.png", png(i), "image/png")) for i in range(30)]
+    request = httpx.Request("POST", "http://test/api/v1/enhance_batch", files=files)
+
+    async def scenario():
+        received = await disconnect_after_first_line(app, request)
+        stopped_at = len(decoded)
+        # Leftover tasks would keep running on this loop
+        await asyncio.sleep(0.3)
+        return received, stopped_at
+
+    try:
+        received, stopped_at = asyncio.run(scenario())
+        assert b'"status": "error"' in received[0]
+        assert executor.in_flight == 0
+        # At most the decode already on the worker thread finishes
+        assert len(decoded) <= stopped_at + 1 < 31
+        assert [m["in_flight"] for m in manager.list_models()] == [0]
+    finally:
+        executor.shutdown()
+        manager.shutdown()
@@ -0,0 +1,39 @@
+import asyncio
+import pytest
+
+from backend.core.executor import InferenceExecutor, QueueFullError, StageTimer
+
+def test_executor_rejects_when_saturated():
+    """Requests beyond workers + queue depth are rejected instead of queued"""
+    executor = InferenceExecutor(max_workers=1, max_queue=1)
+
+    async def scenario():
+        async with executor.admit():
+            async with executor.admit():
+                assert executor.saturated
+                with pytest.raises(QueueFullError):
+                    async with executor.admit():
+                        pass
+        assert executor.in_flight == 0
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+
+def test_executor_runs_blocking_work():
+    """Blocking functions run on the pool and their results are awaited"""
+    executor = InferenceExecutor(max_workers=2, max_queue=0)
+    try:
+        result = asyncio.run(executor.run(sum, [1, 2, 3]))
+        assert result == 6
+    finally:
+        executor.shutdown()
+
+def test_stage_timer_records_stages():
+    """Each stage gets a duration and a Server-Timing entry"""
+    timer = StageTimer()
+    with timer.stage("decode"):
+        pass
+    assert "decode" in timer.timings
+    assert timer.server_timing().startswith("decode;dur=")
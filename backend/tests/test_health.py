@@ -0,0 +1,31 @@
+import time
+from types import SimpleNamespace
+import backend.core.health as health
+from backend.core.executor import InferenceExecutor
+
+def test_readiness_requires_model_and_free_queue(monkeypatch):
+    """Not ready until the model is loaded, and again while the queue is full"""
+    executor = InferenceExecutor(max_workers=1, max_queue=0)
+    monkeypatch.setattr(health, "inference_executor", executor)
+    monkeypatch.setattr(health, "model_manager", SimpleNamespace(current=None))
+    monitor = health.HealthMonitor()
+
+    assert monitor.readiness() == (False, ["model not loaded"])
+
+    monkeypatch.setattr(health, "model_manager", SimpleNamespace(current=object()))
+    assert monitor.readiness() == (True, [])
+
+    executor.try_acquire()
+    assert monitor.readiness() == (False, ["inference queue full"])
+
+def test_snapshot_is_refreshed_in_background():
+    """The sampler thread replaces the snapshot every interval"""
+    monitor = health.HealthMonitor(interval_s=0.1)
+    monitor.start()
+    try:
+        first = monitor.snapshot()
+        time.sleep(0.3)
+        assert monitor.snapshot()["sampled_at"] > first["sampled_at"]
+        assert "cpu_percent" in monitor.snapshot()["system"]
+    finally:
+        monitor.shutdown()
@@ -0,0 +1,65 @@
+import io
+import pytest
+import torch
+from PIL import Image
+
+from backend.core.image import (
+    ImageSource, sniff_mime_type, process_image, tensor_to_uint8, tensor_to_bytes, SUPPORTED_OUTPUT_FORMATS,
+)
+
+def encode(image, format):
+    buf = io.BytesIO()
+    image.save(buf, format=format)
+    return buf.getvalue()
+
+def test_sniff_mime_type():
+    """File signatures identify JPEG and PNG, anything else is rejected"""
+    img = Image.new('RGB', (8, 8))
+    assert sniff_mime_type(encode(img, 'PNG')[:16]) == "image/png"
+    assert sniff_mime_type(encode(img, 'JPEG')[:16]) == "image/jpeg"
+    assert sniff_mime_type(b"not an image") is None
+
+def test_image_source_reads_header_only():
+    """Dimensions are available before any pixel data is decoded"""
+    source = ImageSource(encode(Image.new('RGB', (640, 480)), 'PNG'))
+    assert (source.width, source.height) == (640, 480)
+    assert source.mime_type == "image/png"
+
+def test_jpeg_decodes_at_reduced_scale():
+    """Large JPEGs use draft mode and still produce the requested size"""
+    source = ImageSource(encode(Image.new('RGB', (2048, 1536), 'gray'), 'JPEG'))
+    tensor = source.to_tensor((256, 256))
+    assert tensor.shape == (1, 3, 256, 256)
+    assert source.image.size[0] < 2048
+
+def test_to_tensor_fills_preallocated_buffer():
+    """Decoding writes straight into a caller-provided buffer"""
+    buffer = torch.zeros(2, 3, 16, 16)
+    source = ImageSource(encode(Image.new('RGB', (16, 16), (255, 0, 0)), 'PNG'))
+    out = source.to_tensor((16, 16), out=buffer[1])
+    assert out.data_ptr() == buffer[1].data_ptr()
+    assert torch.allclose(buffer[1, 0], torch.ones(16, 16))
+    assert torch.all(buffer[0] == 0)
+
+def test_process_image_shape():
+    """process_image keeps its [1, 3, IMG_SIZE, IMG_SIZE] contract"""
+    tensor = process_image(encode(Image.new('RGB', (300, 200)), 'PNG'))
+    assert tensor.shape == (1, 3, 256, 256)
+    assert tensor.dtype == torch.float32
+
+def test_tensor_to_uint8_clamps_and_truncates():
+    """Same rounding as ToPILImage: clamp to [0, 1], scale, truncate"""
+    tensor = torch.tensor([-0.5, 0.0, 0.5, 0.999, 1.5]).view(1, 1, 1, 5).expand(1, 3, 1, 5)
+    pixels = tensor_to_uint8(tensor)
+    assert pixels.shape == (1, 5, 3)
+    assert pixels[0, :, 0].tolist() == [0, 0, 127, 254, 255]
+
+def test_tensor_to_bytes_formats():
+    """Every supported format round-trips; quality changes lossy output"""
+    tensor = torch.rand(1, 3, 32, 48)
+    for name in SUPPORTED_OUTPUT_FORMATS:
+        image = Image.open(io.BytesIO(tensor_to_bytes(tensor, format=name)))
+        assert image.size == (48, 32)
+    assert len(tensor_to_bytes(tensor, "jpeg", quality=20)) < len(tensor_to_bytes(tensor, "jpeg", quality=95))
+    with pytest.raises(ValueError):
+        tensor_to_bytes(tensor, format="gif")
@@ -0,0 +1,88 @@
+import time
+import pytest
+
+from backend.core.jobs import JobQueue, MemoryJobStore, SQLiteJobStore, DONE, FAILED, RUNNING, QUEUED
+
+def wait_for(queue, job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in (DONE, FAILED):
+            return job
+        time.sleep(0.02)
+    raise AssertionError("job did not finish")
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryJobStore()
+    return SQLiteJobStore(str(tmp_path / "jobs.db"))
+
+def test_job_runs_to_completion(store):
+    """Submitted jobs are claimed, processed and keep their result"""
+    def handler(job, progress):
+        progress(0.5)
+        return job["input"][::-1], {"format": "png"}
+
+    queue = JobQueue(store, handler, workers=1, max_queued=10)
+    try:
+        job = queue.submit(b"abc", {"mode": "fast"})
+        assert "input" not in job
+        done = wait_for(queue, job["id"])
+        assert done["result"] == b"cba"
+        assert done["meta"]["format"] == "png"
+        assert done["progress"] == 1.0
+    finally:
+        queue.shutdown()
+
+def test_failed_job_records_error(store):
+    """Handler exceptions mark the job failed without killing the worker"""
+    def handler(job, progress):
+        raise ValueError("bad image")
+
+    queue = JobQueue(store, handler, workers=1, max_queued=10)
+    try:
+        job = queue.submit(b"x", {})
+        failed = wait_for(queue, job["id"])
+        assert failed["status"] == FAILED
+        assert "bad image" in failed["error"]
+    finally:
+        queue.shutdown()
+
+def test_sqlite_recovers_stale_jobs(tmp_path):
+    """Jobs left running by a dead worker are requeued once stale"""
+    store = SQLiteJobStore(str(tmp_path / "jobs.db"))
+    queue = JobQueue(store, lambda job, progress: (b"", {}), workers=0, max_queued=10)
+    job = queue.submit(b"x", {})
+    assert store.claim()["status"] == RUNNING
+
+    store.recover(stale_before=time.time() + 1)
+    assert store.get(job["id"])["status"] == QUEUED
+
+def test_heartbeat_keeps_live_jobs_from_recovery(store):
+    """A long job that writes no progress is heartbeated, not requeued under its worker"""
+    import threading
+    release = threading.Event()
+
+    def handler(job, progress):
+        release.wait(5)
+        return b"ok", {}
+
+    queue = JobQueue(store, handler, workers=1, max_queued=10)
+    try:
+        job = queue.submit(b"x", {})
+        deadline = time.monotonic() + 5
+        while queue.get(job["id"])["status"] != RUNNING and time.monotonic() < deadline:
+            time.sleep(0.02)
+        time.sleep(0.05)
+
+        heartbeat = time.time()
+        queue.housekeep()
+        store.recover(stale_before=heartbeat)
+        assert queue.get(job["id"])["status"] == RUNNING
+
+        release.set()
+        assert wait_for(queue, job["id"])["status"] == DONE
+    finally:
+        release.set()
+        queue.shutdown()
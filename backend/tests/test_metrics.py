@@ -0,0 +1,46 @@
+from backend.core.metrics import REGISTRY, Counter, Gauge, Histogram, Registry, render
+
+def test_counter_and_gauge_render():
+    """Labelled counters accumulate and callback gauges are read at scrape time"""
+    registry = Registry()
+    counter = Counter("test_events_total", "Events", ("kind",), registry=registry)
+    counter.inc(kind="a")
+    counter.inc(2, kind="a")
+    Gauge("test_depth", "Depth", callback=lambda: 7, registry=registry)
+
+    text = render(registry)
+    assert "# TYPE test_events_total counter" in text
+    assert 'test_events_total{kind="a"} 3' in text
+    assert "test_depth 7" in text
+    # Test metrics stay out of the process-wide /metrics output
+    assert "test_events_total" not in render()
+    assert counter not in REGISTRY.metrics
+
+def test_histogram_buckets_are_cumulative():
+    """Bucket counts include every observation at or below the bound"""
+    hist = Histogram("test_latency_seconds", "Latency", ("stage",), buckets=(0.1, 1.0), registry=Registry())
+    for value in (0.05, 0.5, 5.0):
+        hist.observe(value, stage="infer")
+
+    lines = "\n".join(hist.render())
+    assert 'test_latency_seconds_bucket{stage="infer",le="0.1"} 1' in lines
+    assert 'test_latency_seconds_bucket{stage="infer",le="1.0"} 2' in lines
+    assert 'test_latency_seconds_bucket{stage="infer",le="+Inf"} 3' in lines
+    assert 'test_latency_seconds_count{stage="infer"} 3' in lines
+    assert 'test_latency_seconds_sum{stage="infer"} 5.55' in lines
+
+def test_request_counts_are_labelled_with_the_full_route():
+    """Routes under the API router are labelled with their /api/v1 path template"""
+    from fastapi.testclient import TestClient
+    from backend.main import app
+
+    client = TestClient(app)
+    client.get("/api/v1/livez")
+    client.get("/api/v1/jobs/missing")
+    client.get("/not-a-route")
+
+    text = render()
+    assert 'lumeo_requests_total{endpoint="/api/v1/livez",status="200"}' in text
+    assert 'lumeo_requests_total{endpoint="/api/v1/jobs/{job_id}",status="404"}' in text
+    assert 'lumeo_requests_total{endpoint="unmatched",status="404"}' in text
+    assert 'endpoint="/livez"' not in text
@@ -0,0 +1,207 @@
+import threading
+import pytest
+import torch
+
+from backend.core.model import BatchScheduler, ModelManager
+
+def test_batch_scheduler_groups_concurrent_requests():
+    """Concurrent submissions share one forward pass and get their own outputs back"""
+    batch_sizes = []
+    release = threading.Event()
+
+    def predict(x):
+        release.wait(1)
+        batch_sizes.append(x.shape[0])
+        return x * 2
+
+    scheduler = BatchScheduler(predict, max_batch_size=4, max_wait_ms=200)
+    try:
+        inputs = [torch.full((1, 3, 8, 8), float(i)) for i in range(4)]
+        futures = [scheduler.submit(t) for t in inputs]
+        release.set()
+        for i, future in enumerate(futures):
+            out = future.result(timeout=5)
+            assert out.shape == (1, 3, 8, 8)
+            assert torch.all(out == 2 * i)
+    finally:
+        scheduler.shutdown()
+
+    assert sum(batch_sizes) == 4
+    assert max(batch_sizes) > 1
+
+def test_batch_scheduler_propagates_errors():
+    """A failing forward pass fails every request in the batch"""
+    def predict(x):
+        raise RuntimeError("boom")
+
+    scheduler = BatchScheduler(predict, max_batch_size=2, max_wait_ms=1)
+    try:
+        future = scheduler.submit(torch.zeros(1, 3, 8, 8))
+        with pytest.raises(RuntimeError):
+            future.result(timeout=5)
+    finally:
+        scheduler.shutdown()
+
+def test_batch_scheduler_separates_shapes():
+    """Inputs of different sizes are never concatenated together"""
+    shapes = []
+
+    def predict(x):
+        shapes.append(tuple(x.shape))
+        return x
+
+    scheduler = BatchScheduler(predict, max_batch_size=4, max_wait_ms=50)
+    try:
+        a = scheduler.submit(torch.zeros(1, 3, 8, 8))
+        b = scheduler.submit(torch.zeros(1, 3, 16, 16))
+        assert a.result(timeout=5).shape == (1, 3, 8, 8)
+        assert b.result(timeout=5).shape == (1, 3, 16, 16)
+    finally:
+        scheduler.shutdown()
+
+    assert all(s[0] == 1 for s in shapes)
+
+def test_torchscript_backend_matches_eager():
+    """BatchNorm folding and tracing keep outputs within fp32 tolerance"""
+    from backend.core.backends import build_backend
+    from backend.core.parity import psnr, ssim
+    from backend.core.model import UNet
+
+    model = UNet().eval()
+    runner = build_backend("torchscript", model, size=32)
+    x = torch.rand(2, 3, 32, 32)
+    with torch.no_grad():
+        expected, actual = model(x), runner(x)
+    assert psnr(actual, expected) > 60
+    assert ssim(actual, expected) > 0.999
+
+def test_unknown_backend_rejected():
+    """Misconfigured backends fail loudly rather than silently"""
+    from backend.core.backends import build_backend
+    with pytest.raises(ValueError):
+        build_backend("tensorrt", torch.nn.Identity())
+
+def test_manager_rejects_unknown_backend_but_falls_back_for_unavailable(monkeypatch):
+    """Typos in INFERENCE_BACKEND raise; known backends that fail to build fall back to eager"""
+    from backend.core import backends
+
+    manager = ModelManager.standalone()
+    model = torch.nn.Identity()
+    with pytest.raises(ValueError):
+        manager.build_runner(model, "tensorrt")
+
+    def unavailable(name, model, size=None):
+        raise RuntimeError("onnxruntime is not installed")
+    monkeypatch.setattr(backends, "build_backend", unavailable)
+    assert manager.build_runner(model, "onnx") == (model, "eager")
+
+def test_registry_swaps_active_version():
+    """Registering a new version swaps it in; older versions stay selectable"""
+    from backend.core.model import LoadedModel, MODEL_NAME
+
+    manager = ModelManager.standalone()
+    try:
+        manager.register(LoadedModel(MODEL_NAME, "v1", torch.nn.Identity()))
+        manager.register(LoadedModel(MODEL_NAME, "v2", torch.nn.Identity()))
+        assert manager.get().version == "v2"
+        assert manager.get("v1").version == "v1"
+
+        manager.activate("v1")
+        assert manager.get().version == "v1"
+
+        x = torch.rand(1, 3, 8, 8)
+        assert torch.equal(manager.submit(x, version="v2").result(timeout=5), x)
+        with pytest.raises(KeyError):
+            manager.get("missing")
+    finally:
+        manager.shutdown()
+
+def test_registry_retires_old_versions():
+    """Only MODEL_KEEP_VERSIONS versions per model stay loaded"""
+    from backend.core.model import LoadedModel, MODEL_NAME, MODEL_KEEP_VERSIONS
+
+    manager = ModelManager.standalone()
+    try:
+        for i in range(MODEL_KEEP_VERSIONS + 2):
+            manager.register(LoadedModel(MODEL_NAME, f"v{i}", torch.nn.Identity()))
+        versions = [m["version"] for m in manager.list_models()]
+        assert len(versions) == MODEL_KEEP_VERSIONS
+        assert f"v{MODEL_KEEP_VERSIONS + 1}" in versions
+    finally:
+        manager.shutdown()
+
+def test_batch_scheduler_cannot_restart_after_shutdown():
+    """A late submit after shutdown fails instead of leaking a new batcher thread"""
+    scheduler = BatchScheduler(lambda x: x)
+    scheduler.submit(torch.rand(1, 3, 4, 4)).result(timeout=5)
+    scheduler.shutdown()
+    with pytest.raises(RuntimeError):
+        scheduler.submit(torch.rand(1, 3, 4, 4))
+
+def test_pinned_version_survives_swap_until_released():
+    """A version resolved for a request keeps serving until the request releases it"""
+    import time
+    from backend.core.model import LoadedModel, MODEL_NAME, MODEL_KEEP_VERSIONS
+
+    manager = ModelManager.standalone()
+    try:
+        manager.register(LoadedModel(MODEL_NAME, "v0", torch.nn.Identity()))
+        pinned = manager.acquire()
+        # Swap in enough versions that v0 is dropped and retired
+        for i in range(1, MODEL_KEEP_VERSIONS + 1):
+            manager.register(LoadedModel(MODEL_NAME, f"v{i}", torch.nn.Identity()))
+        assert "v0" not in [m["version"] for m in manager.list_models()]
+
+        time.sleep(0.2)
+        x = torch.rand(1, 3, 8, 8)
+        assert torch.equal(pinned.submit(x).result(timeout=5), x)
+
+        pinned.release()
+        deadline = time.monotonic() + 5
+        while pinned.scheduler._thread is not None and time.monotonic() < deadline:
+            time.sleep(0.05)
+        with pytest.raises(RuntimeError):
+            pinned.submit(x)
+    finally:
+        manager.shutdown()
+
+def test_standalone_manager_leaves_the_shared_one_alone():
+    """Standalone managers get their own registry instead of the process-wide instance's"""
+    from backend.core.model import LoadedModel, MODEL_NAME
+
+    shared = ModelManager()
+    manager = ModelManager.standalone()
+    try:
+        manager.register(LoadedModel(MODEL_NAME, "standalone", torch.nn.Identity()))
+        assert manager is not shared and ModelManager() is shared
+        assert "standalone" not in shared.active.values() and manager.get().version == "standalone"
+    finally:
+        manager.shutdown()
+
+def test_first_use_loads_the_weights_once(monkeypatch):
+    """Requests racing to the first get() wait for one load instead of each loading the model"""
+    import time
+    from backend.core.model import LoadedModel, MODEL_NAME
+    from backend.core.threads import ThreadPolicy
+
+    manager = ModelManager.standalone(policy=ThreadPolicy(torch.get_num_threads()))
+    loads = []
+
+    def load_weights(path, name=MODEL_NAME, version=None, **kwargs):
+        loads.append(path)
+        time.sleep(0.1)
+        entry = LoadedModel(name, f"v{len(loads)}", torch.nn.Identity())
+        manager.register(entry)
+        return entry
+    monkeypatch.setattr(manager, "load_weights", load_weights)
+
+    try:
+        threads = [threading.Thread(target=manager.get) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+        assert len(loads) == 1
+        assert [m["version"] for m in manager.list_models()] == ["v1"]
+    finally:
+        manager.shutdown()
@@ -0,0 +1,117 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+import pytest
+import torch
+
+from backend.core.model import LoadedModel, ModelManager, MODEL_NAME
+from multiprocessing.shared_memory import SharedMemory
+from backend.core.model_host import ModelHost, ModelHostClient
+
+class Double(torch.nn.Module):
+    def forward(self, x):
+        return x * 2
+
+@pytest.fixture
+def manager():
+    manager = ModelManager.standalone()
+    manager.register(LoadedModel(MODEL_NAME, "v1", Double()))
+    yield manager
+    manager.shutdown()
+
+@pytest.fixture
+def host(tmp_path, manager):
+
+    address = str(tmp_path / "model.sock")
+    server = ModelHost(manager, address, authkey="test")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    client = ModelHostClient(address, authkey="test")
+    for _ in range(100):
+        try:
+            client.get()
+            break
+        except OSError:
+            time.sleep(0.02)
+    yield client
+    client.shutdown()
+    server.shutdown()
+    # serve_forever returns instead of dying on the closed listener
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+
+def test_predict_through_shared_memory(host):
+    """Outputs come back through the client's shared memory slot"""
+    model = host.get()
+    assert (model.version, model.precision) == ("v1", "fp32")
+    # Lookups are cached briefly instead of asking the host every time
+    assert host.get() is model
+
+    small = torch.rand(1, 3, 16, 16)
+    large = torch.rand(2, 3, 32, 32)
+    assert torch.equal(model.predict(small), small * 2)
+    # The slot grows for larger inputs and earlier results stay intact
+    first = model.predict(small)
+    assert torch.equal(model.submit(large).result(timeout=5), large * 2)
+    assert torch.equal(first, small * 2)
+
+def test_unknown_version_raises_key_error(host):
+    """Errors raised in the host are re-raised in the client with their type"""
+    with pytest.raises(KeyError):
+        host.get("missing")
+    assert [m["version"] for m in host.list_models()] == ["v1"]
+
+def wait_for(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+def test_pinned_version_survives_a_swap_on_the_host(host, manager):
+    """A request's pin reaches the host, so tiles after a hot reload still find their version"""
+    from backend.core.model import MODEL_KEEP_VERSIONS
+
+    pinned = host.acquire()
+    entry = manager.get("v1")
+    assert entry.in_flight == 1
+    for i in range(2, MODEL_KEEP_VERSIONS + 2):
+        manager.register(LoadedModel(MODEL_NAME, f"v{i}", Double()))
+    assert "v1" not in [m["version"] for m in manager.list_models()]
+
+    x = torch.rand(1, 3, 8, 8)
+    assert torch.equal(pinned.predict(x), x * 2)
+    pinned.release()
+    assert wait_for(lambda: entry.in_flight == 0)
+
+def test_pins_of_a_dropped_client_are_released(host, manager, tmp_path):
+    """A worker that goes away without releasing can't keep a version pinned"""
+    entry = manager.get("v1")
+    other = ModelHostClient(str(tmp_path / "model.sock"), authkey="test")
+    other.acquire()
+    assert entry.in_flight == 1
+    other._local.conn.close()
+    assert wait_for(lambda: entry.in_flight == 0)
+    other.shutdown()
+
+def test_shutdown_unlinks_every_slot(host):
+    """Slots of every thread, including outgrown ones, are unlinked on shutdown"""
+    model = host.get()
+    model.predict(torch.rand(1, 3, 8, 8))
+    host.submit(torch.rand(1, 3, 8, 8)).result(timeout=5)
+    names = [slot.name for slot in host._slots]
+    assert len(names) == 2
+
+    host.shutdown()
+    assert host._slots == []
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            SharedMemory(name=name)
+
+def test_model_host_requires_an_authkey():
+    """MODEL_HOST without MODEL_HOST_AUTHKEY is a configuration error"""
+    env = {**os.environ, "MODEL_HOST": "/tmp/lumeo-test.sock", "MODEL_HOST_AUTHKEY": ""}
+    result = subprocess.run([sys.executable, "-c", "import backend.config"], env=env, capture_output=True, text=True)
+    assert result.returncode != 0
+    assert "MODEL_HOST_AUTHKEY" in result.stderr
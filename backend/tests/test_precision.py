@@ -0,0 +1,74 @@
+import pytest
+import torch
+
+from backend.core import precision
+from backend.core.model import LoadedModel
+from backend.core.parity import psnr
+
+def small_model():
+    torch.manual_seed(0)
+    return torch.nn.Sequential(torch.nn.Conv2d(3, 8, 3, padding=1), torch.nn.ReLU(), torch.nn.Conv2d(8, 3, 1)).eval()
+
+def test_unsupported_modes_fall_back_to_fp32(monkeypatch):
+    """bf16 needs native support and a module backend; anything else runs fp32"""
+    monkeypatch.setattr(precision, "native_bf16", lambda device="cpu": False)
+    assert precision.resolve_precision("bf16", "eager") == "fp32"
+    assert precision.resolve_precision("auto", "eager") == "fp32"
+    assert precision.resolve_precision("channels_last", "eager") == "channels_last"
+    # Traced, quantized and exported backends don't run the module under autocast
+    assert precision.resolve_precision("channels_last", "int8") == "fp32"
+    with pytest.raises(ValueError):
+        precision.resolve_precision("fp16", "eager")
+
+def test_native_bf16_is_kept(monkeypatch):
+    """With native bf16, bf16 and auto are kept for module backends"""
+    monkeypatch.setattr(precision, "native_bf16", lambda device="cpu": True)
+    assert precision.resolve_precision("bf16", "compile") == "bf16"
+    assert precision.resolve_precision("auto", "eager") == "auto"
+    assert precision.resolve_precision("bf16", "onnx") == "fp32"
+
+def test_bf16_model_returns_fp32_close_to_reference():
+    """bf16 inference hands back fp32 outputs close to the fp32 model's"""
+    model = small_model()
+    x = torch.rand(2, 3, 32, 32)
+    with torch.no_grad():
+        expected = model(x)
+
+    entry = LoadedModel("m", "v", model, precision="bf16")
+    entry.channels_last = True
+    output = entry.predict(x)
+    assert output.dtype == torch.float32 and output.shape == expected.shape
+    assert psnr(output, expected) > 30
+    assert entry.info()["precision"] == "bf16"
+
+def test_parity_runners_leave_the_model_untouched():
+    """Parity runners convert a copy, not the served model"""
+    model = small_model()
+    runner = precision.make_runner(model, "channels_last")
+    x = torch.rand(1, 3, 16, 16)
+    with torch.no_grad():
+        assert torch.allclose(runner(x), model(x), atol=1e-5)
+    assert model[0].weight.is_contiguous()
+
+def test_auto_times_several_samples_and_repeats(monkeypatch):
+    """The auto pick averages best-of-N timings over the samples it is given"""
+    from backend.core import parity
+    calls = []
+
+    def report(reference, candidate, samples, repeats=3):
+        calls.append((len(samples), repeats))
+        return {"psnr_db": 50.0, "speedup": 1.3}
+    monkeypatch.setattr(parity, "parity_report", report)
+
+    samples = [torch.rand(1, 3, 16, 16) for _ in range(precision.AUTO_SAMPLES)]
+    assert precision.pick_auto(small_model(), samples)[0] == "bf16"
+    assert calls == [(precision.AUTO_SAMPLES, precision.AUTO_REPEATS)]
+    assert precision.AUTO_SAMPLES > 1 and precision.AUTO_REPEATS > 1
+
+def test_auto_keeps_fp32_when_bf16_is_lossy_or_slower(monkeypatch):
+    """bf16 has to be both within tolerance and faster"""
+    from backend.core import parity
+    samples = [torch.rand(1, 3, 16, 16)]
+    for psnr_db, speedup in ((20.0, 2.0), (50.0, 0.9), (50.0, None)):
+        monkeypatch.setattr(parity, "parity_report", lambda *args, **kwargs: {"psnr_db": psnr_db, "speedup": speedup})
+        assert precision.pick_auto(small_model(), samples, min_psnr=35)[0] == "fp32"
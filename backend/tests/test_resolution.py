@@ -0,0 +1,66 @@
+import pytest
+from backend.core.resolution import (
+    align, check_default_tier, choose_resolution, load_pressure, parse_tiers, snap_aspect,
+)
+
+def test_parse_tiers():
+    """Tier specs parse into name -> long side"""
+    assert parse_tiers("low:256, standard:512") == {"low": 256, "standard": 512}
+
+def test_default_tier_must_be_listed():
+    """A default tier missing from RESOLUTION_TIERS is a ValueError"""
+    check_default_tier({"low": 256}, "low")
+    with pytest.raises(ValueError):
+        check_default_tier({"low": 256, "high": 768}, "standard")
+
+def test_tier_caps_long_side_and_keeps_aspect():
+    """The tier caps the long side and the aspect ratio is kept"""
+    assert choose_resolution(4000, 3000, "low") == (256, 192)
+    assert choose_resolution(4000, 3000, "high") == (768, 576)
+    assert choose_resolution(3000, 4000, "standard") == (384, 512)
+
+def test_small_inputs_are_not_upscaled_past_minimum():
+    """Small inputs stay small, but never below the minimum"""
+    assert choose_resolution(300, 200, "high") == (256, 160)
+    assert choose_resolution(300, 200, "high", bucket=0) == (288, 192)
+    assert choose_resolution(64, 64, "high") == (128, 128)
+
+def test_sides_are_multiples_of_16():
+    """Every size the UNet sees pools cleanly four times"""
+    for width, height in [(1000, 777), (1920, 1080), (513, 99)]:
+        for tier in ("low", "standard", "high"):
+            for bucket in (0, 128):
+                size = choose_resolution(width, height, tier, load=0.8, bucket=bucket)
+                assert all(side % 16 == 0 and side >= 16 for side in size)
+
+def test_similar_inputs_share_a_bucket():
+    """Nearby input sizes and loads map to one shape, so they can be batched together"""
+    inputs = [(4032, 3024), (4000, 3000), (3264, 2448), (2000, 1520)]
+    assert {choose_resolution(*size, "standard", load) for size in inputs for load in (0.0, 0.5)} == {(512, 384)}
+    assert {choose_resolution(*size, "standard", load) for size in inputs for load in (0.6, 0.7)} == {(384, 288)}
+    # Without buckets the same requests spread over several shapes
+    assert len({choose_resolution(4000, 3000, "standard", load, bucket=0) for load in (0.6, 0.7, 0.8)}) == 3
+
+def test_unusual_aspects_are_not_stretched():
+    """Aspect ratios far from every bucket are kept as they are"""
+    assert snap_aspect(1.34) == 4 / 3
+    assert snap_aspect(3.0) == 3.0
+    assert choose_resolution(3000, 1000, "standard") == (512, 160)
+
+def test_load_sheds_resolution_past_the_knee():
+    """Past the knee the long side shrinks with load, to half at saturation"""
+    assert load_pressure(0.5, knee=0.5) == 0
+    assert load_pressure(0.75, knee=0.5) == 0.5
+    assert load_pressure(2.0, knee=0.5) == 1
+    idle = choose_resolution(4000, 3000, "standard", load=0.0)
+    busy = choose_resolution(4000, 3000, "standard", load=1.0)
+    assert idle == (512, 384) and busy == (256, 192)
+
+def test_unknown_tier():
+    """Tiers outside RESOLUTION_TIERS are a ValueError"""
+    with pytest.raises(ValueError):
+        choose_resolution(100, 100, "ultra")
+
+def test_align():
+    """Rounding is down to a multiple of 16, with 16 as the floor"""
+    assert (align(7), align(31.9), align(32), align(47)) == (16, 16, 32, 32)
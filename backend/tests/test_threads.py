@@ -0,0 +1,36 @@
+import torch
+
+from backend.core.threads import ThreadPolicy, autotune, split_cores, thread_candidates
+
+def test_split_cores_gives_each_worker_a_disjoint_share():
+    """Each worker gets its own slice of the cores, and none are left over"""
+    cores = list(range(8))
+    shares = [split_cores(cores, 3, slot) for slot in range(3)]
+    assert shares == [[0, 1, 2], [3, 4, 5], [6, 7]]
+    assert [split_cores(list(range(6)), 3, slot) for slot in range(3)] == [[0, 1], [2, 3], [4, 5]]
+    # 10 cores over 4 workers: the first two take the remainder
+    shares = [split_cores(list(range(10)), 4, slot) for slot in range(4)]
+    assert shares == [[0, 1, 2], [3, 4, 5], [6, 7], [8, 9]]
+    # More workers than cores: workers share cores round-robin
+    assert split_cores([0, 1], 4, 3) == [1]
+
+def test_thread_candidates_include_the_limit():
+    """Candidates double up to the limit and always include it"""
+    assert thread_candidates(1) == [1]
+    assert thread_candidates(6) == [1, 2, 4, 6]
+
+def test_autotune_picks_a_policy_and_keeps_outputs():
+    """Autotuning applies the fastest thread count without changing outputs"""
+    model = torch.nn.Sequential(torch.nn.Conv2d(3, 8, 3, padding=1), torch.nn.ReLU(), torch.nn.Conv2d(8, 3, 1)).eval()
+    x = torch.rand(1, 3, 32, 32)
+    with torch.no_grad():
+        expected = model(x)
+    previous = torch.get_num_threads()
+    try:
+        best = autotune(model, ThreadPolicy(intra=2), size=32, repeats=1)
+        assert best.intra in (1, 2)
+        assert torch.get_num_threads() == best.intra
+        with torch.no_grad():
+            assert torch.allclose(model(x), expected, atol=1e-5)
+    finally:
+        torch.set_num_threads(previous)
@@ -0,0 +1,51 @@
+import asyncio
+from concurrent.futures import Future
+import torch
+
+from backend.core.tiling import tiled_predict, tiled_predict_async, tile_starts
+
+def test_tile_starts_cover_length():
+    """Tiles cover the full length and the last one ends at the edge"""
+    starts = tile_starts(300, 64, 48)
+    assert starts[0] == 0
+    assert starts[-1] + 64 == 300
+    assert all(b - a <= 48 for a, b in zip(starts, starts[1:]))
+
+def test_tiled_predict_preserves_size_and_content():
+    """An identity model reproduces the input exactly at native resolution"""
+    image = torch.rand(1, 3, 100, 300)
+    batch_sizes = []
+
+    def identity(tiles):
+        batch_sizes.append(tiles.shape[0])
+        return tiles
+
+    output = tiled_predict(image, identity, tile_size=64, overlap=16, batch_size=3)
+    assert output.shape == image.shape
+    assert torch.allclose(output, image, atol=1e-5)
+    assert max(batch_sizes) <= 3
+
+def test_tiled_predict_small_image():
+    """Images smaller than a tile are padded and cropped back"""
+    image = torch.rand(1, 3, 20, 30)
+    output = tiled_predict(image, lambda t: t, tile_size=32, overlap=8)
+    assert output.shape == image.shape
+    assert torch.allclose(output, image, atol=1e-5)
+
+def test_tiled_predict_async_matches_sync():
+    """Awaiting submitted tile batches blends to the same output"""
+    image = torch.rand(1, 3, 100, 140)
+    progress = []
+
+    def submit(tiles):
+        future = Future()
+        future.set_result(tiles * 0.5)
+        return future
+
+    output = asyncio.run(tiled_predict_async(
+        image, submit, tile_size=64, overlap=16, batch_size=2,
+        progress=lambda done, total: progress.append((done, total)),
+    ))
+    expected = tiled_predict(image, lambda tiles: tiles * 0.5, tile_size=64, overlap=16, batch_size=2)
+    assert torch.allclose(output, expected)
+    assert progress[-1][0] == progress[-1][1]
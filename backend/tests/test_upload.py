@@ -0,0 +1,80 @@
+import io
+import asyncio
+import zipfile
+import pytest
+from tempfile import SpooledTemporaryFile
+from fastapi import HTTPException, UploadFile
+from backend.api.endpoints import read_image_upload, read_upload, unpack_archive
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 100
+
+class CountingFile(io.BytesIO):
+    """File whose reads are recorded"""
+    def __init__(self, data):
+        super().__init__(data)
+        self.reads = []
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.reads.append(len(data))
+        return data
+
+def upload(data: bytes, sized: bool = True) -> UploadFile:
+    spool = SpooledTemporaryFile()
+    spool.write(data)
+    spool.seek(0)
+    return UploadFile(file=spool, size=len(data) if sized else None, filename="x.png")
+
+def test_read_upload_returns_body_in_one_read():
+    """A sized upload is sniffed from its header, then read whole"""
+    data = PNG * 1000
+    file = CountingFile(data)
+    contents, mime_type = asyncio.run(read_image_upload(UploadFile(file=file, size=len(data))))
+    assert contents == data and mime_type == "image/png"
+    # Signature peek, then the whole body at once
+    assert file.reads == [16, len(data)]
+
+def test_oversized_upload_is_rejected_before_reading():
+    """A declared size over the limit is a 413 without touching the body"""
+    file = CountingFile(PNG)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(read_upload(UploadFile(file=file, size=len(PNG)), max_size=10))
+    assert error.value.status_code == 413
+    assert file.reads == []
+
+def test_bad_signature_is_rejected_on_first_chunk():
+    """An unsupported type is a 400 after the signature peek"""
+    file = CountingFile(b"GIF89a" + b"\x00" * 1000)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(read_image_upload(UploadFile(file=file, size=1006)))
+    assert error.value.status_code == 400
+    assert file.reads == [16]
+
+def test_unsized_upload_is_limited_while_streaming():
+    """Without a declared size the limit is checked chunk by chunk"""
+    assert asyncio.run(read_upload(upload(PNG, sized=False))) == (PNG, None)
+    assert asyncio.run(read_image_upload(upload(PNG, sized=False))) == (PNG, "image/png")
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(read_upload(upload(PNG * 10, sized=False), max_size=500))
+    assert error.value.status_code == 413
+
+def test_empty_image_upload_is_rejected():
+    """An empty body has no signature to sniff"""
+    for sized in (True, False):
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(read_image_upload(upload(b"", sized=sized)))
+        assert error.value.status_code == 400
+
+def test_unreadable_archive_entries_fail_on_their_own():
+    """A corrupt zip entry becomes an error for that item, not for the whole archive"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        archive.writestr("good.png", PNG)
+        archive.writestr("bad.png", PNG)
+    data = bytearray(buffer.getvalue())
+    # Flip a payload byte of the second entry so its CRC check fails
+    data[data.index(b"bad.png") + len("bad.png") + 20] ^= 0xFF
+
+    items = dict(unpack_archive(bytes(data)))
+    assert items["good.png"] == PNG
+    assert isinstance(items["bad.png"], HTTPException) and items["bad.png"].status_code == 400
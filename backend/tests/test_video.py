@@ -0,0 +1,141 @@
+import io
+import asyncio
+import zipfile
+from concurrent.futures import Future
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+from backend.core.video import FrameSource, VideoSink, enhance_frames, stream_sequence
+
+class Scale:
+    """Stand-in model: brightens by a fixed factor and records batch sizes"""
+    version = "test"
+
+    def __init__(self):
+        self.batches = []
+
+    def submit(self, batch):
+        self.batches.append(batch.shape[0])
+        future = Future()
+        future.set_result(batch * 2)
+        return future
+
+def frames(levels: list, size: int = 32) -> list:
+    return [Image.new("RGB", (size, size), (level, level, level)) for level in levels]
+
+def collect(chunks) -> list:
+    """Drain an async generator on a fresh event loop"""
+    async def drain():
+        return [chunk async for chunk in chunks]
+    return asyncio.run(drain())
+
+def frame_zip(sizes: list) -> bytes:
+    """Zip of PNG frames of the given sizes, named in order"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for index, size in enumerate(sizes):
+            image = io.BytesIO()
+            frames([50], size)[0].save(image, "PNG")
+            archive.writestr(f"{index:03d}.png", image.getvalue())
+    return buffer.getvalue()
+
+def animated_gif(levels: list) -> bytes:
+    images = frames(levels)
+    buffer = io.BytesIO()
+    images[0].save(buffer, "GIF", save_all=True, append_images=images[1:], duration=40)
+    return buffer.getvalue()
+
+def test_near_duplicate_frames_reuse_output():
+    """Consecutive near-identical frames are enhanced once and the output reused"""
+    model = Scale()
+    stats = {}
+    levels = [10, 10, 10, 80, 80, 150]
+    outputs = collect(enhance_frames(frames(levels), model, size=(16, 16), batch_size=2, stats=stats))
+
+    assert len(outputs) == len(levels)
+    assert stats == {"frames": 6, "enhanced": 3, "reused": 3}
+    assert sum(model.batches) == 3 and max(model.batches) <= 2
+    # Each output matches its own frame, including the reused ones
+    for level, output in zip(levels, outputs):
+        assert output.shape == (1, 3, 16, 16)
+        assert torch.allclose(output, torch.full_like(output, level / 255 * 2))
+
+def test_reuse_disabled_enhances_every_frame():
+    """A zero threshold sends every frame through the model"""
+    stats = {}
+    collect(enhance_frames(frames([10, 10, 10]), Scale(), size=(16, 16), reuse_threshold=0, stats=stats))
+    assert stats["enhanced"] == 3 and stats["reused"] == 0
+
+def test_max_frames_truncates():
+    """Frames past max_frames are dropped"""
+    outputs = collect(enhance_frames(frames([10, 20, 30, 40]), Scale(), size=(16, 16), max_frames=2))
+    assert len(outputs) == 2
+
+def test_animated_image_streams_to_frame_zip():
+    """An animated GIF comes back as a zip of numbered frames, in several chunks"""
+    source = FrameSource(animated_gif([10, 60, 120]))
+    assert (source.kind, source.frame_count, source.fps) == ("animated", 3, 25)
+
+    chunks = collect(stream_sequence(source, Scale(), "zip", "jpeg", size=(16, 16)))
+    assert len(chunks) > 1
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+    assert archive.namelist() == ["frame_000000.jpg", "frame_000001.jpg", "frame_000002.jpg"]
+
+def test_frame_zip_input_is_read_in_name_order():
+    """Zip frames are read sorted by name, skipping non-image entries"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, level in (("b.png", 200), ("a.png", 20), ("notes.txt", None)):
+            if level is None:
+                archive.writestr(name, "not a frame")
+                continue
+            image = io.BytesIO()
+            frames([level])[0].save(image, "PNG")
+            archive.writestr(name, image.getvalue())
+
+    source = FrameSource(buffer.getvalue())
+    assert source.frame_count == 2
+    assert [np.asarray(image)[0, 0, 0] for image in source] == [20, 200]
+
+def test_video_round_trip():
+    """An mp4 decodes and re-encodes to a webm with every frame"""
+    av = pytest.importorskip("av")
+    buffer = io.BytesIO()
+    with av.open(buffer, "w", format="mp4") as container:
+        stream = container.add_stream("libx264", rate=25)
+        stream.width, stream.height, stream.pix_fmt = 64, 48, "yuv420p"
+        for i in range(8):
+            frame = av.VideoFrame.from_ndarray(np.full((48, 64, 3), 20 * i, np.uint8), format="rgb24")
+            container.mux(stream.encode(frame))
+        container.mux(stream.encode(None))
+
+    source = FrameSource(buffer.getvalue())
+    assert (source.kind, source.width, source.height) == ("video", 64, 48)
+    encoded = b"".join(collect(stream_sequence(source, Scale(), "webm", size=(32, 32))))
+    with av.open(io.BytesIO(encoded)) as container:
+        assert sum(1 for _ in container.decode(video=0)) == 8
+
+def test_unreadable_input_raises_value_error():
+    """A corrupt container is a ValueError up front"""
+    with pytest.raises(ValueError):
+        FrameSource(b"PK\x03\x04 not really a zip")
+
+def test_oversized_later_frame_is_rejected():
+    """Only the first frame is checked up front, so each frame is checked as it is read"""
+    source = FrameSource(frame_zip([32, 32, 96]), max_dimension=64)
+    assert (source.width, source.height) == (32, 32)
+    images = iter(source)
+    assert next(images).size == (32, 32) and next(images).size == (32, 32)
+    with pytest.raises(ValueError, match="Frame 2"):
+        next(images)
+
+def test_video_sink_rejects_frames_of_another_size():
+    """Every frame of a video must match the size the stream was opened with"""
+    pytest.importorskip("av")
+    sink = VideoSink(io.BytesIO(), "webm")
+    sink.write(torch.rand(1, 3, 32, 32))
+    sink.write(torch.rand(1, 3, 32, 32))
+    with pytest.raises(ValueError):
+        sink.write(torch.rand(1, 3, 48, 32))
+    sink.close()
@@ -19,29 +19,21 @@ export const enhanceImage = async (file) => {
     const formData = new FormData();
     formData.append('file', file);
 
+    // Ask for raw image bytes instead of base64-in-JSON
     const response = await axios.post(`${API_Base}/enhance_v2`, formData, {
         headers: {
             'Content-Type': 'multipart/form-data',
+            'Accept': 'image/*',
         },
+        responseType: 'blob',
     });
 
-    const data = response.data;
-    console.log("Enhance Data:", data);
-
-    const base64Image = data.image;
-    const format = data.format || 'png';
-
-    // Convert base64 to blob
-    const byteCharacters = atob(base64Image);
-    const byteNumbers = new Array(byteCharacters.length);
-    for (let i = 0; i < byteCharacters.length; i++) {
-        byteNumbers[i] = byteCharacters.charCodeAt(i);
-    }
-    const byteArray = new Uint8Array(byteNumbers);
-    const blob = new Blob([byteArray], { type: `image/${format}` });
+    const format = response.headers['x-image-format'] || 'png';
+    const blob = new Blob([response.data], { type: `image/${format}` });
 
     return {
-        blob: blob
+        blob: blob,
+        inferenceTimeMs: parseFloat(response.headers['x-inference-time-ms']) || null
     };
 };
 
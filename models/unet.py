@@ -54,38 +54,50 @@ class UNet(nn.Module):
     """
     U-Net for low-light image enhancement.
     
-    Architecture:
+    Architecture (defaults):
     - 4 encoder blocks (64 -> 128 -> 256 -> 512 channels)
     - Bottleneck (1024 channels)
     - 4 decoder blocks with skip connections
     - Output: sigmoid activation for [0, 1] range
     
-    Parameters: ~31M
+    Parameters: ~31M. `base_width` sets the first encoder's channels (each
+    level doubles them) and `depth` the number of encoder/decoder levels;
+    base_width=32 is ~4x smaller. Inputs must be multiples of 2**depth.
     """
-    def __init__(self, in_channels: int = 3, out_channels: int = 3):
+    def __init__(self, in_channels: int = 3, out_channels: int = 3, base_width: int = 64, depth: int = 4):
         super().__init__()
+        if base_width < 1 or depth < 1:
+            raise ValueError("base_width and depth must be positive")
+        self.base_width = base_width
+        self.depth = depth
+        widths = [base_width * 2 ** i for i in range(depth + 1)]
         
-        # Encoder
-        self.enc1 = EncoderBlock(in_channels, 64)
-        self.enc2 = EncoderBlock(64, 128)
-        self.enc3 = EncoderBlock(128, 256)
-        self.enc4 = EncoderBlock(256, 512)
+        # Encoder (enc1 .. encN; names match the original checkpoints)
+        for i in range(depth):
+            setattr(self, f"enc{i + 1}", EncoderBlock(in_channels if i == 0 else widths[i - 1], widths[i]))
         
         # Bottleneck
-        self.bottleneck = ConvBlock(512, 1024)
+        self.bottleneck = ConvBlock(widths[depth - 1], widths[depth])
         
         # Decoder
-        self.dec4 = DecoderBlock(1024, 512)
-        self.dec3 = DecoderBlock(512, 256)
-        self.dec2 = DecoderBlock(256, 128)
-        self.dec1 = DecoderBlock(128, 64)
+        for i in reversed(range(depth)):
+            setattr(self, f"dec{i + 1}", DecoderBlock(widths[i + 1], widths[i]))
         
         # Output
-        self.out_conv = nn.Conv2d(64, out_channels, 1)
+        self.out_conv = nn.Conv2d(base_width, out_channels, 1)
         
         # Initialize weights
         self._init_weights()
     
+    @property
+    def encoders(self) -> list:
+        return [getattr(self, f"enc{i + 1}") for i in range(self.depth)]
+    
+    @property
+    def decoders(self) -> list:
+        """Deepest first, in the order they run"""
+        return [getattr(self, f"dec{i + 1}") for i in reversed(range(self.depth))]
+    
     def _init_weights(self):
         """Initialize weights using Kaiming initialization"""
         for m in self.modules():
@@ -106,27 +118,34 @@ class UNet(nn.Module):
             Enhanced image tensor of shape (B, 3, H, W), values in [0, 1]
         """
         # Encoder
-        skip1, x = self.enc1(x)
-        skip2, x = self.enc2(x)
-        skip3, x = self.enc3(x)
-        skip4, x = self.enc4(x)
+        skips = []
+        for encoder in self.encoders:
+            skip, x = encoder(x)
+            skips.append(skip)
         
         # Bottleneck
         x = self.bottleneck(x)
         
         # Decoder
-        x = self.dec4(x, skip4)
-        x = self.dec3(x, skip3)
-        x = self.dec2(x, skip2)
-        x = self.dec1(x, skip1)
+        for decoder, skip in zip(self.decoders, reversed(skips)):
+            x = decoder(x, skip)
         
         # Output with sigmoid for [0, 1] range
         return torch.sigmoid(self.out_conv(x))
 
 
+def unet_config(state_dict: dict) -> dict:
+    """UNet keyword arguments (base_width, depth) a state dict was saved with"""
+    depth = sum(1 for key in state_dict if key.startswith("enc") and key.endswith(".conv.conv.0.weight"))
+    return {
+        "base_width": state_dict["enc1.conv.conv.0.weight"].shape[0],
+        "depth": depth,
+    }
+
+
 def load_model(weights_path: str, device: str = 'cpu') -> UNet:
     """
-    Load trained model from weights file.
+    Load trained model from weights file, at whatever width and depth it was trained.
     
     Args:
         weights_path: Path to .pth weights file
@@ -135,8 +154,9 @@ def load_model(weights_path: str, device: str = 'cpu') -> UNet:
     Returns:
         Loaded UNet model in eval mode
     """
-    model = UNet()
-    model.load_state_dict(torch.load(weights_path, map_location=device))
+    state_dict = torch.load(weights_path, map_location=device)
+    model = UNet(**unet_config(state_dict))
+    model.load_state_dict(state_dict)
     model.to(device)
     model.eval()
     return model